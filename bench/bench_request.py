@@ -0,0 +1,330 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2014-2017 Susam Pal
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+"""Benchmarks for request handling by class Request.
+
+Run this script from the top-level directory of the project as
+``python3 -m bench.bench_request``.
+"""
+
+
+import collections
+import http.cookies
+import io
+import itertools
+import time
+import timeit
+import tracemalloc
+
+import ice
+
+
+def environ(method, body=b''):
+    """Return a request environment like the one wsgiref provides."""
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': '/',
+        'QUERY_STRING': 'q=ice&page=2&sort=asc',
+        'HTTP_COOKIE': 'session=abc123; theme=dark; lang=en',
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+
+
+def bench_lazy(number=20000):
+    """Compare handlers that read no request data with ones that do."""
+    print('Request parsing: handler reads nothing vs. everything '
+          '(microseconds per request)')
+    print('{:>8} {:>10} {:>10}'.format('method', 'nothing', 'everything'))
+    nothing = ice.Ice()
+    everything = ice.Ice()
+    for method in ('GET', 'POST'):
+        nothing.route(method, '/')(lambda: '')
+        everything.route(method, '/')(
+            lambda: (everything.request.query, everything.request.form,
+                     everything.request.cookies) and '')
+    start_response = lambda status, headers: None
+    for method, body in (('GET', b''), ('POST', b'a=foo&b=bar&c=baz')):
+        times = []
+        for app in (nothing, everything):
+            times.append(timeit.timeit(
+                         lambda: app(environ(method, body), start_response),
+                         number=number))
+        print('{:>8} {:>10.2f} {:>10.2f}'.format(
+              method, times[0] / number * 1e6, times[1] / number * 1e6))
+
+
+class LegacyMultiDict(collections.UserDict):
+
+    """MultiDict the way ice 0.0.2 implemented it."""
+
+    def __setitem__(self, key, value):
+        if key not in self.data:
+            self.data[key] = [value]
+        else:
+            self.data[key].append(value)
+
+    def __getitem__(self, key):
+        return self.data[key][-1]
+
+
+def allocations(build):
+    """Return the number and size of blocks held by what build returns."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    value = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    assert value is not None
+    return (sum(s.count_diff for s in stats),
+            sum(s.size_diff for s in stats))
+
+
+def bench_multidict(fields=50, number=20000):
+    """Compare MultiDict with the 0.0.2 one on single-valued forms."""
+    print('MultiDict with {} single-valued fields '
+          '(allocated blocks and bytes, microseconds)'.format(fields))
+    print('{:>8} {:>8} {:>8} {:>8} {:>8}'.format(
+          'class', 'blocks', 'bytes', 'build', 'lookup'))
+    pairs = [('field{}'.format(i), 'value{}'.format(i))
+             for i in range(fields)]
+    keys = [k for k, _ in pairs]
+    for name, cls in (('0.0.2', LegacyMultiDict), ('current', ice.MultiDict)):
+        def build():
+            d = cls()
+            for k, v in pairs:
+                d[k] = v
+            return d
+        blocks, size = allocations(build)
+        d = build()
+        build_time = timeit.timeit(build, number=number)
+        lookup_time = timeit.timeit(lambda: [d[k] for k in keys],
+                                    number=number)
+        print('{:>8} {:>8} {:>8} {:>8.2f} {:>8.2f}'.format(
+              name, blocks, size, build_time / number * 1e6,
+              lookup_time / number * 1e6))
+
+
+def cookie_header(count=30, quoted=False):
+    """Return a Cookie header like the ones browsers send."""
+    prefs = '"lang=en; theme=dark"' if quoted else 'lang=en'
+    cookies = ['_ga=GA1.2.1234567890.1500000000',
+               'session=9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822c',
+               'prefs=' + prefs]
+    for i in range(count - len(cookies)):
+        cookies.append('tracker{}={}'.format(i, 'a1b2c3d4e5f6' * 3))
+    return '; '.join(cookies)
+
+
+def legacy_cookies(header):
+    """Parse cookies the way ice 0.0.2 did."""
+    cookies = ice.MultiDict()
+    for c in http.cookies.SimpleCookie(header).values():
+        cookies[c.key] = c.value
+    return cookies
+
+
+def bench_cookies(number=5000):
+    """Compare the cookie parser with SimpleCookie."""
+    print('Cookie parsing and one lookup (microseconds per request)')
+    print('{:>8} {:>8} {:>8} {:>10} {:>10}'.format(
+          'cookies', 'quoted', 'bytes', 'simple', 'current'))
+    for count, quoted in itertools.product((5, 20, 40), (False, True)):
+        header = cookie_header(count, quoted)
+        times = []
+        for parse in (legacy_cookies,
+                      lambda h: ice.Request({'HTTP_COOKIE': h}).cookies):
+            assert parse(header)['prefs'].startswith('lang=en')
+            times.append(timeit.timeit(lambda: parse(header)['session'],
+                                       number=number))
+        print('{:>8} {:>8} {:>8} {:>10.2f} {:>10.2f}'.format(
+              count, 'yes' if quoted else 'no', len(header),
+              times[0] / number * 1e6, times[1] / number * 1e6))
+
+
+def handwritten_params(request):
+    """Validate parameters the way a handler would by hand."""
+    query = request.query
+    values = {}
+    errors = []
+    try:
+        values['limit'] = int(query['limit']) if 'limit' in query else 10
+        if not 1 <= values['limit'] <= 100:
+            errors.append('limit')
+    except ValueError:
+        errors.append('limit')
+    try:
+        values['offset'] = int(query['offset']) if 'offset' in query else 0
+        if values['offset'] < 0:
+            errors.append('offset')
+    except ValueError:
+        errors.append('offset')
+    values['q'] = query.get('q')
+    if values['q'] is None or len(values['q']) > 50:
+        errors.append('q')
+    values['tag'] = query.getall('tag', [])
+    if errors:
+        raise ValueError(errors)
+    return values
+
+
+def bench_params(number=100000):
+    """Compare a compiled parameter validator with hand-written code."""
+    print('Parameter validation of 4 query parameters '
+          '(microseconds per request)')
+    print('{:>12} {:>10}'.format('validator', 'time'))
+    compiled = ice.Param.compile({
+        'limit': ice.Param(int, default=10, min=1, max=100),
+        'offset': ice.Param(int, default=0, min=0),
+        'q': ice.Param(str, max=50),
+        'tag': ice.Param(str, repeated=True, default=[]),
+    })
+    request = ice.Request({'QUERY_STRING':
+                           'limit=20&offset=5&q=ice&tag=a&tag=b'})
+    assert compiled(request) == handwritten_params(request)
+    for name, validate in (('hand-written', handwritten_params),
+                           ('compiled', compiled)):
+        elapsed = timeit.timeit(lambda: validate(request), number=number)
+        print('{:>12} {:>10.2f}'.format(name, elapsed / number * 1e6))
+
+
+def bench_raw(number=50000):
+    """Compare requests per second of regular, raw and constant routes."""
+    print('Health check route (requests per second)')
+    print('{:>10} {:>12}'.format('route', 'requests/s'))
+    app = ice.Ice()
+    app.get('/regular')(lambda: 'ok')
+    app.raw_get('/raw')(lambda environ, response: 'ok')
+    app.constant('/constant', 'ok')
+    start_response = lambda status, headers: None
+    for name in ('regular', 'raw', 'constant'):
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/' + name}
+        assert list(app(environ, start_response)) == [b'ok']
+        elapsed = timeit.timeit(lambda: app(environ, start_response),
+                                number=number)
+        print('{:>10} {:>12.0f}'.format(name, number / elapsed))
+
+
+class UploadInput:
+
+    """Input stream of a multipart upload generated on the fly."""
+
+    def __init__(self, size):
+        """Initialize the stream for a file of the specified size."""
+        self.head = (b'--xyz\r\nContent-Disposition: form-data; '
+                     b'name="f"; filename="f.bin"\r\n\r\n')
+        self.tail = b'\r\n--xyz--\r\n'
+        self.length = len(self.head) + size + len(self.tail)
+        self.remaining = size
+        self.block = b'x' * (1024 * 1024)
+
+    def read(self, size):
+        """Read at most size bytes."""
+        if self.head:
+            out, self.head = self.head, b''
+        elif self.remaining > 0:
+            n = min(size, self.remaining, len(self.block))
+            out = self.block[:n]
+            self.remaining -= n
+        else:
+            out, self.tail = self.tail[:size], self.tail[size:]
+        return out
+
+
+def bench_upload():
+    """Measure time and peak memory of parsing large file uploads."""
+    print('Multipart upload (seconds, peak traced memory in MiB)')
+    print('{:>10} {:>10} {:>10}'.format('MiB', 'seconds', 'peak'))
+    for size in (16, 64, 256):
+        stream = UploadInput(size * 1024 * 1024)
+        r = ice.Request({
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': 'multipart/form-data; boundary=xyz',
+            'CONTENT_LENGTH': str(stream.length),
+            'wsgi.input': stream,
+        })
+        tracemalloc.start()
+        start = time.perf_counter()
+        upload = r.form['f']
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert upload.size == size * 1024 * 1024
+        r.close()
+        print('{:>10} {:>10.2f} {:>10.2f}'.format(size, elapsed,
+                                                  peak / 1024 / 1024))
+
+
+def bench_streaming():
+    """Compare peak memory of streamed and materialized responses."""
+    print('CSV export response (peak traced memory in MiB)')
+    print('{:>10} {:>12} {:>10}'.format('MiB', 'materialized', 'streamed'))
+    line = 'x' * 1023 + '\n'
+    app = ice.Ice()
+
+    @app.get('/<kind>/<size:int>')
+    def export(kind, size):
+        count = size * 1024
+        if kind == 'materialized':
+            return ''.join(line for _ in range(count))
+        return (''.join(line for _ in range(64)) for _ in range(count // 64))
+
+    start_response = lambda status, headers: None
+    for size in (4, 16, 64):
+        peaks = []
+        for kind in ('materialized', 'streamed'):
+            tracemalloc.start()
+            total = 0
+            for chunk in app({'PATH_INFO': '/{}/{}'.format(kind, size)},
+                             start_response):
+                total += len(chunk)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            assert total == size * 1024 * 1024
+        print('{:>10} {:>12.2f} {:>10.2f}'.format(
+              size, peaks[0] / 1024 / 1024, peaks[1] / 1024 / 1024))
+
+
+def main():
+    """Run all request benchmarks."""
+    bench_lazy()
+    print()
+    bench_multidict()
+    print()
+    bench_cookies()
+    print()
+    bench_params()
+    print()
+    bench_raw()
+    print()
+    bench_upload()
+    print()
+    bench_streaming()
+
+
+if __name__ == '__main__':
+    main()
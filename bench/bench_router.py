@@ -0,0 +1,254 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2014-2017 Susam Pal
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+"""Benchmarks for route resolution by class Router.
+
+Run this script from the top-level directory of the project as
+``python3 -m bench.bench_router``.
+"""
+
+
+import timeit
+
+import ice
+
+
+def linear_resolve(routes, path):
+    """Resolve path with a reversed linear scan of wildcard routes."""
+    for route in reversed(routes):
+        callback_data = route.match(path)
+        if callback_data is not None:
+            return callback_data
+    return None
+
+
+def legacy_value(wildcard, value):
+    """Convert a wildcard value the way ice 0.0.2 did."""
+    return value if wildcard._type in ['str', 'path'] else int(value)
+
+
+def legacy_match(route, wildcards, path):
+    """Match path and extract arguments the way ice 0.0.2 did."""
+    match = route.regex().search(path)
+    if match is None:
+        return None
+    args = []
+    kwargs = {}
+    for i, wildcard in enumerate(wildcards):
+        if wildcard.name == '!':
+            continue
+        value = legacy_value(wildcard, match.groups()[i])
+        if not wildcard.name:
+            args.append(value)
+        else:
+            kwargs[wildcard.name] = value
+    return route.callback(), args, kwargs
+
+
+def wildcard_routes(count):
+    """Return a router and an equivalent list of wildcard routes."""
+    router = ice.Router()
+    routes = []
+    for i in range(count):
+        pattern = '/api/r{}/<id:int>/items/<name>'.format(i)
+        router.add('GET', pattern, i)
+        routes.append(ice.WildcardRoute(pattern, i))
+    return router, routes
+
+
+def regex_routers(count):
+    """Return a plain and a combining router with regex routes."""
+    plain = ice.Router()
+    combined = ice.Router(combine_regex=True)
+    for i in range(count):
+        pattern = r'^/legacy/r{}/(?P<id>\d+)/([a-z]+)$'.format(i)
+        plain.add('GET', pattern, i)
+        combined.add('GET', pattern, i)
+    return plain, combined
+
+
+def bench_regex(number=2000):
+    """Compare separate and combined regular expression routes."""
+    print('Regex routes: separate vs. combined '
+          '(microseconds per resolution)')
+    print('{:>8} {:>8} {:>12} {:>12}'.format('routes', 'case',
+                                             'separate', 'combined'))
+    for count in (10, 100, 500):
+        plain, combined = regex_routers(count)
+        cases = [
+            ('newest', '/legacy/r{}/42/foo'.format(count - 1)),
+            ('oldest', '/legacy/r0/42/foo'),
+            ('miss', '/legacy/nope/42/foo'),
+        ]
+        for case, path in cases:
+            assert (plain.resolve('GET', path) ==
+                    combined.resolve('GET', path))
+            n = number // 10 if count > 100 else number
+            separate = timeit.timeit(lambda: plain.resolve('GET', path),
+                                     number=n)
+            merged = timeit.timeit(lambda: combined.resolve('GET', path),
+                                   number=n)
+            print('{:>8} {:>8} {:>12.2f} {:>12.2f}'.format(
+                  count, case, separate / n * 1e6, merged / n * 1e6))
+
+
+def bench_prefilter(number=2000):
+    """Compare regex routes with and without the literal prefix index."""
+    print('Regex routes: prefix index on vs. off (microseconds per '
+          'resolution, regexes evaluated per resolution)')
+    print('{:>8} {:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+          'routes', 'case', 'on', 'off', 'on eval', 'off eval'))
+    for count in (10, 100, 500):
+        routers = ice.Router(), ice.Router(prefilter=False)
+        for router in routers:
+            for i in range(count):
+                router.add('GET', r'^/api/v2/r{}/(\d+)$'.format(i), i)
+        cases = [
+            ('newest', '/api/v2/r{}/42'.format(count - 1)),
+            ('oldest', '/api/v2/r0/42'),
+            ('miss', '/api/v2/nope/42'),
+        ]
+        for case, path in cases:
+            assert (routers[0].resolve('GET', path) ==
+                    routers[1].resolve('GET', path))
+            times = []
+            evaluated = []
+            for router in routers:
+                before = router.prefilter_info()
+                times.append(timeit.timeit(
+                             lambda: router.resolve('GET', path),
+                             number=number))
+                after = router.prefilter_info()
+                evaluated.append((after.evaluated - before.evaluated) /
+                                 (after.searches - before.searches))
+            print('{:>8} {:>8} {:>10.2f} {:>10.2f} {:>10.1f} {:>10.1f}'
+                  .format(count, case, times[0] / number * 1e6,
+                          times[1] / number * 1e6, *evaluated))
+
+
+def mixed_routers():
+    """Return an unfrozen and a frozen router with the same routes."""
+    routers = ice.Router(), ice.Router()
+    for router in routers:
+        for i in range(100):
+            router.add('GET', '/static/page{}'.format(i), i)
+            router.add('GET', '/users/<id:int>/posts{}/<slug>'.format(i), i)
+            router.add('GET', r'^/legacy{}/(\d+)$'.format(i), i)
+            router.add('POST', '/users/<id:int>/posts{}'.format(i), i)
+    routers[1].freeze()
+    return routers
+
+
+def bench_frozen(number=20000):
+    """Compare a frozen router with an unfrozen one."""
+    print('Frozen vs. unfrozen router (microseconds per call)')
+    print('{:>24} {:>10} {:>10}'.format('case', 'unfrozen', 'frozen'))
+    unfrozen, frozen = mixed_routers()
+    cases = [
+        ('literal', 'GET', '/static/page50'),
+        ('wildcard', 'GET', '/users/42/posts50/hello'),
+        ('regex', 'GET', '/legacy99/42'),
+        ('miss', 'GET', '/nope'),
+        ('unknown method', 'PATCH', '/static/page50'),
+    ]
+    for case, method, path in cases:
+        assert (unfrozen.resolve(method, path) ==
+                frozen.resolve(method, path))
+        before = timeit.timeit(lambda: unfrozen.resolve(method, path),
+                               number=number)
+        after = timeit.timeit(lambda: frozen.resolve(method, path),
+                              number=number)
+        print('{:>24} {:>10.2f} {:>10.2f}'.format(
+              'resolve ' + case, before / number * 1e6,
+              after / number * 1e6))
+    before = timeit.timeit(lambda: unfrozen.contains_method('PATCH'),
+                           number=number)
+    after = timeit.timeit(lambda: frozen.contains_method('PATCH'),
+                          number=number)
+    print('{:>24} {:>10.2f} {:>10.2f}'.format(
+          'contains_method', before / number * 1e6, after / number * 1e6))
+
+
+def bench_wildcard(number=2000):
+    """Compare the segment trie with a reversed linear scan."""
+    print('Wildcard routes: trie vs. reversed linear scan '
+          '(microseconds per resolution)')
+    print('{:>8} {:>8} {:>12} {:>12}'.format('routes', 'case',
+                                             'trie', 'linear'))
+    for count in (10, 1000, 10000):
+        router, routes = wildcard_routes(count)
+        cases = [
+            ('first', '/api/r0/42/items/foo'),
+            ('last', '/api/r{}/42/items/foo'.format(count - 1)),
+            ('miss', '/api/nope/42/items/foo'),
+        ]
+        for case, path in cases:
+            assert (router.resolve('GET', path) ==
+                    linear_resolve(routes, path))
+            n = number if count < 10000 else number // 10
+            trie = timeit.timeit(lambda: router.resolve('GET', path),
+                                 number=number)
+            linear = timeit.timeit(lambda: linear_resolve(routes, path),
+                                   number=n)
+            print('{:>8} {:>8} {:>12.2f} {:>12.2f}'.format(
+                  count, case, trie / number * 1e6, linear / n * 1e6))
+
+
+def bench_extraction(number=50000):
+    """Compare argument extraction with the per-wildcard loop of 0.0.2."""
+    print('Wildcard argument extraction: plan vs. 0.0.2 loop '
+          '(microseconds per match)')
+    print('{:>10} {:>10} {:>10}'.format('wildcards', 'plan', '0.0.2'))
+    specs = ['<a:int>', '<b>', '<>', '<!>', '<c:-int>', '<d:path>']
+    values = ['42', 'foo', 'bar', 'baz', '-7', 'x/y']
+    for count in range(1, len(specs) + 1):
+        pattern = '/' + '/'.join(specs[:count])
+        path = '/' + '/'.join(values[:count])
+        route = ice.WildcardRoute(pattern, None)
+        wildcards = [ice.Wildcard(t) for t in ice.WildcardRoute.tokens(pattern)
+                     if t.startswith('<')]
+        assert route.match(path) == legacy_match(route, wildcards, path)
+        plan = timeit.timeit(lambda: route.match(path), number=number)
+        loop = timeit.timeit(lambda: legacy_match(route, wildcards, path),
+                             number=number)
+        print('{:>10} {:>10.2f} {:>10.2f}'.format(
+              count, plan / number * 1e6, loop / number * 1e6))
+
+
+def main():
+    """Run all router benchmarks."""
+    bench_extraction()
+    print()
+    bench_wildcard()
+    print()
+    bench_regex()
+    print()
+    bench_prefilter()
+    print()
+    bench_frozen()
+
+
+if __name__ == '__main__':
+    main()
@@ -37,14 +37,22 @@ __credits__ = ('Marcel Hellkamp, for writing bottle, the inspiration '
 
 
 import collections
+import collections.abc
+import datetime
+import functools
+import inspect
 import itertools
+import json
+import operator
 import re
-import cgi
+import threading
 import urllib.parse
 import http.server
 import http.cookies
 import os
 import mimetypes
+import tempfile
+import uuid
 
 
 def cube():
@@ -99,11 +107,66 @@ class Ice:
     that functions as WSGI application.
     """
 
-    def __init__(self):
-        """Initialize the application."""
-        self._router = Router()
+    _RouteOptions = collections.namedtuple('_RouteOptions', (
+                                           'max_body_size', 'injections',
+                                           'validator', 'raw', 'constant'))
+    # Every field has a default value, so that each kind of route sets
+    # only the options it uses. The defaults argument of namedtuple
+    # requires Python 3.7.
+    _RouteOptions.__new__.__defaults__ = (None, None, None, False, None)
+
+    # Functions that extract the values of the parameters that may be
+    # injected into a route handler from the current request.
+    _extractors = {
+        'request': lambda request: request,
+        'query': operator.attrgetter('query'),
+        'form': operator.attrgetter('form'),
+        'json': operator.attrgetter('json'),
+        'ndjson': operator.attrgetter('ndjson'),
+        'stream': operator.attrgetter('stream'),
+        'headers': operator.attrgetter('headers'),
+        'cookies': operator.attrgetter('cookies'),
+    }
+
+    def __init__(self, router=None, max_body_size=None, query_cache_size=0):
+        """Initialize the application.
+
+        If *query_cache_size* is greater than 0, the query strings of
+        requests are parsed via a :class:`QueryCache` with at most
+        *query_cache_size* entries, so that a repeated query string is
+        not parsed again.
+
+        Arguments:
+          router (Router, optional): Router to resolve requests with. A
+            router with default settings is used if not specified.
+          max_body_size (int, optional): Maximum size of a request body
+            in bytes for routes that do not specify their own limit,
+            ``None`` (the default) for no limit.
+          query_cache_size (int, optional): Maximum number of cached
+            query strings, defaults to 0, i.e. no cache.
+        """
+        self._router = Router() if router is None else router
+        self._max_body_size = max_body_size
+        self._query_cache = (QueryCache(query_cache_size)
+                             if query_cache_size > 0 else None)
+        self._route_options = {}
         self._server = None
         self._error_handlers = {}
+        self._mounts = {}
+        self._mount_lengths = ()
+
+    def query_cache_info(self):
+        """Return statistics of the query string cache.
+
+        Returns:
+          tuple: A named tuple with the fields *hits*, *misses*,
+          *evictions*, *maxsize* and *currsize* as returned by
+          :meth:`QueryCache.info`, all of them 0 if the application has
+          no query string cache.
+        """
+        if self._query_cache is None:
+            return Router._CacheInfo(0, 0, 0, 0, 0)
+        return self._query_cache.info()
 
     def run(self, host='127.0.0.1', port=8080):
         """Run the application using a simple WSGI server.
@@ -132,43 +195,300 @@ class Ice:
         """
         return self._server is not None
 
-    def get(self, pattern):
+    def get(self, pattern, max_body_size=None, inject=False,
+            params=None):
         """Decorator to add route for an HTTP GET request.
 
         Arguments:
           pattern (str): Routing pattern the path must match.
+          max_body_size (int, optional): Maximum size of the request
+            body in bytes, see :meth:`route`.
+          inject (bool, optional): Whether to inject parts of the
+            request into the route handler, see :meth:`route`.
+          params (dict, optional): Specifications of the parameters of
+            the route handler, see :meth:`route`.
 
         Returns:
           function: Decorator to add route for HTTP GET request.
         """
-        return self.route('GET', pattern)
+        return self.route('GET', pattern, max_body_size, inject, params)
 
-    def post(self, pattern):
+    def post(self, pattern, max_body_size=None, inject=False,
+            params=None):
         """Decorator to add route for an HTTP POST request.
 
         Arguments:
           pattern (str): Routing pattern the path must match.
+          max_body_size (int, optional): Maximum size of the request
+            body in bytes, see :meth:`route`.
+          inject (bool, optional): Whether to inject parts of the
+            request into the route handler, see :meth:`route`.
+          params (dict, optional): Specifications of the parameters of
+            the route handler, see :meth:`route`.
 
         Returns:
           function: Decorator to add route for HTTP POST request.
         """
-        return self.route('POST', pattern)
+        return self.route('POST', pattern, max_body_size, inject, params)
 
-    def route(self, method, pattern):
+    def route(self, method, pattern, max_body_size=None, inject=False,
+              params=None):
         """Decorator to add route for a request with any HTTP method.
 
+        If *max_body_size* is specified, a request for this route whose
+        Content-Length is greater than *max_body_size* is answered with
+        413 Request Entity Too Large before its body is read and before
+        the route handler is called. Otherwise the *max_body_size*
+        specified for the application, if any, applies.
+
+        If *inject* is ``True``, the signature of the route handler is
+        inspected once, when the route is added. Each parameter of the
+        route handler named ``request``, ``query``, ``form``, ``json``,
+        ``ndjson``, ``stream``, ``headers`` or ``cookies`` is then passed
+        the current request or its attribute of the same name as a
+        keyword argument, so only the parts of the request that the
+        route handler asks for are parsed. These names must not be used
+        for wildcards or named groups in *pattern*.
+
+        If *params* is specified, it maps the names of query string or
+        form data parameters to :class:`Param` specifications, which are
+        compiled into a single validator function by
+        :meth:`Param.compile` when the route is added. The converted
+        values of the parameters are passed to the route handler as
+        keyword arguments. A request with missing or invalid parameters
+        is answered with 400 Bad Request and a JSON body that lists the
+        errors, see :class:`ParamError`, and the route handler is not
+        called.
+
         Arguments:
           method (str): HTTP method name, e.g. GET, POST, etc.
           pattern (str): Routing pattern the path must match.
+          max_body_size (int, optional): Maximum size of the request
+            body in bytes.
+          inject (bool, optional): Whether to inject parts of the
+            request into the route handler, defaults to ``False``.
+          params (dict, optional): Dictionary that maps parameter names
+            to :class:`Param` objects.
 
         Returns:
           function: Decorator function to add route.
+
+        Raises:
+          LogicError: If *inject* is ``True`` and the signature of the
+            route handler cannot be inspected or the name of an injected
+            parameter is used for a wildcard or named group in
+            *pattern*.
+        """
+        def decorator(callback):
+            injections = Ice._injections_for(callback) if inject else ()
+            if injections:
+                names = Ice._keyword_names(pattern)
+                for name, _ in injections:
+                    if name in names:
+                        raise LogicError('Injected parameter {!r} of '
+                                         'route handler {!r} is also '
+                                         'used in pattern {!r}'
+                                         .format(name, callback, pattern))
+            validator = Param.compile(params) if params else None
+            if max_body_size is None and not injections and not validator:
+                self._router.add(method, pattern, callback)
+            else:
+                # A distinct handler for this route carries its options,
+                # even if the callback is used for other routes too.
+                handler = functools.partial(callback)
+                self._router.add(method, pattern, handler)
+                self._route_options[handler] = Ice._RouteOptions(
+                    max_body_size, injections or None, validator)
+            return callback
+        return decorator
+
+    def raw_get(self, pattern):
+        """Decorator to add raw route for an HTTP GET request.
+
+        Arguments:
+          pattern (str): Routing pattern the path must match.
+
+        Returns:
+          function: Decorator to add raw route for HTTP GET request.
+        """
+        return self.raw_route('GET', pattern)
+
+    def raw_post(self, pattern):
+        """Decorator to add raw route for an HTTP POST request.
+
+        Arguments:
+          pattern (str): Routing pattern the path must match.
+
+        Returns:
+          function: Decorator to add raw route for HTTP POST request.
+        """
+        return self.raw_route('POST', pattern)
+
+    def raw_route(self, method, pattern):
+        """Decorator to add raw route for a request with any HTTP method.
+
+        A raw route takes part in routing like any other route, but its
+        handler is called with the WSGI environ dictionary and a
+        :class:`RawResponse` followed by the arguments extracted from
+        the request path, and no :class:`Request` or :class:`Response`
+        object is created for a request that it handles. Therefore,
+        :attr:`request` and :attr:`response` must not be used in its
+        handler, and no request limits are checked.
+
+        If the route handler returns a string or bytes, it is sent as
+        the response body with the status, media type, character set
+        and headers set in the :class:`RawResponse`. Any other value,
+        e.g. an HTTP status code, is handled like a value returned by a
+        regular route handler, so error pages are generated as usual.
+
+        Arguments:
+          method (str): HTTP method name, e.g. GET, POST, etc.
+          pattern (str): Routing pattern the path must match.
+
+        Returns:
+          function: Decorator function to add raw route.
         """
         def decorator(callback):
-            self._router.add(method, pattern, callback)
+            handler = functools.partial(callback)
+            self._router.add(method, pattern, handler)
+            self._route_options[handler] = Ice._RouteOptions(raw=True)
             return callback
         return decorator
 
+    def constant(self, pattern, body, media_type='text/html',
+                 charset='UTF-8', headers=None):
+        """Add route for an HTTP GET request that returns a constant body.
+
+        The body is encoded and the response headers, including
+        Content-Type and Content-Length, are built once, when the route
+        is added. A request for the route is answered with them directly,
+        without calling any route handler or creating any
+        :class:`Request` or :class:`Response` object, and every response
+        shares the same body bytes object. This is the fastest way to
+        respond to a request, e.g. for /robots.txt or /version.
+
+        Arguments:
+          pattern (str): Routing pattern the path must match.
+          body (str or bytes): HTTP response body.
+          media_type (str, optional): Media type of HTTP response,
+            defaults to 'text/html'.
+          charset (str, optional): Character set that a str *body* is
+            encoded with and that is added to the Content-Type of a
+            ``text/`` media type, defaults to 'UTF-8'.
+          headers (list, optional): Additional HTTP headers as (name,
+            value) tuples.
+        """
+        if isinstance(body, str):
+            body = body.encode(charset)
+        response = Response(None)
+        response.media_type = media_type
+        response.charset = charset
+        for name, value in headers or ():
+            response.add_header(name, value)
+        response.add_header('Content-Type', response.content_type)
+        response.add_header('Content-Length', str(len(body)))
+        constant = (response.status_line, tuple(response._headers),
+                    (body,), (b'',))
+
+        def handler():
+            return body
+        self._router.add('GET', pattern, handler)
+        self._route_options[handler] = Ice._RouteOptions(constant=constant)
+
+    @staticmethod
+    def _injections_for(callback):
+        """Return the request parts to inject into a route handler.
+
+        Arguments:
+          callback (callable): Route handler.
+
+        Returns:
+          tuple: Pairs of the name of a parameter of the route handler
+          and the function that extracts its value from the current
+          request.
+
+        Raises:
+          LogicError: If the signature of the route handler cannot be
+            inspected.
+        """
+        try:
+            parameters = inspect.signature(callback).parameters.values()
+        except (TypeError, ValueError) as e:
+            raise LogicError('Cannot inspect signature of route handler '
+                             '{!r}: {}'.format(callback, e))
+        return tuple((p.name, Ice._extractors[p.name]) for p in parameters
+                     if p.name in Ice._extractors and
+                     p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY))
+
+    @staticmethod
+    def _keyword_names(pattern):
+        """Return the names of the keyword arguments a pattern yields.
+
+        Arguments:
+          pattern (str): Routing pattern.
+
+        Returns:
+          set: Names of the wildcards of a wildcard pattern or of the
+          named groups of a regular expression pattern.
+        """
+        pattern_type, pattern = Router._normalize_pattern(pattern)
+        if pattern_type == 'wildcard':
+            route = WildcardRoute(pattern, None)
+            return {w.name for segment in route.segments()
+                    for _, w in segment if w is not None}
+        elif pattern_type == 'regex':
+            return set(re.compile(pattern).groupindex)
+        else:
+            return set()
+
+    def mount(self, prefix, app):
+        """Mount a WSGI application at a path prefix.
+
+        A request whose path is *prefix* or begins with *prefix*
+        followed by ``/`` is passed on to *app* before it is matched
+        against any route of this application. The prefix is appended
+        to the SCRIPT_NAME environment variable and removed from the
+        PATH_INFO environment variable of the request passed on, so the
+        mounted application sees paths relative to the prefix. If the
+        prefixes of more than one mounted application match a request
+        path, the longest prefix wins.
+
+        The mounted application may be another instance of this class,
+        with its own routes and error handlers, or any other WSGI
+        application.
+
+        Arguments:
+          prefix (str): Path prefix that begins with ``/`` and does not
+            end with ``/``, e.g. ``/shop``.
+          app (callable): WSGI application to mount.
+
+        Raises:
+          RouteError: If the prefix is invalid or if an application is
+            already mounted at the prefix.
+        """
+        if not prefix.startswith('/') or prefix.endswith('/'):
+            raise RouteError('Invalid mount prefix {!r}'.format(prefix))
+        if prefix in self._mounts:
+            raise RouteError('An application is already mounted at {!r}'
+                             .format(prefix))
+        self._mounts[prefix] = app
+        self._mount_lengths = tuple(sorted({len(p) for p in self._mounts},
+                                           reverse=True))
+
+    def freeze(self):
+        """Freeze the routes of the application.
+
+        After this method is called, no more routes can be added to the
+        application and requests are resolved with a dispatcher that is
+        specialized for the routes added so far. See
+        :meth:`Router.freeze` for details. Applications of this class
+        that are mounted in this application are frozen too.
+        """
+        self._router.freeze()
+        for app in self._mounts.values():
+            if isinstance(app, Ice):
+                app.freeze()
+
     def error(self, status=None):
         """Decorator to add a callback that generates error page.
 
@@ -211,6 +531,10 @@ class Ice:
         is not specified or specified as ``None`` (the default), then it
         is guessed from the filename of the file to be returned.
 
+        If the current request is a HEAD request, the file is not read.
+        Its size is set as the Content-Length of the response and an
+        empty sequence of bytes is returned instead of its content.
+
         Arguments:
           root (str): Path to document root directory.
           path (str): Path to file relative to document root directory.
@@ -239,6 +563,10 @@ class Ice:
             self.response.media_type = mimetypes.guess_type(path)[0]
         self.response.charset = charset
 
+        if self.request.method == 'HEAD':
+            self.response.content_length = os.path.getsize(path)
+            return b''
+
         with open(path, 'rb') as f:
             return f.read()
 
@@ -315,20 +643,94 @@ class Ice:
           start_response (callable): Callable to start HTTP response
 
         Returns:
-          list: List containing a single sequence of bytes.
+          iterable: List containing a single sequence of bytes, an
+          iterable that encodes the chunks of a streamed response body,
+          or the response body returned by the mounted application that
+          handles the request.
         """
-        self.request = Request(environ)
-        self.response = Response(start_response)
-
-        route = self._router.resolve(self.request.method,
-                                     self.request.path)
+        if self._mounts:
+            path = environ.get('PATH_INFO', '')
+            for length in self._mount_lengths:
+                app = self._mounts.get(path[:length])
+                if app is not None and path[length:length + 1] in ('', '/'):
+                    environ = dict(environ)
+                    environ['SCRIPT_NAME'] = (environ.get('SCRIPT_NAME', '')
+                                              + path[:length])
+                    environ['PATH_INFO'] = path[length:]
+                    return app(environ, start_response)
+
+        method = environ.get('REQUEST_METHOD', 'GET')
+        path = environ.get('PATH_INFO') or '/'
+        route = self._router.resolve(method, path)
+        if route is None and method == 'HEAD':
+            route = self._router.resolve('GET', path)
+        options = None
         if route is not None:
             callback, args, kwargs = route
-            value = callback(*args, **kwargs)
-        elif self._router.contains_method(self.request.method):
-            value = 404 # Not found
+            options = self._route_options.get(callback)
+            if options is not None and options.constant is not None:
+                status_line, headers, body, head = options.constant
+                start_response(status_line, list(headers))
+                return head if method == 'HEAD' else body
+            if options is not None and options.raw:
+                raw_response = RawResponse()
+                try:
+                    value = callback(environ, raw_response, *args, **kwargs)
+                except RequestError as e:
+                    value = e.status
+                if isinstance(value, (str, bytes)):
+                    return raw_response.finish(value, start_response,
+                                               method == 'HEAD')
+                # Any other value is handled below like a value returned
+                # by a regular route handler.
+
+        self.request = Request(environ)
+        if self._query_cache is not None:
+            self.request.query_cache = self._query_cache
+        self.response = Response(start_response)
+        self.response.head = method == 'HEAD'
+
+        if options is not None and options.raw:
+            for name, header_value in raw_response.headers:
+                self.response.add_header(name, header_value)
+        elif route is not None:
+            if options is None:
+                limit = self._max_body_size
+                injections = validator = None
+            else:
+                limit, injections, validator = options[:3]
+                if limit is None:
+                    limit = self._max_body_size
+            if limit is not None:
+                self.request.max_body_size = limit
+            max_header_size = self.request.max_header_size
+            try:
+                if (max_header_size is not None and
+                        self.request.header_size > max_header_size):
+                    value = 431 # Request Header Fields Too Large
+                elif (limit is not None and
+                        self.request.content_length > limit):
+                    value = 413 # Request Entity Too Large
+                else:
+                    if options is not None:
+                        # The router may share kwargs between requests.
+                        kwargs = dict(kwargs)
+                        if injections is not None:
+                            for name, extract in injections:
+                                kwargs[name] = extract(self.request)
+                        if validator is not None:
+                            kwargs.update(validator(self.request))
+                    value = callback(*args, **kwargs)
+            except ParamError as e:
+                value = e.status
+                self.response.media_type = 'application/json'
+                self.response.body = json.dumps({'errors': e.errors})
+            except RequestError as e:
+                value = e.status
+            finally:
+                self.request.close()
         else:
-            value = 501 # Not Implemented
+            value = self._no_route()
 
         if isinstance(value, str) or isinstance(value, bytes):
             self.response.body = value
@@ -349,6 +751,9 @@ class Ice:
             if self.response.body is None:
                 self.response.body = self._get_error_page_callback()()
 
+        elif isinstance(value, collections.abc.Iterator):
+            self.response.body = value
+
         else:
             raise Error('Route callback for {} {} returned invalid '
                         'value: {}: {!r}'.format(self.request.method,
@@ -356,6 +761,39 @@ class Ice:
 
         return self.response.response()
 
+    def _no_route(self):
+        """Respond to a request that matches no route.
+
+        If routes for other HTTP methods match the request path, an
+        OPTIONS request is answered with the methods allowed for the
+        path and any other request with 405 Method Not Allowed. Both
+        responses contain an Allow header listing the allowed methods.
+        HEAD is allowed wherever GET is allowed.
+
+        Otherwise the response is 404 Not Found if the request method is
+        implemented, 501 Not Implemented if it is not. OPTIONS is always
+        implemented, and HEAD is implemented if GET is.
+
+        Returns:
+          str or int: Response body or HTTP response status code.
+        """
+        methods = self._router.methods(self.request.path)
+        if methods:
+            methods.add('OPTIONS')
+            if 'GET' in methods:
+                methods.add('HEAD')
+            self.response.add_header('Allow', ', '.join(sorted(methods)))
+            if self.request.method == 'OPTIONS':
+                return ''
+            return 405 # Method Not Allowed
+        elif (self.request.method == 'OPTIONS' or
+              self._router.contains_method(self.request.method) or
+              self.request.method == 'HEAD' and
+              self._router.contains_method('GET')):
+            return 404 # Not found
+        else:
+            return 501 # Not Implemented
+
     def _get_error_page_callback(self):
         """Return an error page for the current response status."""
         if self.response.status in self._error_handlers:
@@ -372,11 +810,70 @@ class Router:
 
     """Route management and resolution."""
 
-    def __init__(self):
-        """Initialize router."""
+    _CacheInfo = collections.namedtuple('_CacheInfo', ('hits', 'misses',
+                                        'evictions', 'maxsize', 'currsize'))
+    _PrefilterInfo = collections.namedtuple('_PrefilterInfo', (
+                                            'searches', 'evaluated',
+                                            'unfiltered'))
+
+    # Request paths longer than this are never cached, so that the
+    # memory used by the cache remains bounded.
+    _cache_path_limit = 1024
+
+    def __init__(self, combine_regex=False, cache_size=0, prefilter=True):
+        """Initialize router.
+
+        If *combine_regex* is ``True``, the regular expression routes of
+        each HTTP method are merged into as few regular expressions as
+        possible, so that a single search finds the matching route. See
+        :class:`RegexTable` for details.
+
+        If *prefilter* is ``True`` (the default) and *combine_regex* is
+        ``False``, the regular expression routes of each HTTP method are
+        indexed by the literal prefix that every path they match starts
+        with, and a request path is searched only with the routes whose
+        prefix it starts with. Wildcard routes need no such index
+        because their literal segments are edges of a
+        :class:`WildcardTrie`.
+
+        If *cache_size* is greater than 0, the results of resolving
+        requests to wildcard and regular expression routes, including
+        the absence of a matching route, are saved in a least recently
+        used cache with at most *cache_size* entries. The cache is
+        cleared whenever a route is added. It is safe to resolve
+        requests from multiple threads.
+
+        Arguments:
+          combine_regex (bool, optional): Whether to combine regular
+            expression routes, defaults to ``False``.
+          cache_size (int, optional): Maximum number of cached results,
+            defaults to 0, i.e. no cache.
+          prefilter (bool, optional): Whether to index regular
+            expression routes by literal prefix, defaults to ``True``.
+        """
         self._literal = collections.defaultdict(dict)
-        self._wildcard = collections.defaultdict(list)
-        self._regex = collections.defaultdict(list)
+        self._wildcard = collections.defaultdict(WildcardTrie)
+        self._regex = collections.defaultdict(
+            lambda: RegexTable(combine_regex, prefilter))
+        self._literal_methods = collections.defaultdict(set)
+        self._wildcard_methods = {}
+        self._wildcard_all = WildcardTrie()
+        self._prefilter = prefilter
+        self._regex_methods = {}
+        self._regex_method_lengths = ()
+        self._regex_method_count = 0
+        self._methods_searches = 0
+        self._methods_evaluated = 0
+        self._methods_unfiltered = 0
+        self._cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_evictions = 0
+        self._frozen = None
+        self._methods = None
 
     def add(self, method, pattern, callback):
         """Add a route.
@@ -386,14 +883,36 @@ class Router:
           pattern (str): Pattern that request paths must match.
           callback (str): Route handler that is invoked when a request
             path matches the *pattern*.
+
+        Raises:
+          RouteError: When the router is frozen.
         """
+        if self._frozen is not None:
+            raise RouteError('Cannot add route {} {} to frozen router'
+                             .format(method, pattern))
         pat_type, pat = self._normalize_pattern(pattern)
         if pat_type == 'literal':
             self._literal[method][pat] = callback
+            self._literal_methods[pat].add(method)
         elif pat_type == 'wildcard':
-            self._wildcard[method].append(WildcardRoute(pat, callback))
+            route = WildcardRoute(pat, callback)
+            self._wildcard[method].add(route)
+            self._wildcard_all.add(route)
+            self._wildcard_methods[route] = method
         else:
-            self._regex[method].append(RegexRoute(pat, callback))
+            route = RegexRoute(pat, callback)
+            self._regex[method].add(route)
+            prefix = route.prefix() if self._prefilter else ''
+            bucket = self._regex_methods.setdefault(prefix, {})
+            if pat not in bucket:
+                bucket[pat] = route.regex().search, set()
+                self._regex_method_count += 1
+                self._regex_method_lengths = tuple(
+                    sorted({len(p) for p in self._regex_methods}))
+            bucket[pat][1].add(method)
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_generation += 1
 
     def contains_method(self, method):
         """Check if there is at least one handler for *method*.
@@ -405,9 +924,76 @@ class Router:
           ``True`` if there is at least one route defined for *method*,
           ``False`` otherwise
         """
+        if self._frozen is not None:
+            return method in self._methods
         return method in itertools.chain(self._literal, self._wildcard,
                                          self._regex)
 
+    def methods(self, path):
+        """Return the HTTP methods with a route that matches a path.
+
+        The methods are looked up in an index of all routes by path,
+        which is maintained as routes are added: a dictionary for
+        literal routes, a single segment trie for the wildcard routes of
+        all methods, and a dictionary of distinct regular expressions
+        for regular expression routes. Thus each route pattern is tried
+        at most once, however many methods it is registered for. The
+        regular expressions are put in buckets by their literal prefix
+        (see :meth:`RegexRoute.prefix`) unless the router was created
+        with *prefilter* set to ``False``, and a path is searched only
+        with those in the buckets of the prefixes it starts with.
+
+        Arguments:
+          path (str): Request path
+
+        Returns:
+          set: Set of HTTP method names.
+        """
+        methods = set(self._literal_methods.get(path, ()))
+        for route in self._wildcard_all.find_all(path):
+            methods.add(self._wildcard_methods[route])
+        evaluated = 0
+        for length in self._regex_method_lengths:
+            bucket = self._regex_methods.get(path[:length])
+            if bucket is None:
+                continue
+            for search, pattern_methods in bucket.values():
+                if not pattern_methods <= methods:
+                    evaluated += 1
+                    if search(path) is not None:
+                        methods |= pattern_methods
+        self._methods_searches += 1
+        self._methods_evaluated += evaluated
+        self._methods_unfiltered += self._regex_method_count
+        return methods
+
+    def freeze(self):
+        """Compile the routes into an immutable, specialized dispatcher.
+
+        The routes of each HTTP method are compiled into a single
+        function that looks the request path up in a copy of the literal
+        routes of the method, then in its wildcard routes and then in
+        its regular expression routes, leaving out the steps for which
+        the method has no routes. The regular expression routes are
+        matched with a function specialized for them (see
+        :meth:`RegexTable.matcher`), whose searches are not counted in
+        :meth:`prefilter_info`. If the router has a cache, only the
+        wildcard and regular expression steps go through it. Requests
+        are resolved exactly as they would be without freezing.
+
+        Once the router is frozen, no more routes can be added to it.
+        Calling this method again has no effect.
+        """
+        if self._frozen is not None:
+            return
+        frozen = {}
+        for method in itertools.chain(self._literal, self._wildcard,
+                                      self._regex):
+            if method not in frozen:
+                frozen[method] = self._compile_method(method)
+        self._methods = frozenset(frozen)
+        self._frozen = frozen
+
     def resolve(self, method, path):
         """Resolve a request to a route handler.
 
@@ -424,11 +1010,157 @@ class Router:
 
           ``None`` if no route matches the request.
         """
+        if self._frozen is not None:
+            resolve = self._frozen.get(method)
+            return None if resolve is None else resolve(path)
         if method in self._literal and path in self._literal[method]:
             return self._literal[method][path], [], {}
+        if self._cache_size > 0:
+            return self._resolve_cached_route(method, path)
         else:
             return self._resolve_non_literal_route(method, path)
 
+    def cache_info(self):
+        """Return statistics of the resolution cache.
+
+        Returns:
+          tuple: A named tuple with the number of cache hits, misses and
+          evictions, the maximum size of the cache and its current size
+          as the fields *hits*, *misses*, *evictions*, *maxsize* and
+          *currsize*, respectively.
+        """
+        with self._cache_lock:
+            return Router._CacheInfo(self._cache_hits, self._cache_misses,
+                                     self._cache_evictions,
+                                     self._cache_size, len(self._cache))
+
+    def prefilter_info(self):
+        """Return statistics of the regular expression routes searched.
+
+        The statistics cover the requests that were not resolved to a
+        literal or wildcard route, or from the cache, and are summed
+        over all HTTP methods. They also cover the searches of the
+        regular expressions of all methods that :meth:`methods` makes to
+        find the methods allowed for a path. Comparing the number of
+        regular expressions evaluated with the number that would have
+        been evaluated without the prefix index shows how much work the
+        index saves. The counts are not updated for tables that combine
+        routes into a single regular expression.
+
+        Returns:
+          tuple: A named tuple with the number of searches of regular
+          expression routes, the number of regular expressions evaluated
+          by them and the number that would have been evaluated without
+          the prefix index as the fields *searches*, *evaluated* and
+          *unfiltered*, respectively.
+        """
+        searches = self._methods_searches
+        evaluated = self._methods_evaluated
+        unfiltered = self._methods_unfiltered
+        for table in list(self._regex.values()):
+            info = table.info()
+            searches += info[0]
+            evaluated += info[1]
+            unfiltered += info[2]
+        return Router._PrefilterInfo(searches, evaluated, unfiltered)
+
+    def _compile_method(self, method):
+        """Return a function that resolves requests of an HTTP method.
+
+        Arguments:
+          method (str): HTTP method name, e.g. GET, POST, etc.
+
+        Returns:
+          callable: Function that accepts a request path and returns
+          what :meth:`resolve` would return for it.
+        """
+        literal = dict(self._literal.get(method, {}))
+        matchers = []
+        if method in self._wildcard:
+            matchers.append(self._wildcard[method].match)
+        if method in self._regex:
+            matchers.append(self._regex[method].matcher())
+
+        if not matchers:
+            def match(path):
+                return None
+        elif len(matchers) == 1:
+            match = matchers[0]
+        else:
+            wildcard_match, regex_match = matchers
+
+            def match(path):
+                callback_data = wildcard_match(path)
+                if callback_data is None:
+                    callback_data = regex_match(path)
+                return callback_data
+
+        if matchers and self._cache_size > 0:
+            uncached_match = match
+            cached_route = self._resolve_cached_route
+
+            def match(path):
+                return cached_route(method, path, uncached_match)
+
+        if not literal:
+            return match
+
+        def resolve(path):
+            if path in literal:
+                return literal[path], [], {}
+            return match(path)
+
+        return resolve
+
+    def _resolve_cached_route(self, method, path, match=None):
+        """Resolve a request to a non-literal route via the cache.
+
+        The cached positional and keyword arguments are shared by every
+        caller that gets the same result from the cache, so they must
+        not be modified.
+
+        Arguments:
+          method (str): HTTP method name, e.g. GET, POST, etc.
+          path (str): Request path
+          match (callable, optional): Function that resolves the path to
+            a non-literal route of the method on a cache miss, defaults
+            to resolving it with the routes of the method.
+
+        Returns:
+          tuple or None: A tuple of three items:
+
+            1. Route handler (callable)
+            2. Positional arguments (list)
+            3. Keyword arguments (dict)
+
+          ``None`` if no route matches the request.
+        """
+        if len(path) > Router._cache_path_limit:
+            if match is None:
+                return self._resolve_non_literal_route(method, path)
+            return match(path)
+        key = method, path
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._cache_hits += 1
+                return self._cache[key]
+            self._cache_misses += 1
+            generation = self._cache_generation
+
+        if match is None:
+            callback_data = self._resolve_non_literal_route(method, path)
+        else:
+            callback_data = match(path)
+
+        with self._cache_lock:
+            # Do not save the result if a route was added meanwhile.
+            if generation == self._cache_generation:
+                self._cache[key] = callback_data
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+                    self._cache_evictions += 1
+        return callback_data
 
     def _resolve_non_literal_route(self, method, path):
         """Resolve a request to a wildcard or regex route handler.
@@ -448,10 +1180,9 @@ class Router:
         """
         for route_dict in (self._wildcard, self._regex):
             if method in route_dict:
-                for route in reversed(route_dict[method]):
-                    callback_data = route.match(path)
-                    if callback_data is not None:
-                        return callback_data
+                callback_data = route_dict[method].match(path)
+                if callback_data is not None:
+                    return callback_data
         return None
 
     @staticmethod
@@ -502,15 +1233,27 @@ class WildcardRoute:
         """
         self._re = []
         self._wildcards = []
+        self._segments = [[]]
         for token in WildcardRoute.tokens(pattern):
             if token and token.startswith('<') and token.endswith('>'):
                 w = Wildcard(token)
                 self._wildcards.append(w)
                 self._re.append(w.regex())
+                self._segments[-1].append((token, w))
             else:
                 self._re.append(re.escape(token))
+                if token == '/':
+                    self._segments.append([])
+                else:
+                    self._segments[-1].append((token, None))
         self._re = re.compile('^' + ''.join(self._re) + '$')
         self._callback = callback
+        self._converters = tuple((i, w.name, w.converter())
+                                 for i, w in enumerate(self._wildcards)
+                                 if w.name != '!')
+        self._validators = tuple((i, w.validator())
+                                 for i, w in enumerate(self._wildcards)
+                                 if w.validator() is not None)
 
     def match(self, path):
         """Return route handler with arguments if path matches this route.
@@ -525,23 +1268,76 @@ class WildcardRoute:
             2. Positional arguments (list)
             3. Keyword arguments (dict)
 
-          ``None`` if the route does not match the path.
+          ``None`` if the route does not match the path or if the
+          validator of a wildcard rejects the part of the path that it
+          matched.
         """
         match = self._re.search(path)
         if match is None:
             return None
+        groups = match.groups()
+        for i, validate in self._validators:
+            if not validate(groups[i]):
+                return None
         args = []
         kwargs = {}
-        for i, wildcard in enumerate(self._wildcards):
-            if wildcard.name == '!':
-                continue
-            value = wildcard.value(match.groups()[i])
-            if not wildcard.name:
-                args.append(value)
+        for i, name, convert in self._converters:
+            value = groups[i] if convert is None else convert(groups[i])
+            if name:
+                kwargs[name] = value
             else:
-                kwargs[wildcard.name] = value
+                args.append(value)
         return self._callback, args, kwargs
 
+    def segments(self):
+        """Return the pattern of this route split into path segments.
+
+        The pattern is split at every ``/`` in it. Each segment is
+        represented as a list of (token, wildcard) pairs where wildcard
+        is the :class:`Wildcard` object for a wildcard token and
+        ``None`` for any other token.
+
+        Returns:
+          list: List of segments.
+        """
+        return self._segments
+
+    def regex(self):
+        """Return the compiled regular expression of this route.
+
+        Returns:
+          re.Pattern: Regular expression that matches request paths
+          that match this route.
+        """
+        return self._re
+
+    def callback(self):
+        """Return the route handler.
+
+        Returns:
+          callable: Route handler.
+        """
+        return self._callback
+
+    def converters(self):
+        """Return converters for the groups of the regular expression.
+
+        Throwaway wildcards are left out. Every other wildcard is
+        represented by a tuple of three items:
+
+          1. Index of the wildcard's group in ``match.groups()``
+          2. Name of the wildcard, empty for anonymous wildcards
+          3. Function that converts the matched string to the value of
+             the wildcard, ``None`` if the string is the value
+
+        The tuple is built once when the route is created and is used
+        by :meth:`match` to extract the arguments of the route handler.
+
+        Returns:
+          tuple: Tuple of converters in the order of the wildcards.
+        """
+        return self._converters
+
     @staticmethod
     def like(pattern):
         """Determine if a pattern looks like a wildcard pattern.
@@ -565,14 +1361,18 @@ class Wildcard:
 
     """A single wildcard definition in a wildcard route pattern."""
 
-    _types_re = {
-        'str': r'([^/]+)',
-        'path': r'(.+)',
-        'int': r'(0|[1-9][0-9]*)',
-        '+int': r'([1-9][0-9]*)',
-        '-int': r'(0|-?[1-9][0-9]*)',
+    _Type = collections.namedtuple('_Type', ('regex', 'converter',
+                                             'validator', 'path'))
+
+    _types = {
+        'str': _Type(r'[^/]+', None, None, False),
+        'path': _Type(r'.+', None, None, True),
+        'int': _Type(r'0|[1-9][0-9]*', int, None, False),
+        '+int': _Type(r'[1-9][0-9]*', int, None, False),
+        '-int': _Type(r'0|-?[1-9][0-9]*', int, None, False),
     }
     _name_re = re.compile(r'^(?:[^\d\W]\w*|!|)$') # Identifiers, '!', ''
+    _type_re = re.compile(r'^[^<>/]+$')
 
     def __init__(self, spec):
         """Initialize wildcard definition.
@@ -590,9 +1390,66 @@ class Wildcard:
         if Wildcard._name_re.search(self.name) is None:
             raise RouteError('Invalid wildcard name {!r} in {!r}'
                              .format(self.name, spec))
-        if self._type not in Wildcard._types_re.keys():
+        if self._type not in Wildcard._types.keys():
             raise RouteError('Invalid wildcard type {!r} in {!r}'
                              .format(self._type, spec))
+        self._spec = Wildcard._types[self._type]
+
+    @staticmethod
+    def add_type(name, regex, converter=None, validator=None, path=False):
+        """Register a wildcard type.
+
+        Once registered, the type may be used in wildcard specifications
+        of routes added later, e.g. ``<id:sku>`` for a type named
+        ``sku``. The arguments are checked here, once, so that matching
+        request paths against the wildcard does not need to check them.
+
+        The regular expression must not contain capturing groups. Unless
+        *path* is ``True``, it must not match any string that contains
+        ``/``.
+
+        Arguments:
+          name (str): Name of the type.
+          regex (str): Regular expression that matches the strings
+            that the wildcard is meant to match.
+          converter (callable): Function that converts a matched string
+            to the value passed to the route handler, ``None`` (the
+            default) to pass the matched string itself.
+          validator (callable): Function that accepts a matched string
+            and returns ``True`` if the wildcard should match it and
+            ``False`` otherwise, ``None`` (the default) to accept every
+            string that the regular expression matches.
+          path (bool): Whether the wildcard may match strings across
+            path segments, defaults to ``False``.
+
+        Raises:
+          RouteError: If the type name is already registered or invalid,
+            if the regular expression is invalid or contains capturing
+            groups, or if the converter or the validator is not
+            callable.
+        """
+        if Wildcard._type_re.search(name) is None:
+            raise RouteError('Invalid wildcard type name {!r}'.format(name))
+        if name in Wildcard._types:
+            raise RouteError('Wildcard type {!r} is already registered'
+                             .format(name))
+        try:
+            groups = re.compile('(?:' + regex + ')').groups
+        except re.error as e:
+            raise RouteError('Invalid regular expression {!r} for wildcard '
+                             'type {!r}: {}'.format(regex, name, e))
+        if groups:
+            raise RouteError('Regular expression {!r} for wildcard type '
+                             '{!r} contains capturing groups'
+                             .format(regex, name))
+        for role, func in (('converter', converter),
+                           ('validator', validator)):
+            if func is not None and not callable(func):
+                raise RouteError('{} {!r} for wildcard type {!r} is not '
+                                 'callable'.format(role.capitalize(),
+                                                   func, name))
+        Wildcard._types[name] = Wildcard._Type(regex, converter, validator,
+                                               bool(path))
 
     def regex(self):
         """Convert the wildcard to a regular expression.
@@ -601,7 +1458,36 @@ class Wildcard:
           str: A regular expression that matches strings that the
           wildcard is meant to match.
           """
-        return Wildcard._types_re[self._type]
+        return '(' + self._spec.regex + ')'
+
+    def spans_segments(self):
+        """Determine if the wildcard can match a string containing ``/``.
+
+        Returns:
+          ``True`` if the wildcard can match across path segments,
+          ``False`` otherwise.
+        """
+        return self._spec.path
+
+    def converter(self):
+        """Return the function that converts values of the wildcard.
+
+        Returns:
+          callable or None: Function that converts a string matched by
+          the wildcard to a value of the wildcard type, ``None`` if the
+          string itself is the value.
+        """
+        return self._spec.converter
+
+    def validator(self):
+        """Return the function that validates values of the wildcard.
+
+        Returns:
+          callable or None: Function that returns ``True`` if a string
+          matched by the wildcard is valid and ``False`` otherwise,
+          ``None`` if every matched string is valid.
+        """
+        return self._spec.validator
 
     def value(self, value):
         """Convert specified value to a value of wildcard type.
@@ -619,27 +1505,146 @@ class Wildcard:
         Returns:
           str or int: Converted value.
         """
-        return value if self._type in ['str', 'path'] else int(value)
+        converter = self._spec.converter
+        return value if converter is None else converter(value)
 
+    @staticmethod
+    def _date(value):
+        """Convert a ``YYYY-MM-DD`` string to a date.
 
-class RegexRoute:
+        Arguments:
+          value (str): String matched by a ``date`` wildcard.
 
-    """A regular expression pattern."""
+        Returns:
+          datetime.date: Date.
 
-    _group_re = re.compile(r'\(.*\)')
+        Raises:
+          ValueError: If the string is not a valid date.
+        """
+        return datetime.date(int(value[:4]), int(value[5:7]),
+                             int(value[8:]))
 
-    def __init__(self, pattern, callback):
-        """Initialize regular expression route.
+    @staticmethod
+    def _valid_date(value):
+        """Check if a ``YYYY-MM-DD`` string is a valid date.
 
         Arguments:
-          pattern (str): Pattern associated with the route.
-          callback (callable): Route handler.
+          value (str): String matched by a ``date`` wildcard.
+
+        Returns:
+          ``True`` if the string is a valid date, ``False`` otherwise.
         """
-        self._re = re.compile(pattern)
-        self._callback = callback
+        try:
+            Wildcard._date(value)
+        except ValueError:
+            return False
+        return True
+
+
+Wildcard.add_type('uuid', r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-'
+                          r'[0-9a-fA-F]{4}-[0-9a-fA-F]{12}', uuid.UUID)
+Wildcard.add_type('hex', r'[0-9a-fA-F]+')
+Wildcard.add_type('date', r'[0-9]{4}-[0-9]{2}-[0-9]{2}', Wildcard._date,
+                  Wildcard._valid_date)
+Wildcard.add_type('slug', r'[-a-zA-Z0-9_]+')
+
+
+class WildcardTrie:
+
+    """Wildcard routes of an HTTP method organized as a segment trie.
+
+    Every route pattern is split into path segments at ``/``. A segment
+    without wildcards is an edge that is followed with a dictionary
+    lookup. A segment with wildcards is an edge that is followed if the
+    corresponding segment of the request path matches a regular
+    expression compiled for that segment alone and the validators of
+    its wildcards, if any, accept it. The remainder of a
+    pattern from a segment with a ``path`` wildcard onwards may match
+    any number of request path segments, so it is kept as a single
+    regular expression at the node where it begins.
+
+    Thus the cost of resolving a request path grows with the depth of
+    the path rather than with the number of routes. When more than one
+    route matches a request path, the route added last wins, exactly as
+    it would if the routes were tried one by one in reverse order.
+    """
+
+    class _Node:
+
+        """A node of the trie."""
+
+        __slots__ = ('literal', 'pattern', 'tails', 'routes', 'last')
+
+        def __init__(self):
+            """Initialize an empty node."""
+            self.literal = {}
+            self.pattern = {}
+            self.tails = []
+            self.routes = []
+            self.last = -1
+
+    def __init__(self):
+        """Initialize an empty trie."""
+        self._root = WildcardTrie._Node()
+        self._routes = []
+
+    def add(self, route):
+        """Add a route to the trie.
+
+        Arguments:
+          route (WildcardRoute): Route to add.
+        """
+        index = len(self._routes)
+        self._routes.append(route)
+        node = self._root
+        node.last = index
+        segments = route.segments()
+        for i, segment in enumerate(segments):
+            if any(w is not None and w.spans_segments()
+                   for _, w in segment):
+                node.tails.append((index,
+                                   WildcardTrie._matcher(segments[i:]),
+                                   route))
+                return
+            if all(w is None for _, w in segment):
+                key = ''.join(token for token, _ in segment)
+                if key not in node.literal:
+                    node.literal[key] = WildcardTrie._Node()
+                node = node.literal[key]
+            else:
+                key = (WildcardTrie._segment_regex(segment),
+                       tuple(w.validator() for _, w in segment
+                             if w is not None))
+                if key not in node.pattern:
+                    node.pattern[key] = (WildcardTrie._matcher([segment]),
+                                         WildcardTrie._Node())
+                node = node.pattern[key][1]
+            node.last = index
+        node.routes.append((index, route))
+
+    def find(self, path):
+        """Return the route that matches the specified path.
+
+        Arguments:
+          path (str): Request path
+
+        Returns:
+          WildcardRoute or None: The last added route that matches the
+          request path, ``None`` if no route matches it.
+        """
+        if '\n' in path:
+            # The $ at the end of the regular expression of a route also
+            # matches just before a trailing newline, which the segment
+            # by segment walk does not model, so try the routes in order.
+            for route in reversed(self._routes):
+                if route.match(path) is not None:
+                    return route
+            return None
+        return WildcardTrie._search(self._root, path.split('/'), 0,
+                                    (-1, None))[1]
 
     def match(self, path):
-        """Return route handler with arguments if path matches this route.
+        """Return route handler with arguments if a route matches path.
 
         Arguments:
           path (str): Request path
@@ -651,47 +1656,649 @@ class RegexRoute:
             2. Positional arguments (list)
             3. Keyword arguments (dict)
 
-          ``None`` if the route does not match the path.
+          ``None`` if no route matches the path.
         """
-        match = self._re.search(path)
-        if match is None:
-            return None
-        kwargs_indexes = match.re.groupindex.values()
-        args_indexes = [i for i in range(1, match.re.groups + 1)
-                          if i not in kwargs_indexes]
-        args = [match.group(i) for i in args_indexes]
-        kwargs = {}
-        for name, index in match.re.groupindex.items():
-            kwargs[name] = match.group(index)
-        return self._callback, args, kwargs
+        route = self.find(path)
+        return None if route is None else route.match(path)
 
-    @staticmethod
-    def like(pattern):
-        """Determine if a pattern looks like a regular expression.
+    def find_all(self, path):
+        """Return all routes that match the specified path.
 
         Arguments:
-          pattern (str): Any route pattern.
+          path (str): Request path
 
         Returns:
-          ``True`` if the specified pattern looks like a regex,
-          ``False`` otherwise.
+          list: List of routes that match the request path in no
+          particular order.
         """
-        return RegexRoute._group_re.search(pattern) is not None
+        if '\n' in path:
+            return [route for route in self._routes
+                    if route.match(path) is not None]
+        found = []
+        WildcardTrie._collect(self._root, path.split('/'), 0, found)
+        return found
 
+    def routes(self):
+        """Return the routes in the trie in the order they were added.
 
-class Request:
+        Returns:
+          list: List of routes.
+        """
+        return list(self._routes)
 
-    """Current request.
+    @staticmethod
+    def _search(node, segments, i, best):
+        """Return the best match for segments[i:] under a node.
 
-    Attributes:
-      environ (dict): Dictionary of request environment variables.
-      method (str): Request method.
+        Arguments:
+          node (WildcardTrie._Node): Node to search under.
+          segments (list): Segments of the request path.
+          i (int): Index of the first segment yet to be matched.
+          best (tuple): Index and route of the best match so far.
+
+        Returns:
+          tuple: Index and route of the best match found, *best* if no
+          better match was found.
+        """
+        if i == len(segments):
+            if node.routes and node.routes[-1][0] > best[0]:
+                best = node.routes[-1]
+            return best
+        if node.tails:
+            rest = '/'.join(segments[i:])
+            for index, fullmatch, route in node.tails:
+                if index > best[0] and fullmatch(rest) is not None:
+                    best = index, route
+        segment = segments[i]
+        child = node.literal.get(segment)
+        if child is not None and child.last > best[0]:
+            best = WildcardTrie._search(child, segments, i + 1, best)
+        for fullmatch, child in node.pattern.values():
+            if child.last > best[0] and fullmatch(segment) is not None:
+                best = WildcardTrie._search(child, segments, i + 1, best)
+        return best
+
+    @staticmethod
+    def _collect(node, segments, i, found):
+        """Collect all routes that match segments[i:] under a node.
+
+        Arguments:
+          node (WildcardTrie._Node): Node to search under.
+          segments (list): Segments of the request path.
+          i (int): Index of the first segment yet to be matched.
+          found (list): List to append the matching routes to.
+        """
+        if i == len(segments):
+            found.extend(route for _, route in node.routes)
+            return
+        if node.tails:
+            rest = '/'.join(segments[i:])
+            found.extend(route for _, fullmatch, route in node.tails
+                         if fullmatch(rest) is not None)
+        child = node.literal.get(segments[i])
+        if child is not None:
+            WildcardTrie._collect(child, segments, i + 1, found)
+        for fullmatch, child in node.pattern.values():
+            if fullmatch(segments[i]) is not None:
+                WildcardTrie._collect(child, segments, i + 1, found)
+
+    @staticmethod
+    def _matcher(segments):
+        """Return a function that matches consecutive pattern segments.
+
+        The returned function accepts a string and returns a match
+        object if the whole string matches the segments joined with
+        ``/`` and the validators of their wildcards accept the matched
+        strings, ``None`` otherwise.
+
+        Arguments:
+          segments (list): List of segments, each a list of
+            (token, wildcard) pairs.
+
+        Returns:
+          callable: Function that matches the segments.
+        """
+        regex = '/'.join(WildcardTrie._segment_regex(s) for s in segments)
+        fullmatch = re.compile(regex).fullmatch
+        wildcards = [w for s in segments for _, w in s if w is not None]
+        checks = tuple((i, w.validator()) for i, w in enumerate(wildcards)
+                       if w.validator() is not None)
+        if not checks:
+            return fullmatch
+
+        def match(string):
+            match = fullmatch(string)
+            if match is None:
+                return None
+            groups = match.groups()
+            for i, validate in checks:
+                if not validate(groups[i]):
+                    return None
+            return match
+
+        return match
+
+    @staticmethod
+    def _segment_regex(segment):
+        """Return a regular expression that matches a pattern segment.
+
+        Arguments:
+          segment (list): List of (token, wildcard) pairs.
+
+        Returns:
+          str: Regular expression for the segment.
+        """
+        return ''.join(re.escape(token) if w is None else w.regex()
+                       for token, w in segment)
+
+
+class RegexRoute:
+
+    """A regular expression pattern."""
+
+    _group_re = re.compile(r'\(.*\)')
+
+    # Tokens of a regular expression that matter when the expression is
+    # embedded in a larger one: escapes, character classes, constructs
+    # that refer to groups by name or number, and global inline flags.
+    _token_re = re.compile(r'''
+        (?P<backref>\\[1-9] | \(\?P=\w+\) | \(\?\()
+      | (?P<flags>\(\?[aiLmsux]+\))
+      | (?P<named>\(\?P<\w+>)
+      | \\. | \[\^?\]?(?:\\.|[^\]\\])*\] | .
+    ''', re.VERBOSE | re.DOTALL)
+
+    def __init__(self, pattern, callback):
+        """Initialize regular expression route.
+
+        Arguments:
+          pattern (str): Pattern associated with the route.
+          callback (callable): Route handler.
+        """
+        self._re = re.compile(pattern)
+        self._callback = callback
+        kwargs_indexes = self._re.groupindex.values()
+        self._args_indexes = tuple(i for i in range(1, self._re.groups + 1)
+                                   if i not in kwargs_indexes)
+        self._kwargs_indexes = tuple(self._re.groupindex.items())
+
+    def match(self, path):
+        """Return route handler with arguments if path matches this route.
+
+        Arguments:
+          path (str): Request path
+
+        Returns:
+          tuple or None: A tuple of three items:
+
+            1. Route handler (callable)
+            2. Positional arguments (list)
+            3. Keyword arguments (dict)
+
+          ``None`` if the route does not match the path.
+        """
+        match = self._re.search(path)
+        if match is None:
+            return None
+        return self.extract(match)
+
+    def extract(self, match, offset=0):
+        """Return route handler with arguments from a match object.
+
+        The match object may come from a larger regular expression in
+        which the groups of this route's regular expression appear
+        after *offset* other groups.
+
+        Arguments:
+          match (re.Match): Match object.
+          offset (int, optional): Number of groups that precede the
+            groups of this route in the match object, defaults to 0.
+
+        Returns:
+          tuple: A tuple of three items:
+
+            1. Route handler (callable)
+            2. Positional arguments (list)
+            3. Keyword arguments (dict)
+        """
+        args = [match.group(i + offset) for i in self._args_indexes]
+        kwargs = {}
+        for name, index in self._kwargs_indexes:
+            kwargs[name] = match.group(index + offset)
+        return self._callback, args, kwargs
+
+    def regex(self):
+        """Return the compiled regular expression of this route.
+
+        Returns:
+          re.Pattern: Regular expression of this route.
+        """
+        return self._re
+
+    def groups(self):
+        """Return the number of capturing groups in the pattern.
+
+        Returns:
+          int: Number of capturing groups.
+        """
+        return self._re.groups
+
+    def embeddable(self):
+        """Return the pattern in a form that can be embedded in another.
+
+        Named groups are turned into unnamed groups, so that the same
+        group name may occur in more than one embedded pattern. Group
+        numbers remain unchanged. A pattern that refers to a group by
+        name or number, or that sets global inline flags, cannot be
+        embedded in another pattern without changing its meaning.
+
+        Returns:
+          str or None: Pattern with unnamed groups, ``None`` if the
+          pattern cannot be embedded.
+        """
+        out = []
+        for m in RegexRoute._token_re.finditer(self._re.pattern):
+            if m.lastgroup in ('backref', 'flags'):
+                return None
+            out.append('(' if m.lastgroup == 'named' else m.group())
+        return ''.join(out)
+
+    def anchored(self):
+        """Determine if the pattern can match at the start of a path only.
+
+        Returns:
+          ``True`` if the pattern begins with ``^`` or ``\\A`` and has no
+          top-level alternation, ``False`` otherwise.
+        """
+        if not self._re.pattern.startswith(('^', '\\A')):
+            return False
+        depth = 0
+        for m in RegexRoute._token_re.finditer(self._re.pattern):
+            token = m.group()
+            if m.lastgroup in ('backref', 'flags'):
+                return False
+            elif m.lastgroup == 'named' or token == '(':
+                depth += 1
+            elif token == ')':
+                depth -= 1
+            elif token == '|' and depth == 0:
+                return False
+        return True
+
+    def prefix(self):
+        """Return the literal text that every matching path starts with.
+
+        The literal text at the start of an anchored pattern is cut
+        after its last ``/``, so that a request path can be looked up
+        with one prefix per ``/`` in it. A character followed by a
+        quantifier that makes it optional ends the literal text, as does
+        any character or escape sequence that may match more than one
+        string.
+
+        Returns:
+          str: Literal prefix of the pattern that ends with ``/``, an
+          empty string if there is none.
+        """
+        if not self.anchored():
+            return ''
+        tokens = [m.group() if m.lastgroup is None else None
+                  for m in RegexRoute._token_re.finditer(self._re.pattern)]
+        tokens.append('')
+        out = []
+        for i in range(1, len(tokens) - 1):
+            token = tokens[i]
+            if token is None:
+                break
+            elif len(token) == 1 and token not in '.^$*+?{}[]()|':
+                char = token
+            elif (len(token) == 2 and token[0] == '\\' and
+                  not token[1].isalnum()):
+                char = token[1]
+            else:
+                break
+            if tokens[i + 1] in ('*', '?', '{'):
+                break
+            out.append(char)
+            if tokens[i + 1] == '+':
+                break
+        prefix = ''.join(out)
+        return prefix[:prefix.rfind('/') + 1]
+
+    @staticmethod
+    def like(pattern):
+        """Determine if a pattern looks like a regular expression.
+
+        Arguments:
+          pattern (str): Any route pattern.
+
+        Returns:
+          ``True`` if the specified pattern looks like a regex,
+          ``False`` otherwise.
+        """
+        return RegexRoute._group_re.search(pattern) is not None
+
+
+class RegexTable:
+
+    """Regular expression routes of an HTTP method.
+
+    The routes are tried in reverse order of their addition, so that the
+    route added last wins when more than one route matches a path.
+
+    If *combine* is ``True``, consecutive routes (in the order they are
+    tried) are merged into a single regular expression that is an
+    alternation of the routes' patterns. Each alternative that is not
+    anchored at the start of the path is prefixed with a lazy match of
+    any characters, including newlines, so that a match at position 0
+    of the combined expression finds exactly what a search with the
+    earliest route that matches would find. Each alternative is
+    suffixed with an empty marker group that identifies the route. The
+    groups of the route are then mapped back to the same arguments that
+    :meth:`RegexRoute.match` returns. Routes whose patterns cannot be
+    embedded (see :meth:`RegexRoute.embeddable`) are tried on their own
+    at their position in the order.
+
+    If *combine* is ``False`` and *prefilter* is ``True``, the routes
+    are put in buckets by their literal prefix (see
+    :meth:`RegexRoute.prefix`). A path is searched only with the routes
+    in the buckets of the prefixes it starts with, still in reverse
+    order of their addition.
+    """
+
+    def __init__(self, combine=False, prefilter=True):
+        """Initialize an empty table.
+
+        Arguments:
+          combine (bool, optional): Whether to combine routes into a
+            single regular expression, defaults to ``False``.
+          prefilter (bool, optional): Whether to search only the routes
+            whose literal prefix the path starts with, defaults to
+            ``True``.
+        """
+        self._routes = []
+        self._combine = combine
+        self._chunks = None
+        self._prefilter = prefilter
+        self._buckets = {}
+        self._lengths = ()
+        self._searches = 0
+        self._evaluated = 0
+        self._unfiltered = 0
+
+    def add(self, route):
+        """Add a route to the table.
+
+        Arguments:
+          route (RegexRoute): Route to add.
+        """
+        index = len(self._routes)
+        self._routes.append(route)
+        self._chunks = None
+        prefix = route.prefix()
+        self._buckets.setdefault(prefix, []).append((index, route))
+        self._lengths = tuple(sorted({len(p) for p in self._buckets}))
+
+    def compile(self):
+        """Combine the routes now rather than on the next match.
+
+        This has no effect unless the table combines routes.
+        """
+        if self._combine and self._chunks is None:
+            self._chunks = self._build()
+
+    def matcher(self):
+        """Return a function that matches paths with the current routes.
+
+        The returned function returns what :meth:`match` would return
+        for a path, but it is specialized for the routes added so far.
+        For every literal prefix, the routes of all the prefixes that
+        it starts with are merged in advance into one tuple in the
+        order they are tried, so a path is searched with the routes
+        found by a single lookup of the longest prefix it starts with.
+        The searches are not counted in :meth:`info`, and routes added
+        to the table later are ignored.
+
+        Returns:
+          callable: Function that accepts a request path.
+        """
+        if self._combine:
+            self.compile()
+            return self.match
+        if self._prefilter:
+            merged = {}
+            for prefix in self._buckets:
+                found = [entry for p, bucket in self._buckets.items()
+                         if prefix.startswith(p) for entry in bucket]
+                merged[prefix] = tuple(route.match for _, route
+                                       in sorted(found, reverse=True))
+            lengths = tuple(reversed(self._lengths))
+        else:
+            merged = {'': tuple(route.match
+                                for route in reversed(self._routes))}
+            lengths = (0,)
+
+        def match(path):
+            for length in lengths:
+                routes = merged.get(path[:length])
+                if routes is not None:
+                    break
+            else:
+                return None
+            for route_match in routes:
+                callback_data = route_match(path)
+                if callback_data is not None:
+                    return callback_data
+            return None
+
+        return match
+
+    def match(self, path):
+        """Return route handler with arguments if a route matches path.
+
+        Arguments:
+          path (str): Request path
+
+        Returns:
+          tuple or None: A tuple of three items:
+
+            1. Route handler (callable)
+            2. Positional arguments (list)
+            3. Keyword arguments (dict)
+
+          ``None`` if no route matches the path.
+        """
+        if not self._combine:
+            if self._prefilter:
+                candidates = self._candidates(path)
+            else:
+                candidates = zip(range(len(self._routes) - 1, -1, -1),
+                                 reversed(self._routes))
+            self._searches += 1
+            evaluated = 0
+            for evaluated, (index, route) in enumerate(candidates, 1):
+                callback_data = route.match(path)
+                if callback_data is not None:
+                    self._evaluated += evaluated
+                    self._unfiltered += len(self._routes) - index
+                    return callback_data
+            self._evaluated += evaluated
+            self._unfiltered += len(self._routes)
+            return None
+
+        chunks = self._chunks
+        if chunks is None:
+            chunks = self._chunks = self._build()
+        for combined, markers in chunks:
+            if markers is None:
+                callback_data = combined.match(path)
+                if callback_data is not None:
+                    return callback_data
+            else:
+                match = combined.match(path)
+                if match is not None:
+                    route, offset = markers[match.lastindex]
+                    return route.extract(match, offset)
+        return None
+
+    def info(self):
+        """Return statistics of the searches of this table.
+
+        Returns:
+          tuple: The number of searches, the number of regular
+          expressions evaluated by them and the number that would have
+          been evaluated without the prefix index.
+        """
+        return self._searches, self._evaluated, self._unfiltered
+
+    def _candidates(self, path):
+        """Return the routes whose literal prefix the path starts with.
+
+        Arguments:
+          path (str): Request path
+
+        Returns:
+          iterable: Pairs of index and route in reverse order of their
+          addition.
+        """
+        buckets = self._buckets
+        found = []
+        for length in self._lengths:
+            bucket = buckets.get(path[:length])
+            if bucket is not None:
+                found.append(bucket)
+        if len(found) == 1:
+            return reversed(found[0])
+        return sorted(itertools.chain.from_iterable(found), reverse=True)
+
+    def _build(self):
+        """Merge the routes into combined regular expressions.
+
+        Returns:
+          list: List of (matcher, markers) pairs in the order they must
+          be tried. For a combined regular expression, markers maps the
+          index of each marker group to the route and its group offset.
+          For a route that is tried on its own, matcher is the route
+          itself and markers is ``None``.
+        """
+        chunks = []
+        pending = []
+        for route in reversed(self._routes):
+            pattern = route.embeddable()
+            if pattern is None:
+                chunks.extend(RegexTable._merge(pending))
+                pending = []
+                chunks.append((route, None))
+            else:
+                pending.append((route, pattern))
+        chunks.extend(RegexTable._merge(pending))
+        return chunks
+
+    @staticmethod
+    def _merge(pending):
+        """Merge routes with embeddable patterns into one expression.
+
+        Arguments:
+          pending (list): List of (route, embeddable pattern) pairs.
+
+        Returns:
+          list: List of (matcher, markers) pairs, see :meth:`_build`.
+        """
+        if len(pending) < 2:
+            return [(route, None) for route, _ in pending]
+        alternatives = []
+        markers = {}
+        offset = 0
+        for route, pattern in pending:
+            if not route.anchored():
+                pattern = r'[\s\S]*?(?:' + pattern + ')'
+            alternatives.append('(?:' + pattern + ')()')
+            markers[offset + route.groups() + 1] = route, offset
+            offset += route.groups() + 1
+        try:
+            combined = re.compile('|'.join(alternatives))
+        except re.error:
+            return [(route, None) for route, _ in pending]
+        return [(combined, markers)]
+
+
+class Request:
+
+    """Current request.
+
+    The query string, the form data, the JSON body and the cookies are
+    parsed when :attr:`query`, :attr:`form`, :attr:`json` and
+    :attr:`cookies` are first accessed, so a request handler that does
+    not use them does not pay for parsing them. Likewise, the
+    :attr:`headers` view is created on first access.
+
+    The class attributes :attr:`chunk_size`, :attr:`max_body_size`,
+    :attr:`max_json_size`, :attr:`max_ndjson_line_size`,
+    :attr:`max_form_size`, :attr:`max_form_parts`,
+    :attr:`max_form_field_size` and :attr:`form_spool_size` control how
+    the request body is read. They may be
+    changed on this class, on a subclass or on an instance before
+    :attr:`form` is accessed. Likewise, the class attributes
+    :attr:`max_query_params`, :attr:`max_cookies` and
+    :attr:`max_header_size` limit the cost of parsing the rest of the
+    request.
+
+    Attributes:
+      environ (dict): Dictionary of request environment variables.
+      method (str): Request method.
       path (str): Request path.
-      query (MultiDict): Key-value pairs from query string.
-      form (MultiDict): Key-value pairs from form data in POST request.
-      cookies (MultiDict): Key-value pairs from cookie string.
+      chunk_size (int): Maximum number of bytes read from the request
+        body at a time, defaults to 64 KiB.
+      query_cache (QueryCache): Cache that :attr:`query` is looked up
+        in, ``None`` (the default) for no cache. The application sets it
+        for each request to its own cache, if any.
+      max_body_size (int): Maximum size of a request body that is read
+        in bytes, ``None`` (the default) for no limit. The application
+        sets it for each request to the limit that applies to the
+        route, if any.
+      max_json_size (int): Maximum size of a request body that is
+        decoded as JSON in bytes, defaults to 1 MiB.
+      max_ndjson_line_size (int): Maximum length of a line of a
+        newline-delimited JSON body in bytes, defaults to 1 MiB.
+      max_form_size (int): Maximum size of a request body that is
+        parsed as form data in bytes, ``None`` (the default) for no
+        limit.
+      max_form_parts (int): Maximum number of fields in form data,
+        defaults to 1000.
+      max_form_field_size (int): Maximum size of a form field that is
+        not a file in bytes, defaults to 1 MiB.
+      form_spool_size (int): Size in bytes beyond which an uploaded file
+        is moved from memory to a temporary file, defaults to 1 MiB.
+      max_query_params (int): Maximum number of parameters in the query
+        string, defaults to 1000.
+      max_cookies (int): Maximum number of cookies in the Cookie header,
+        defaults to 200.
+      max_header_size (int): Maximum total size of the HTTP request
+        headers in bytes, ``None`` (the default) for no limit. The
+        application answers a request with larger headers with 431
+        Request Header Fields Too Large before calling the route
+        handler.
     """
 
+    chunk_size = 64 * 1024
+    query_cache = None
+    max_body_size = None
+    max_json_size = 1024 * 1024
+    max_ndjson_line_size = 1024 * 1024
+    max_form_size = None
+    max_form_parts = 1000
+    max_form_field_size = 1024 * 1024
+    form_spool_size = 1024 * 1024
+    max_query_params = 1000
+    max_cookies = 200
+    max_header_size = None
+
+    # Marks a lazily computed value that has not been computed yet where
+    # None is a valid value.
+    _missing = object()
+
+    _ndjson_types = frozenset(('application/x-ndjson', 'application/ndjson',
+                               'application/jsonl'))
+
     def __init__(self, environ):
         """Initialize the current request object.
 
@@ -703,25 +2310,986 @@ class Request:
         self.path = environ.get('PATH_INFO', '/')
         if not self.path:
             self.path = '/'
-        self.query = MultiDict()
-        self.form = MultiDict()
-        self.cookies = MultiDict()
-
-        if 'QUERY_STRING' in environ:
-            for k, v in urllib.parse.parse_qsl(environ['QUERY_STRING']):
-                self.query[k] = v
-
-        if 'wsgi.input' in environ:
-            fs = cgi.FieldStorage(fp=environ['wsgi.input'],
-                                  environ=environ)
-            for k in fs:
-                for v in fs.getlist(k):
-                    self.form[k] = v
-
-        if 'HTTP_COOKIE' in environ:
-            cookies = http.cookies.SimpleCookie(environ['HTTP_COOKIE'])
-            for c in cookies.values():
-                self.cookies[c.key] = c.value
+        self._query = None
+        self._form = None
+        self._cookies = None
+        self._headers = None
+        self._json = Request._missing
+        self._remaining = None
+
+    @property
+    def query(self):
+        """Key-value pairs from query string (MultiDict).
+
+        If :attr:`query_cache` is set, the parsed query string is looked
+        up in it first.
+
+        Raises:
+          RequestError: If the query string has more than
+            :attr:`max_query_params` parameters.
+        """
+        if self._query is None:
+            query_string = self.environ.get('QUERY_STRING', '')
+            if self.query_cache is None:
+                self._query = self.parse_query(query_string,
+                                               self.max_query_params)
+            else:
+                self._query = self.query_cache.get(
+                    query_string, functools.partial(
+                        self.parse_query,
+                        max_params=self.max_query_params))
+        return self._query
+
+    @staticmethod
+    def parse_query(query_string, max_params=None):
+        """Parse a query string.
+
+        The separators in the query string are counted before it is
+        parsed, so a query string with too many parameters is rejected
+        without decoding any of them.
+
+        Arguments:
+          query_string (str): Raw query string, e.g. ``'a=foo&b=bar'``.
+          max_params (int, optional): Maximum number of parameters,
+            ``None`` (the default) for no limit.
+
+        Returns:
+          MultiDict: Key-value pairs from the query string.
+
+        Raises:
+          RequestError: With status 400 if the query string has more
+            than *max_params* parameters.
+        """
+        if (max_params is not None and
+                query_string.count('&') >= max_params):
+            raise RequestError(400, 'Query string has more than {} '
+                                    'parameters'.format(max_params))
+        query = MultiDict()
+        for k, v in urllib.parse.parse_qsl(query_string):
+            query[k] = v
+        return query
+
+    @property
+    def form(self):
+        """Key-value pairs from form data in POST request (MultiDict).
+
+        The request body is parsed as ``multipart/form-data`` or as
+        ``application/x-www-form-urlencoded`` data, the latter if the
+        request has no Content-Type header. See :class:`FormParser` for
+        details. The body of a request with any other content type is
+        not read.
+
+        The parameters of the query string are added before the fields
+        of the request body, subject to the same limits. A form
+        submitted with the GET method is sent in the query string, so
+        for a GET or HEAD request, the request body is not read.
+
+        Raises:
+          RequestError: If the form data is too large or malformed.
+        """
+        if self._form is None:
+            self._form = MultiDict()
+            parser = FormParser(self._form, self.max_form_parts,
+                                self.max_form_field_size,
+                                self.form_spool_size)
+            # WSGI strings hold the original bytes as latin-1.
+            query_string = self.environ.get('QUERY_STRING', '')
+            parser.parse_urlencoded(
+                [query_string.encode('latin-1', 'replace')])
+            if self.method not in ('GET', 'HEAD'):
+                content_type = self.environ.get('CONTENT_TYPE', '')
+                media_type, options = FormParser.parse_options(content_type)
+                if media_type == 'multipart/form-data':
+                    boundary = options.get('boundary', '')
+                    parser.parse_multipart(
+                        self._body_chunks(self.max_form_size),
+                        boundary.encode('latin-1'))
+                elif media_type in ('', 'application/x-www-form-urlencoded'):
+                    parser.parse_urlencoded(
+                        self._body_chunks(self.max_form_size))
+        return self._form
+
+    @property
+    def cookies(self):
+        """Key-value pairs from cookie string (MultiDict).
+
+        Quoted cookie values are unquoted when they are looked up. A
+        malformed cookie in the Cookie header is skipped.
+
+        Raises:
+          RequestError: If the Cookie header has more than
+            :attr:`max_cookies` cookies.
+        """
+        if self._cookies is None:
+            self._cookies = _Cookies()
+            if 'HTTP_COOKIE' in self.environ:
+                self._cookies.parse(self.environ['HTTP_COOKIE'],
+                                    self.max_cookies)
+        return self._cookies
+
+    @property
+    def header_size(self):
+        """Total size of the HTTP request headers in bytes (int).
+
+        Each header is counted as a ``Name: value`` line ending with
+        CRLF.
+        """
+        size = 0
+        for key, value in self.environ.items():
+            if key.startswith('HTTP_'):
+                size += len(key) + len(value) - 1
+            elif key in Headers._unprefixed:
+                size += len(key) + len(value) + 4
+        return size
+
+    @property
+    def headers(self):
+        """HTTP request headers (Headers).
+
+        It is a read-only view of :attr:`environ` that looks up header
+        names case-insensitively, e.g. ``headers['User-Agent']``. It
+        includes the Content-Type and Content-Length headers.
+        """
+        if self._headers is None:
+            self._headers = Headers(self.environ)
+        return self._headers
+
+    def close(self):
+        """Close the files uploaded with the request.
+
+        The application calls this method after the route handler
+        returns, so a handler that needs the content of an uploaded file
+        later must copy it.
+        """
+        if self._form is not None:
+            for key in self._form:
+                for value in self._form.getall(key):
+                    if isinstance(value, FileUpload):
+                        value.file.close()
+
+    @property
+    def content_length(self):
+        """Length of the request body in bytes (int).
+
+        It is the value of the CONTENT_LENGTH environment variable, 0 if
+        it is missing or invalid.
+        """
+        try:
+            return max(int(self.environ.get('CONTENT_LENGTH') or 0), 0)
+        except ValueError:
+            return 0
+
+    @property
+    def stream(self):
+        """Iterator over chunks of the request body (iterator).
+
+        At most :attr:`content_length` bytes are read from
+        ``wsgi.input`` in chunks of at most :attr:`chunk_size` bytes,
+        so the body is never held in memory as a whole. Reading stops
+        early if the input ends before that. The body can be read only
+        once, either with this iterator or as :attr:`form`.
+
+        Raises:
+          RequestError: If the request body is larger than
+            :attr:`max_body_size`, before any of it is read.
+        """
+        return self._body_chunks()
+
+    @property
+    def json(self):
+        """Value decoded from a JSON request body (object).
+
+        The body is read and decoded when this property is first
+        accessed and the value is cached. The body is decoded directly
+        from bytes, so it may be encoded as UTF-8, UTF-16 or UTF-32.
+        The Content-Type of the request must be ``application/json`` or
+        a media type with the ``+json`` suffix. Such a body is never
+        parsed as :attr:`form`.
+
+        Raises:
+          RequestError: With status 415 if the request has another
+            content type, with status 413 if the body is larger than
+            :attr:`max_json_size` or :attr:`max_body_size`, before any
+            of it is read, and with status 400 if the body is not valid
+            JSON.
+        """
+        if self._json is Request._missing:
+            media_type, _ = FormParser.parse_options(
+                self.environ.get('CONTENT_TYPE', ''))
+            if (media_type != 'application/json' and
+                    not media_type.endswith('+json')):
+                raise RequestError(415, 'Expected JSON request body, got '
+                                   'content type {!r}'.format(media_type))
+            body = b''.join(self._body_chunks(self.max_json_size))
+            try:
+                self._json = json.loads(body)
+            except ValueError as e:
+                raise RequestError(400, 'Invalid JSON request body: {}'
+                                   .format(e))
+        return self._json
+
+    @property
+    def ndjson(self):
+        """Iterator over records of a newline-delimited JSON body (iterator).
+
+        The request body is read in chunks as the iterator advances and
+        each line is decoded as JSON as soon as it is complete, so a
+        handler may process the records while the body is still being
+        received, with memory bounded by :attr:`max_ndjson_line_size`.
+        Blank lines are skipped. The Content-Type of the request must be
+        ``application/x-ndjson``, ``application/ndjson`` or
+        ``application/jsonl``.
+
+        Raises:
+          RequestError: With status 415 if the request has another
+            content type, with status 413 if a line is longer than
+            :attr:`max_ndjson_line_size` or the body is larger than
+            :attr:`max_body_size`, and with status 400 if a line is not
+            valid JSON.
+        """
+        media_type, _ = FormParser.parse_options(
+            self.environ.get('CONTENT_TYPE', ''))
+        if media_type not in Request._ndjson_types:
+            raise RequestError(415, 'Expected newline-delimited JSON '
+                               'request body, got content type {!r}'
+                               .format(media_type))
+        return self._ndjson_records()
+
+    def _ndjson_records(self):
+        """Read and decode the records of a newline-delimited JSON body.
+
+        Yields:
+          object: Value decoded from the next non-blank line.
+        """
+        limit = self.max_ndjson_line_size
+        rest = b''
+        number = 0
+        for chunk in self._body_chunks():
+            lines = (rest + chunk).split(b'\n')
+            rest = lines.pop()
+            for line in lines:
+                number += 1
+                if line.strip():
+                    yield Request._decode_ndjson_line(line, number, limit)
+            if len(rest) > limit:
+                raise RequestError(413, 'Line {} exceeds limit of {} bytes'
+                                   .format(number + 1, limit))
+        if rest.strip():
+            yield Request._decode_ndjson_line(rest, number + 1, limit)
+
+    @staticmethod
+    def _decode_ndjson_line(line, number, limit):
+        """Decode a line of a newline-delimited JSON body.
+
+        Arguments:
+          line (bytes): Line without its line terminator.
+          number (int): Line number, starting at 1.
+          limit (int): Maximum length of the line in bytes.
+
+        Returns:
+          object: Value decoded from the line.
+        """
+        if len(line) > limit:
+            raise RequestError(413, 'Line {} exceeds limit of {} bytes'
+                               .format(number, limit))
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            raise RequestError(400, 'Invalid JSON in line {}: {}'
+                               .format(number, e))
+
+    def _body_chunks(self, limit=None):
+        """Read the request body in chunks.
+
+        Arguments:
+          limit (int, optional): Maximum size of the request body in
+            bytes that applies in addition to :attr:`max_body_size`.
+
+        Yields:
+          bytes: Next chunk of the request body.
+
+        Raises:
+          RequestError: If the request body is too large, before any of
+            it is read.
+        """
+        length = self.content_length
+        for limit in (self.max_body_size, limit):
+            if limit is not None and length > limit:
+                raise RequestError(413, 'Request body of {} bytes exceeds '
+                                   'limit of {} bytes'.format(length, limit))
+        if self._remaining is None:
+            self._remaining = length
+        stream = self.environ.get('wsgi.input')
+        if stream is None:
+            return
+        while self._remaining > 0:
+            chunk = stream.read(min(self._remaining, self.chunk_size))
+            if not chunk:
+                self._remaining = 0
+                return
+            self._remaining -= len(chunk)
+            yield chunk
+
+
+class QueryCache:
+
+    """Bounded cache of parsed query strings.
+
+    Each entry maps a raw query string to a snapshot of the key-value
+    pairs parsed from it. A lookup returns a copy-on-write view of the
+    snapshot, so a request handler may modify what it gets without
+    affecting other requests, and a repeated query string is not parsed
+    and percent-decoded again. Query strings longer than *max_length*
+    are parsed but never cached, and at most *size* entries are kept,
+    the least recently used one being evicted first, so the memory
+    used by the cache remains bounded even if every request has a
+    unique query string. It is safe to use the cache from multiple
+    threads.
+    """
+
+    def __init__(self, size, max_length=1024):
+        """Initialize the cache.
+
+        Arguments:
+          size (int): Maximum number of cached query strings.
+          max_length (int, optional): Length of the longest query string
+            that is cached, defaults to 1024.
+        """
+        self._size = size
+        self._max_length = max_length
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, query_string, parse):
+        """Return the key-value pairs of a query string.
+
+        Arguments:
+          query_string (str): Raw query string.
+          parse (callable): Function that parses a query string into a
+            :class:`MultiDict`. It is called on a cache miss. If it
+            raises an exception, nothing is cached.
+
+        Returns:
+          MultiDict: Key-value pairs from the query string.
+        """
+        if len(query_string) > self._max_length:
+            return parse(query_string)
+        with self._lock:
+            data = self._cache.get(query_string)
+            if data is not None:
+                self._cache.move_to_end(query_string)
+                self._hits += 1
+                return _SharedMultiDict(data)
+            self._misses += 1
+
+        data = parse(query_string)._data
+
+        with self._lock:
+            self._cache[query_string] = data
+            while len(self._cache) > self._size:
+                self._cache.popitem(last=False)
+                self._evictions += 1
+        return _SharedMultiDict(data)
+
+    def info(self):
+        """Return statistics of the cache.
+
+        Returns:
+          tuple: A named tuple with the number of cache hits, misses and
+          evictions, the maximum size of the cache and its current size
+          as the fields *hits*, *misses*, *evictions*, *maxsize* and
+          *currsize*, respectively.
+        """
+        with self._lock:
+            return Router._CacheInfo(self._hits, self._misses,
+                                     self._evictions, self._size,
+                                     len(self._cache))
+
+
+class Param:
+
+    """Specification of a query string or form data parameter.
+
+    A route may declare its parameters with instances of this class, see
+    :meth:`Ice.route`. The specifications of a route are compiled into
+    a single validator function by :meth:`compile` when the route is
+    added.
+
+    Attributes:
+      type (callable): Type that the value is converted to, e.g.
+        ``int``. The strings ``'1'``, ``'true'``, ``'yes'`` and ``'on'``
+        and ``'0'``, ``'false'``, ``'no'``, ``'off'`` and ``''`` are
+        converted to ``True`` and ``False`` respectively for ``bool``.
+      default (object): Value of a parameter that is missing from the
+        request. A parameter without a default value is required. A
+        list, dict or set default value is copied for each request, any
+        other default value is shared by all requests and should
+        therefore be immutable.
+      min (object): Smallest valid value, or smallest valid length for
+        a ``str`` parameter, ``None`` for no bound.
+      max (object): Greatest valid value, or greatest valid length for
+        a ``str`` parameter, ``None`` for no bound.
+      repeated (bool): Whether the value is the list of all values of
+        the parameter rather than the newest one.
+      source (str): Where the parameter is read from, ``'query'`` or
+        ``'form'``.
+    """
+
+    # Marks a parameter without a default value.
+    required = object()
+
+    _sources = ('query', 'form')
+    _booleans = {'1': True, 'true': True, 'yes': True, 'on': True,
+                 '0': False, 'false': False, 'no': False, 'off': False,
+                 '': False}
+
+    def __init__(self, type=str, default=required, min=None, max=None,
+                 repeated=False, source='query'):
+        """Initialize the specification.
+
+        Arguments:
+          type (callable, optional): Type of the value, defaults to
+            ``str``.
+          default (object, optional): Value of a missing parameter, the
+            parameter is required if not specified.
+          min (object, optional): Smallest valid value or length.
+          max (object, optional): Greatest valid value or length.
+          repeated (bool, optional): Whether the value is the list of
+            all values, defaults to ``False``.
+          source (str, optional): ``'query'`` (the default) or
+            ``'form'``.
+
+        Raises:
+          LogicError: If *type* is not callable or *source* is invalid.
+        """
+        if not callable(type):
+            raise LogicError('Parameter type {!r} is not callable'
+                             .format(type))
+        if source not in Param._sources:
+            raise LogicError('Invalid parameter source {!r}'.format(source))
+        self.type = type
+        self.default = default
+        self.min = min
+        self.max = max
+        self.repeated = repeated
+        self.source = source
+
+    @staticmethod
+    def _to_bool(value):
+        """Convert a parameter value to bool.
+
+        Arguments:
+          value (str): Parameter value.
+
+        Returns:
+          bool: Converted value.
+
+        Raises:
+          ValueError: If the value is not a known boolean string.
+        """
+        return Param._booleans[value.lower()]
+
+    @staticmethod
+    def compile(params):
+        """Compile parameter specifications into a validator function.
+
+        The returned function takes a :class:`Request`, reads the
+        parameters directly from the underlying dictionaries of its
+        :attr:`Request.query` and :attr:`Request.form` (the latter only
+        if a parameter is read from it), converts and checks their
+        values and returns a dictionary of the converted values. All
+        the errors are collected before a :class:`ParamError` is
+        raised.
+
+        Like :func:`collections.namedtuple`, the function is generated
+        as Python source code with the checks of each parameter written
+        out one after another, so that no time is spent on interpreting
+        the specifications when a request is validated.
+
+        Arguments:
+          params (dict): Dictionary that maps parameter names to
+            :class:`Param` objects.
+
+        Returns:
+          callable: Validator function.
+        """
+        namespace = {
+            'required': Param.required,
+            'Values': _Values,
+            'ParamError': ParamError,
+            'error': Param._error,
+            'check_all': Param._check_all,
+            'Errors': (ValueError, TypeError, KeyError, AttributeError),
+        }
+        lines = ['def validate(request):',
+                 '    values = {}',
+                 '    errors = None']
+        counter = itertools.count()
+        for source in Param._sources:
+            items = [(n, p) for n, p in params.items() if p.source == source]
+            if items:
+                lines.append('    {0} = request.{0}._data'.format(source))
+            for name, p in items:
+                i = next(counter)
+                namespace.update({
+                    'convert{}'.format(i):
+                        Param._to_bool if p.type is bool else p.type,
+                    'default{}'.format(i): p.default,
+                    'min{}'.format(i): p.min,
+                    'max{}'.format(i): p.max,
+                })
+                lines.extend(Param._compile_one(source, name, p, i))
+        lines.extend(['    if errors is not None:',
+                      '        raise ParamError(errors)',
+                      '    return values'])
+        exec('\n'.join(lines), namespace)
+        return namespace['validate']
+
+    @staticmethod
+    def _compile_one(source, name, param, i):
+        """Return the source code lines that validate a parameter.
+
+        Arguments:
+          source (str): Name of the variable with the dictionary that
+            the parameter is read from.
+          name (str): Parameter name.
+          param (Param): Parameter specification.
+          i (int): Suffix of the names of the converter, the default
+            value and the bounds of the parameter in the namespace of
+            the generated code.
+
+        Returns:
+          list: Lines of source code.
+        """
+        key = repr(name)
+        invalid = repr('Invalid value for type {}'.format(
+                       getattr(param.type, '__name__', repr(param.type))))
+        lines = ['    raw = {}.get({}, required)'.format(source, key),
+                 '    if raw is required:']
+        if param.default is Param.required:
+            lines.append('        errors = error(errors, {}, '
+                         "'Missing required parameter')".format(key))
+        elif isinstance(param.default, (list, dict, set)):
+            # Each request gets its own copy of a mutable default value.
+            lines.append('        values[{}] = default{}.copy()'
+                         .format(key, i))
+        else:
+            lines.append('        values[{}] = default{}'.format(key, i))
+        lines.append('    else:')
+        if param.repeated:
+            lines += ['        if type(raw) is not Values:',
+                      '            raw = (raw,)',
+                      '        try:',
+                      '            value = [convert{}(v) for v in raw]'
+                      .format(i)]
+        else:
+            lines += ['        if type(raw) is Values:',
+                      '            raw = raw[-1]',
+                      '        try:',
+                      '            value = convert{}(raw)'.format(i)]
+        lines += ['        except Errors:',
+                  '            errors = error(errors, {}, {})'
+                  .format(key, invalid)]
+        length = param.type is str
+        if param.min is None and param.max is None:
+            lines += ['        else:',
+                      '            values[{}] = value'.format(key)]
+        elif param.repeated:
+            lines += ['        else:',
+                      '            message = check_all(value, min{0}, max{0}, '
+                      '{1})'.format(i, length),
+                      '            if message is None:',
+                      '                values[{}] = value'.format(key),
+                      '            else:',
+                      '                errors = error(errors, {}, message)'
+                      .format(key)]
+        else:
+            size = 'len(value)' if length else 'value'
+            label = 'Length' if length else 'Value'
+            if param.min is not None:
+                lines += ['        else:',
+                          '            if {} < min{}:'.format(size, i),
+                          '                errors = error(errors, {}, '
+                          "'{} {{!r}} is less than {{!r}}'.format({}, min{}))"
+                          .format(key, label, size, i)]
+                branch = 'elif'
+            else:
+                lines += ['        else:']
+                branch = 'if'
+            if param.max is not None:
+                lines += ['            {} {} > max{}:'.format(branch, size, i),
+                          '                errors = error(errors, {}, '
+                          "'{} {{!r}} is greater than {{!r}}'.format({}, "
+                          'max{}))'.format(key, label, size, i)]
+            lines += ['            else:',
+                      '                values[{}] = value'.format(key)]
+        return lines
+
+    @staticmethod
+    def _error(errors, name, message):
+        """Add an error to a list of errors.
+
+        Arguments:
+          errors (list): List of errors, ``None`` if there are none yet.
+          name (str): Parameter name.
+          message (str): Description of the error.
+
+        Returns:
+          list: List of errors with the new error.
+        """
+        if errors is None:
+            errors = []
+        errors.append({'name': name, 'message': message})
+        return errors
+
+    @staticmethod
+    def _check_all(values, minimum, maximum, length):
+        """Check the bounds of the values of a repeated parameter.
+
+        Arguments:
+          values (list): Converted values.
+          minimum (object): Smallest valid value or length.
+          maximum (object): Greatest valid value or length.
+          length (bool): Whether the bounds apply to the lengths of the
+            values.
+
+        Returns:
+          str: Description of the first error, ``None`` if there is no
+          error.
+        """
+        label = 'Length' if length else 'Value'
+        for value in values:
+            size = len(value) if length else value
+            if minimum is not None and size < minimum:
+                return '{} {!r} is less than {!r}'.format(label, size,
+                                                          minimum)
+            if maximum is not None and size > maximum:
+                return '{} {!r} is greater than {!r}'.format(label, size,
+                                                             maximum)
+        return None
+
+
+class FormParser:
+
+    """Incremental parser of form data in a request body.
+
+    The request body is consumed as an iterable of chunks of bytes, so
+    it is never held in memory as a whole. Fields of
+    ``application/x-www-form-urlencoded`` data and parts of
+    ``multipart/form-data`` data that are not files are decoded as
+    UTF-8 and added to a :class:`MultiDict` as strings. Empty fields of
+    ``application/x-www-form-urlencoded`` data are left out. Parts of
+    ``multipart/form-data`` data that are files are added as
+    :class:`FileUpload` objects whose content is kept in memory up to a
+    limit and in a temporary file beyond it.
+    """
+
+    _options_re = re.compile(r'''
+        ;\s*([^\s;=]+)\s*=\s*("(?:\\.|[^"\\])*"|[^;]*)
+    ''', re.VERBOSE)
+    _max_header_size = 16 * 1024
+
+    def __init__(self, form, max_parts, max_field_size, spool_size):
+        """Initialize parser.
+
+        Arguments:
+          form (MultiDict): Dictionary to add the fields to.
+          max_parts (int): Maximum number of fields.
+          max_field_size (int): Maximum size of a field that is not a
+            file in bytes.
+          spool_size (int): Size in bytes beyond which the content of a
+            file is moved from memory to a temporary file.
+        """
+        self._form = form
+        self._max_parts = max_parts
+        self._max_field_size = max_field_size
+        self._spool_size = spool_size
+        self._parts = 0
+        self._part = None
+
+    def parse_urlencoded(self, chunks):
+        """Parse ``application/x-www-form-urlencoded`` data.
+
+        Arguments:
+          chunks (iterable): Chunks of bytes of the request body.
+
+        Raises:
+          RequestError: If there are too many fields or a field is too
+            large.
+        """
+        rest = b''
+        for chunk in chunks:
+            fields = (rest + chunk).split(b'&')
+            rest = fields.pop()
+            for field in fields:
+                self._add_urlencoded(field)
+            self._check_field_size(len(rest))
+        self._add_urlencoded(rest)
+
+    def parse_multipart(self, chunks, boundary):
+        """Parse ``multipart/form-data`` data.
+
+        Arguments:
+          chunks (iterable): Chunks of bytes of the request body.
+          boundary (bytes): Boundary that separates the parts.
+
+        Raises:
+          RequestError: If there are too many parts, a part that is not
+            a file is too large, or the data is malformed.
+        """
+        if not 0 < len(boundary) <= 70:
+            raise RequestError(400, 'Invalid multipart boundary {!r}'
+                               .format(boundary))
+        try:
+            self._read_parts(chunks, boundary)
+        except BaseException:
+            if isinstance(self._part, FileUpload):
+                self._part.file.close()
+            raise
+
+    def _read_parts(self, chunks, boundary):
+        """Read the parts of ``multipart/form-data`` data.
+
+        Arguments:
+          chunks (iterable): Chunks of bytes of the request body.
+          boundary (bytes): Boundary that separates the parts.
+        """
+        # A CRLF before the first delimiter lets every delimiter be
+        # found the same way.
+        delimiter = b'\r\n--' + boundary
+        keep = len(delimiter) + 1
+        buf = b'\r\n'
+        state = 'preamble'
+        received = 0
+        chunks = iter(chunks)
+        done = False
+        while not done:
+            chunk = next(chunks, None)
+            if chunk is None:
+                done = True
+            else:
+                received += len(chunk)
+                buf += chunk
+            while True:
+                if state in ('preamble', 'body'):
+                    i = buf.find(delimiter)
+                    if i == -1:
+                        if state == 'body' and len(buf) > keep:
+                            self._part.write(buf[:-keep])
+                            buf = buf[-keep:]
+                        elif state == 'preamble':
+                            buf = buf[-keep:]
+                        break
+                    if state == 'body':
+                        self._part.write(buf[:i])
+                        self._add_part(self._part)
+                        self._part = None
+                    buf = buf[i + len(delimiter):]
+                    state = 'delimiter'
+                elif state == 'delimiter':
+                    if buf.startswith(b'--'):
+                        return
+                    i = buf.find(b'\r\n')
+                    if i == -1 and len(buf) <= self._max_header_size:
+                        break
+                    if i == -1 or buf[:i].strip(b' \t'):
+                        raise RequestError(400, 'Invalid multipart '
+                                           'delimiter line')
+                    # Keep the CRLF, which starts the header section.
+                    buf = buf[i:]
+                    state = 'headers'
+                elif state == 'headers':
+                    i = buf.find(b'\r\n\r\n')
+                    if i == -1:
+                        if len(buf) > self._max_header_size:
+                            raise RequestError(431, 'Multipart headers '
+                                               'are too large')
+                        break
+                    self._part = self._start_part(buf[2:i])
+                    buf = buf[i + 4:]
+                    state = 'body'
+        if received:
+            raise RequestError(400, 'Incomplete multipart data')
+
+    @staticmethod
+    def parse_options(value):
+        """Split a header value into a value and its parameters.
+
+        Arguments:
+          value (str): Header value, e.g.
+            ``multipart/form-data; boundary="foo"``.
+
+        Returns:
+          tuple: Lower-cased value before the first ``;`` and dictionary
+          of parameters with lower-cased names and unquoted values.
+        """
+        head, _, tail = value.partition(';')
+        options = {}
+        for name, option in FormParser._options_re.findall(';' + tail):
+            option = option.strip()
+            if len(option) >= 2 and option[0] == option[-1] == '"':
+                option = re.sub(r'\\(.)', r'\1', option[1:-1])
+            options[name.lower()] = option
+        return head.strip().lower(), options
+
+    def _add_urlencoded(self, field):
+        """Add a field of ``application/x-www-form-urlencoded`` data.
+
+        Arguments:
+          field (bytes): Encoded name and value separated by ``=``.
+        """
+        self._check_field_size(len(field))
+        pairs = urllib.parse.parse_qsl(field.decode('utf-8', 'replace'))
+        for k, v in pairs:
+            self._count_part()
+            self._form[k] = v
+
+    def _start_part(self, headers):
+        """Start a part of ``multipart/form-data`` data.
+
+        Arguments:
+          headers (bytes): Header lines of the part.
+
+        Returns:
+          object: Field or file to write the body of the part to.
+        """
+        self._count_part()
+        disposition = ''
+        content_type = 'text/plain'
+        for line in headers.decode('utf-8', 'replace').split('\r\n'):
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            if name == 'content-disposition':
+                disposition = value
+            elif name == 'content-type':
+                content_type = value.strip()
+        _, options = FormParser.parse_options(disposition)
+        name = options.get('name')
+        if 'filename' in options:
+            return FileUpload(name, options['filename'], content_type,
+                              tempfile.SpooledTemporaryFile(
+                                  self._spool_size))
+        return _FormField(name, self._max_field_size)
+
+    def _add_part(self, part):
+        """Add a finished part of ``multipart/form-data`` data.
+
+        Arguments:
+          part (object): Field or file returned by :meth:`_start_part`.
+        """
+        if isinstance(part, FileUpload):
+            part.file.seek(0)
+            value = part
+        else:
+            value = part.value()
+        if part.name is not None:
+            self._form[part.name] = value
+
+    def _count_part(self):
+        """Count a field and check the number of fields.
+
+        Raises:
+          RequestError: If there are too many fields.
+        """
+        self._parts += 1
+        if self._parts > self._max_parts:
+            raise RequestError(413, 'Form data has more than {} fields'
+                               .format(self._max_parts))
+
+    def _check_field_size(self, size):
+        """Check the size of a field that is not a file.
+
+        Arguments:
+          size (int): Size of the field in bytes.
+
+        Raises:
+          RequestError: If the field is too large.
+        """
+        if size > self._max_field_size:
+            raise RequestError(413, 'Form field exceeds limit of {} bytes'
+                               .format(self._max_field_size))
+
+
+class _FormField:
+
+    """Part of ``multipart/form-data`` data that is not a file."""
+
+    def __init__(self, name, max_size):
+        """Initialize an empty field.
+
+        Arguments:
+          name (str): Name of the field.
+          max_size (int): Maximum size of the field in bytes.
+        """
+        self.name = name
+        self._max_size = max_size
+        self._data = bytearray()
+
+    def write(self, data):
+        """Append data to the field.
+
+        Arguments:
+          data (bytes): Data to append.
+
+        Raises:
+          RequestError: If the field becomes too large.
+        """
+        self._data += data
+        if len(self._data) > self._max_size:
+            raise RequestError(413, 'Form field exceeds limit of {} bytes'
+                               .format(self._max_size))
+
+    def value(self):
+        """Return the value of the field decoded as UTF-8.
+
+        Returns:
+          str: Value of the field.
+        """
+        return self._data.decode('utf-8', 'replace')
+
+
+class FileUpload:
+
+    """File uploaded in ``multipart/form-data`` data.
+
+    Attributes:
+      name (str): Name of the form field.
+      filename (str): Filename sent by the client. It must not be
+        trusted as a path on the server.
+      content_type (str): Content type sent by the client, defaults to
+        ``text/plain``.
+      file (file object): Binary file object with the content of the
+        file, positioned at its beginning.
+      size (int): Size of the content of the file in bytes.
+    """
+
+    def __init__(self, name, filename, content_type, file):
+        """Initialize uploaded file.
+
+        Arguments:
+          name (str): Name of the form field.
+          filename (str): Filename sent by the client.
+          content_type (str): Content type sent by the client.
+          file (file object): Binary file object to write content to.
+        """
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.file = file
+        self.size = 0
+
+    def write(self, data):
+        """Append data to the content of the file.
+
+        Arguments:
+          data (bytes): Data to append.
+        """
+        self.file.write(data)
+        self.size += len(data)
+
 
 class Response:
 
@@ -736,7 +3304,17 @@ class Response:
       charset (str): Character set of HTTP response, defaults to
         'UTF-8'. This together with :attr:`media_type` determines the
         Content-Type response header.
-      body (str or bytes): HTTP response body.
+      body (str, bytes or iterator): HTTP response body. If it is an
+        iterator, e.g. a generator, of str or bytes chunks, the body is
+        streamed: each chunk is encoded with :attr:`charset` only when
+        the server asks for it, so the whole body is never held in
+        memory.
+      content_length (int): Value of the Content-Length header. If it is
+        ``None`` (the default), the length of the encoded :attr:`body`
+        is used, or the header is omitted if the body is streamed.
+      head (bool): Whether the response is to a HEAD request, defaults
+        to ``False``. The response to a HEAD request has the same
+        headers as the response to a GET request, but no body.
     """
 
     # Convert HTTP response status codes, phrases and detail in
@@ -761,25 +3339,46 @@ class Response:
         self.charset = 'UTF-8'
         self._headers = []
         self.body = None
+        self.content_length = None
+        self.head = False
         self.state = {}
 
     def response(self):
         """Return the HTTP response body.
 
+        The body of the response to a HEAD request is not read, and a
+        streamed body is closed right away in that case.
+
         Returns:
-          bytes: HTTP response body as a sequence of bytes
+          iterable: List containing the HTTP response body as a single
+          sequence of bytes, or an iterable over the encoded chunks of a
+          streamed body.
         """
+        if isinstance(self.body, collections.abc.Iterator):
+            self.add_header('Content-Type', self.content_type)
+            if self.content_length is not None:
+                self.add_header('Content-Length', str(self.content_length))
+            self.start(self.status_line, self._headers)
+            stream = _ResponseStream(self.body, self.charset)
+            if self.head:
+                stream.close()
+                return [b'']
+            return stream
         if isinstance(self.body, bytes):
             out = self.body
         elif isinstance(self.body, str):
             out = self.body.encode(self.charset)
         else:
             out = b''
+        if self.content_length is None:
+            length = len(out)
+        else:
+            length = self.content_length
         self.add_header('Content-Type', self.content_type)
-        self.add_header('Content-Length', str(len(out)))
+        self.add_header('Content-Length', str(length))
 
         self.start(self.status_line, self._headers)
-        return [out]
+        return [b''] if self.head else [out]
 
     def add_header(self, name, value):
         """Add an HTTP header to response object.
@@ -849,15 +3448,154 @@ class Response:
             return self.media_type
 
 
-class MultiDict(collections.UserDict):
+class _ResponseStream:
+
+    """Streamed HTTP response body.
+
+    It is the iterable returned to the WSGI server for a response body
+    that is an iterator of chunks. Each str chunk is encoded when the
+    server asks for it. The server calls :meth:`close` when it is done
+    with the body, which closes the iterator if it can be closed, e.g.
+    so that the ``finally`` clauses of a generator run.
+    """
+
+    def __init__(self, chunks, charset):
+        """Initialize the stream.
+
+        Arguments:
+          chunks (iterator): Iterator of str or bytes chunks.
+          charset (str): Character set that str chunks are encoded with.
+        """
+        self._chunks = chunks
+        self._charset = charset
+
+    def __iter__(self):
+        """Iterate over the encoded chunks.
+
+        Yields:
+          bytes: Chunk of the response body.
+
+        Raises:
+          Error: If a chunk is neither str nor bytes.
+        """
+        charset = self._charset
+        for chunk in self._chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(charset)
+            elif not isinstance(chunk, bytes):
+                raise Error('Response body chunk has invalid type: {}: '
+                            '{!r}'.format(type(chunk).__name__, chunk))
+            yield chunk
+
+    def close(self):
+        """Close the iterator of chunks if it can be closed."""
+        close = getattr(self._chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+class RawResponse:
+
+    """Minimal response built by the route handler of a raw route.
+
+    See :meth:`Ice.raw_route`.
+
+    Attributes:
+      status (int): HTTP response status code, defaults to 200.
+      media_type (str): Media type of HTTP response, defaults to
+        'text/html'.
+      charset (str): Character set of HTTP response, defaults to
+        'UTF-8'.
+      headers (list): Additional HTTP headers as (name, value) tuples.
+    """
+
+    __slots__ = ('status', 'media_type', 'charset', 'headers')
+
+    def __init__(self):
+        """Initialize the response."""
+        self.status = 200
+        self.media_type = 'text/html'
+        self.charset = 'UTF-8'
+        self.headers = []
+
+    def add_header(self, name, value):
+        """Add an HTTP header to the response.
+
+        Arguments:
+          name (str): HTTP header field name
+          value (str): HTTP header field value
+        """
+        self.headers.append((name, value))
+
+    def finish(self, body, start_response, head=False):
+        """Start the response and return its body.
+
+        Arguments:
+          body (str or bytes): HTTP response body.
+          start_response (callable): Callable that starts response.
+          head (bool, optional): Whether the response is to a HEAD
+            request, defaults to ``False``.
+
+        Returns:
+          list: List containing a single sequence of bytes.
+        """
+        if isinstance(body, str):
+            body = body.encode(self.charset)
+        if (self.media_type is not None and
+                self.media_type.startswith('text/') and
+                self.charset is not None):
+            content_type = self.media_type + '; charset=' + self.charset
+        else:
+            content_type = self.media_type
+        headers = self.headers
+        if content_type is not None:
+            headers.append(('Content-Type', content_type))
+        headers.append(('Content-Length', str(len(body))))
+        start_response(str(self.status) + ' ' +
+                       Response._responses[self.status].phrase, headers)
+        return [b''] if head else [body]
+
+
+class _Values(list):
+
+    """List of the values of a key with more than one value.
+
+    :class:`MultiDict` stores the only value of a key as it is and
+    promotes it to this list type when a second value is added, so that
+    a value that is itself a list is never mistaken for multiple values.
+    """
+
+    __slots__ = ()
+
+
+class MultiDict(collections.abc.MutableMapping):
 
     """Dictionary with multiple values for a key.
 
     Setting an existing key to a new value merely adds the value to the
     list of values for the key. Getting the value of an existing key
     returns the newest value set for the key.
+
+    The only value of a key is stored as it is, without a list around
+    it. A list is allocated only when a second value is added for the
+    key, which is rare for query strings, form data and cookies. This
+    saves memory and time when the dictionary is built. Looking up a
+    value costs about the same as with a list.
     """
 
+    __slots__ = ('_data',)
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the dictionary.
+
+        Arguments:
+          args: Optional mapping or iterable of key-value pairs to add.
+          kwargs: Optional key-value pairs to add.
+        """
+        self._data = {}
+        if args or kwargs:
+            self.update(*args, **kwargs)
+
     def __setitem__(self, key, value):
         """Adds value to the list of values for the specified key.
 
@@ -865,10 +3603,15 @@ class MultiDict(collections.UserDict):
           key (object): Key
           value (object): Value
         """
-        if key not in self.data:
-            self.data[key] = [value]
+        data = self._data
+        if key not in data:
+            data[key] = value
         else:
-            self.data[key].append(value)
+            values = data[key]
+            if type(values) is _Values:
+                values.append(value)
+            else:
+                data[key] = _Values((values, value))
 
     def __getitem__(self, key):
         """Return the newest value for the specified key.
@@ -879,7 +3622,72 @@ class MultiDict(collections.UserDict):
         Returns:
           object: Newest value for the specified key
         """
-        return self.data[key][-1]
+        value = self._data[key]
+        if type(value) is _Values:
+            return value[-1]
+        return value
+
+    def get(self, key, default=None):
+        """Return the newest value for the specified key or a default.
+
+        Arguments:
+          key (object): Key
+          default (object): Value to return if the key does not exist,
+            defaults to ``None``.
+
+        Returns:
+          object: Newest value for the specified key if the key exists,
+          ``default`` otherwise.
+        """
+        if key not in self._data:
+            return default
+        value = self._data[key]
+        if type(value) is _Values:
+            return value[-1]
+        return value
+
+    def __delitem__(self, key):
+        """Remove all values for the specified key.
+
+        Arguments:
+          key (object): Key
+        """
+        del self._data[key]
+
+    def __contains__(self, key):
+        """Return whether the specified key exists.
+
+        Arguments:
+          key (object): Key
+
+        Returns:
+          bool: ``True`` if the key exists, ``False`` otherwise.
+        """
+        return key in self._data
+
+    def __iter__(self):
+        """Iterate over the keys.
+
+        Returns:
+          iterator: Iterator over the keys.
+        """
+        return iter(self._data)
+
+    def __len__(self):
+        """Return the number of keys.
+
+        Returns:
+          int: Number of keys.
+        """
+        return len(self._data)
+
+    def __repr__(self):
+        """Return a string representation of the dictionary.
+
+        Returns:
+          str: Representation of :attr:`data`.
+        """
+        return repr(self.data)
 
     def getall(self, key, default=[]):
         """Return the list of all values for the specified key.
@@ -893,7 +3701,360 @@ class MultiDict(collections.UserDict):
           list: List of all values for the specified key if the key
           exists, ``default`` otherwise.
         """
-        return self.data[key] if key in self.data else default
+        if key not in self._data:
+            return default
+        value = self._data[key]
+        if type(value) is _Values:
+            return list(value)
+        return [value]
+
+    def copy(self):
+        """Return a shallow copy of the dictionary.
+
+        Returns:
+          MultiDict: Copy with the same keys and values.
+        """
+        other = type(self)()
+        other._data = {k: _Values(v) if type(v) is _Values else v
+                       for k, v in self._data.items()}
+        return other
+
+    @property
+    def data(self):
+        """Dictionary that maps each key to the list of its values (dict).
+
+        It is a new dictionary built on each access, so modifying it
+        does not modify this dictionary.
+        """
+        return {key: self.getall(key) for key in self._data}
+
+
+class _SharedMultiDict(MultiDict):
+
+    """MultiDict that shares its entries with a snapshot until modified.
+
+    Reading it costs the same as reading a :class:`MultiDict`. The
+    shared entries are copied the first time a value is added or a key
+    is removed, so the snapshot itself is never modified.
+    """
+
+    __slots__ = ('_shared',)
+
+    def __init__(self, data):
+        """Initialize the dictionary with shared entries.
+
+        Arguments:
+          data (dict): Entries of a snapshot, which must not be modified.
+        """
+        self._data = data
+        self._shared = True
+
+    def _unshare(self):
+        """Copy the shared entries before the first modification."""
+        self._data = {k: _Values(v) if type(v) is _Values else v
+                      for k, v in self._data.items()}
+        self._shared = False
+
+    def copy(self):
+        """Return a shallow copy of the dictionary.
+
+        Returns:
+          MultiDict: Copy with the same keys and values that does not
+          share its entries with the snapshot.
+        """
+        other = MultiDict()
+        other._data = {k: _Values(v) if type(v) is _Values else v
+                       for k, v in self._data.items()}
+        return other
+
+    def __setitem__(self, key, value):
+        """Adds value to the list of values for the specified key.
+
+        Arguments:
+          key (object): Key
+          value (object): Value
+        """
+        if self._shared:
+            self._unshare()
+        MultiDict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        """Remove all values for the specified key.
+
+        Arguments:
+          key (object): Key
+        """
+        if self._shared:
+            self._unshare()
+        MultiDict.__delitem__(self, key)
+
+
+class _Cookies(MultiDict):
+
+    """Cookies sent by the client in the Cookie header of a request.
+
+    The header is split into cookies without regular expressions, unless
+    it contains quoted values, and the raw values are stored. A quoted
+    value is unquoted only when it is looked up, the way
+    :class:`http.cookies.SimpleCookie` unquotes it. Unlike SimpleCookie,
+    the parser is lenient: a malformed cookie is skipped without
+    discarding the other cookies in the header.
+    """
+
+    __slots__ = ()
+
+    # Names that SimpleCookie treats as cookie attributes, not cookies.
+    _attributes = frozenset(('expires', 'path', 'comment', 'domain',
+                             'max-age', 'secure', 'httponly', 'version',
+                             'samesite'))
+
+    _quoted_re = re.compile(r'"(?:[^\\"]|\\.)*"')
+    _escape_re = re.compile(r'\\(?:([0-3][0-7][0-7])|(.))')
+
+    def parse(self, header, max_cookies=None):
+        """Add the cookies in a Cookie header.
+
+        Arguments:
+          header (str): Value of the Cookie header, e.g.
+            ``'a=foo; b="bar"'``.
+          max_cookies (int, optional): Maximum number of cookies,
+            ``None`` (the default) for no limit.
+
+        Raises:
+          RequestError: With status 431 as soon as more than
+            *max_cookies* cookies are found.
+        """
+        attributes = _Cookies._attributes
+        count = 0
+        if '"' not in header:
+            for item in header.split(';'):
+                name, eq, value = item.partition('=')
+                name = name.strip()
+                if (eq and name and name[0] != '$' and
+                        name.lower() not in attributes):
+                    count += 1
+                    if max_cookies is not None and count > max_cookies:
+                        _Cookies._too_many(max_cookies)
+                    self[name] = value.strip()
+            return
+        pos = 0
+        end = len(header)
+        while pos < end:
+            semi = header.find(';', pos)
+            if semi == -1:
+                semi = end
+            eq = header.find('=', pos, semi)
+            if eq == -1:
+                pos = semi + 1
+                continue
+            name = header[pos:eq].strip()
+            start = eq + 1
+            while start < semi and header[start] == ' ':
+                start += 1
+            if header.startswith('"', start):
+                match = _Cookies._quoted_re.match(header, start)
+                if match is not None:
+                    value = match.group()
+                    semi = header.find(';', match.end())
+                    if semi == -1:
+                        semi = end
+                else:
+                    value = header[start:semi].rstrip()
+            else:
+                value = header[start:semi].rstrip()
+            pos = semi + 1
+            if (name and name[0] != '$' and
+                    name.lower() not in attributes):
+                count += 1
+                if max_cookies is not None and count > max_cookies:
+                    _Cookies._too_many(max_cookies)
+                self[name] = value
+
+    @staticmethod
+    def _too_many(max_cookies):
+        """Raise an error for a Cookie header with too many cookies.
+
+        Arguments:
+          max_cookies (int): Maximum number of cookies.
+
+        Raises:
+          RequestError: With status 431.
+        """
+        raise RequestError(431, 'Cookie header has more than {} '
+                                'cookies'.format(max_cookies))
+
+    @staticmethod
+    def unquote(value):
+        """Unquote a cookie value the way SimpleCookie does.
+
+        Arguments:
+          value (str): Raw cookie value.
+
+        Returns:
+          str: The value without the surrounding double quotes and with
+          backslash escapes decoded if it is quoted, the value as it is
+          otherwise.
+        """
+        if len(value) < 2 or value[0] != '"' or value[-1] != '"':
+            return value
+        value = value[1:-1]
+        if '\\' not in value:
+            return value
+        return _Cookies._escape_re.sub(
+            lambda m: chr(int(m.group(1), 8)) if m.group(1) else m.group(2),
+            value)
+
+    def __getitem__(self, key):
+        """Return the newest value of the specified cookie.
+
+        Arguments:
+          key (str): Cookie name
+
+        Returns:
+          str: Unquoted value of the cookie
+        """
+        return _Cookies.unquote(MultiDict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        """Return the newest value of the specified cookie or a default.
+
+        Arguments:
+          key (str): Cookie name
+          default (object): Value to return if there is no such cookie,
+            defaults to ``None``.
+
+        Returns:
+          object: Unquoted value of the cookie if it exists, ``default``
+          otherwise.
+        """
+        if key not in self:
+            return default
+        return self[key]
+
+    def getall(self, key, default=[]):
+        """Return the list of all values of the specified cookie.
+
+        Arguments:
+          key (str): Cookie name
+          default (list): Default value to return if there is no such
+            cookie, defaults to ``[]``, i.e. an empty list.
+
+        Returns:
+          list: List of all unquoted values of the cookie if it exists,
+          ``default`` otherwise.
+        """
+        if key not in self:
+            return default
+        return [_Cookies.unquote(v) for v in MultiDict.getall(self, key)]
+
+
+class Headers(collections.abc.Mapping):
+
+    """Read-only view of the HTTP request headers in a WSGI environ.
+
+    Header names are looked up case-insensitively, e.g.
+    ``headers['user-agent']`` returns the value of the HTTP_USER_AGENT
+    environment variable. The Content-Type and Content-Length headers
+    are read from the CONTENT_TYPE and CONTENT_LENGTH environment
+    variables. The environ is not copied, so creating a view is cheap
+    and a lookup costs a name conversion and a dictionary lookup.
+    Iterating over the view yields header names such as
+    ``'User-Agent'``.
+    """
+
+    _unprefixed = ('CONTENT_TYPE', 'CONTENT_LENGTH')
+
+    def __init__(self, environ):
+        """Initialize the view.
+
+        Arguments:
+          environ (dict): Dictionary of environment variables.
+        """
+        self._environ = environ
+
+    @staticmethod
+    def _key(name):
+        """Return the environment variable name for a header name.
+
+        Arguments:
+          name (str): Header name in any case, e.g. ``'user-agent'``.
+
+        Returns:
+          str: Environment variable name, e.g. ``'HTTP_USER_AGENT'``.
+        """
+        key = name.upper().replace('-', '_')
+        if key in Headers._unprefixed:
+            return key
+        return 'HTTP_' + key
+
+    def __getitem__(self, name):
+        """Return the value of the specified header.
+
+        Arguments:
+          name (str): Header name in any case.
+
+        Returns:
+          str: Value of the header.
+
+        Raises:
+          KeyError: If the request does not have the header.
+        """
+        return self._environ[Headers._key(name)]
+
+    def get(self, name, default=None):
+        """Return the value of the specified header or a default.
+
+        Arguments:
+          name (str): Header name in any case.
+          default (object): Value to return if the request does not
+            have the header, defaults to ``None``.
+
+        Returns:
+          object: Value of the header if the request has it,
+          ``default`` otherwise.
+        """
+        return self._environ.get(Headers._key(name), default)
+
+    def __contains__(self, name):
+        """Return whether the request has the specified header.
+
+        Arguments:
+          name (str): Header name in any case.
+
+        Returns:
+          bool: ``True`` if the request has the header, ``False``
+          otherwise.
+        """
+        return isinstance(name, str) and Headers._key(name) in self._environ
+
+    def __iter__(self):
+        """Iterate over the names of the headers of the request.
+
+        Yields:
+          str: Header name, e.g. ``'User-Agent'``.
+        """
+        for key in self._environ:
+            if key.startswith('HTTP_'):
+                if key[5:] not in Headers._unprefixed:
+                    yield key[5:].replace('_', '-').title()
+            elif key in Headers._unprefixed:
+                yield key.replace('_', '-').title()
+
+    def __len__(self):
+        """Return the number of headers of the request.
+
+        Returns:
+          int: Number of headers.
+        """
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        """Return a string representation of the view.
+
+        Returns:
+          str: Representation with the headers and their values.
+        """
+        return '{}({!r})'.format(type(self).__name__, dict(self.items()))
 
 
 class Error(Exception):
@@ -906,3 +4067,49 @@ class RouteError(Error):
 
 class LogicError(Error):
     """Logical error that can be avoided by careful coding."""
+
+
+class RequestError(Error):
+
+    """Request that cannot be processed due to the client.
+
+    The application responds to it with the HTTP status code of the
+    exception.
+
+    Attributes:
+      status (int): HTTP response status code, e.g. 400 or 413.
+    """
+
+    def __init__(self, status, message):
+        """Initialize exception.
+
+        Arguments:
+          status (int): HTTP response status code.
+          message (str): Description of the error.
+        """
+        super().__init__(message)
+        self.status = status
+
+
+class ParamError(RequestError):
+
+    """Request with invalid query string or form data parameters.
+
+    The application responds to it with 400 Bad Request and a JSON body
+    of the form ``{"errors": [{"name": ..., "message": ...}, ...]}``.
+
+    Attributes:
+      errors (list): Dictionaries with the name of an invalid parameter
+        and a description of the error as the keys *name* and
+        *message*, respectively.
+    """
+
+    def __init__(self, errors):
+        """Initialize exception.
+
+        Arguments:
+          errors (list): Errors as described for :attr:`errors`.
+        """
+        super().__init__(400, 'Invalid parameters: {}'.format(
+                         ', '.join(e['name'] for e in errors)))
+        self.errors = errors
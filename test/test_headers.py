@@ -0,0 +1,89 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2014-2017 Susam Pal
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for class Headers."""
+
+
+import unittest
+import ice
+
+
+class HeadersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.environ = {
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/',
+            'HTTP_USER_AGENT': 'Foo/1.0',
+            'HTTP_X_FORWARDED_FOR': '10.0.0.1',
+            'CONTENT_TYPE': 'text/plain',
+            'CONTENT_LENGTH': '3',
+        }
+        self.headers = ice.Headers(self.environ)
+
+    def test_getitem(self):
+        self.assertEqual(self.headers['User-Agent'], 'Foo/1.0')
+        self.assertEqual(self.headers['user-agent'], 'Foo/1.0')
+        self.assertEqual(self.headers['USER_AGENT'], 'Foo/1.0')
+        self.assertEqual(self.headers['x-forwarded-for'], '10.0.0.1')
+
+    def test_content_headers(self):
+        self.assertEqual(self.headers['Content-Type'], 'text/plain')
+        self.assertEqual(self.headers['content-length'], '3')
+
+    def test_missing_header(self):
+        with self.assertRaises(KeyError):
+            self.headers['Accept']
+        self.assertIsNone(self.headers.get('Accept'))
+        self.assertEqual(self.headers.get('Accept', '*/*'), '*/*')
+
+    def test_contains(self):
+        self.assertIn('user-agent', self.headers)
+        self.assertIn('Content-Type', self.headers)
+        self.assertNotIn('Accept', self.headers)
+        self.assertNotIn('Request-Method', self.headers)
+        self.assertNotIn(None, self.headers)
+
+    def test_iter_and_len(self):
+        self.assertEqual(sorted(self.headers),
+                         ['Content-Length', 'Content-Type',
+                          'User-Agent', 'X-Forwarded-For'])
+        self.assertEqual(len(self.headers), 4)
+
+    def test_view(self):
+        self.environ['HTTP_ACCEPT'] = 'text/html'
+        self.assertEqual(self.headers['Accept'], 'text/html')
+        with self.assertRaises(TypeError):
+            self.headers['Accept'] = 'text/plain'
+
+    def test_request_headers(self):
+        r = ice.Request(self.environ)
+        self.assertIs(r.headers, r.headers)
+        self.assertEqual(r.headers['user-agent'], 'Foo/1.0')
+        self.assertEqual(dict(r.headers), {
+            'User-Agent': 'Foo/1.0',
+            'X-Forwarded-For': '10.0.0.1',
+            'Content-Type': 'text/plain',
+            'Content-Length': '3',
+        })
@@ -27,6 +27,8 @@
 
 import unittest
 import unittest.mock
+import io
+import json
 import ice
 import threading
 import urllib.request
@@ -72,14 +74,59 @@ class IceTest(unittest.TestCase):
         ])
         self.assertEqual(r, [expected.encode()])
 
-        expected = '501 Not Implemented'
+        expected = '405 Method Not Allowed'
         r = app({'REQUEST_METHOD': 'POST', 'PATH_INFO': '/'}, m)
+        m.assert_called_with(expected, [
+            ('Allow', 'GET, HEAD, OPTIONS'),
+            ('Content-Type', 'text/plain; charset=UTF-8'),
+            ('Content-Length', str(len(expected)))
+        ])
+        self.assertEqual(r, [expected.encode()])
+
+        expected = '501 Not Implemented'
+        r = app({'REQUEST_METHOD': 'POST', 'PATH_INFO': '/foo'}, m)
         m.assert_called_with(expected, [
             ('Content-Type', 'text/plain; charset=UTF-8'),
             ('Content-Length', str(len(expected)))
         ])
         self.assertEqual(r, [expected.encode()])
 
+    def test_custom_router(self):
+        router = ice.Router(combine_regex=True)
+        app = ice.Ice(router)
+        @app.get('/(foo|bar)')
+        def foo(name):
+            return name
+
+        m = unittest.mock.Mock()
+        r = app({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/bar'}, m)
+        self.assertEqual(r, [b'bar'])
+        self.assertEqual(router.resolve('GET', '/foo'), (foo, ['foo'], {}))
+
+    def test_freeze(self):
+        app = ice.Ice()
+        @app.get('/<:int>')
+        def foo(n):
+            return str(n + 1)
+
+        app.freeze()
+        with self.assertRaises(ice.RouteError):
+            app.get('/bar')(foo)
+        # No options are left behind for routes that were not added.
+        with self.assertRaises(ice.RouteError):
+            app.get('/bar', max_body_size=1)(foo)
+        with self.assertRaises(ice.RouteError):
+            app.raw_get('/bar')(foo)
+        with self.assertRaises(ice.RouteError):
+            app.constant('/bar', 'bar')
+        self.assertEqual(app._route_options, {})
+
+        m = unittest.mock.Mock()
+        r = app({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/41'}, m)
+        self.assertEqual(r, [b'42'])
+        r = app({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/bar'}, m)
+        self.assertEqual(r, [b'404 Not Found'])
+
     def test_post_route(self):
         expected = '<p>Foo</p>'
         app = ice.Ice()
@@ -95,14 +142,502 @@ class IceTest(unittest.TestCase):
         ])
         self.assertEqual(r, [expected.encode()])
 
-        expected = '501 Not Implemented'
+        expected = '405 Method Not Allowed'
         r = app({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/'}, m)
+        m.assert_called_with(expected, [
+            ('Allow', 'OPTIONS, POST'),
+            ('Content-Type', 'text/plain; charset=UTF-8'),
+            ('Content-Length', str(len(expected)))
+        ])
+        self.assertEqual(r, [expected.encode()])
+
+        expected = '501 Not Implemented'
+        r = app({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/foo'}, m)
+        m.assert_called_with(expected, [
+            ('Content-Type', 'text/plain; charset=UTF-8'),
+            ('Content-Length', str(len(expected)))
+        ])
+        self.assertEqual(r, [expected.encode()])
+
+    def test_method_not_allowed(self):
+        app = ice.Ice()
+        app.get('/foo')(unittest.mock.Mock())
+        app.route('PUT', '/<>')(unittest.mock.Mock())
+        app.route('DELETE', '/(.*)')(unittest.mock.Mock())
+        app.post('/bar')(unittest.mock.Mock())
+
+        m = unittest.mock.Mock()
+        expected = '405 Method Not Allowed'
+        r = app({'REQUEST_METHOD': 'POST', 'PATH_INFO': '/foo'}, m)
+        m.assert_called_with(expected, [
+            ('Allow', 'DELETE, GET, HEAD, OPTIONS, PUT'),
+            ('Content-Type', 'text/plain; charset=UTF-8'),
+            ('Content-Length', str(len(expected)))
+        ])
+        self.assertEqual(r, [expected.encode()])
+
+        r = app({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/foo/bar'}, m)
+        m.assert_called_with(expected, [
+            ('Allow', 'DELETE, OPTIONS'),
+            ('Content-Type', 'text/plain; charset=UTF-8'),
+            ('Content-Length', str(len(expected)))
+        ])
+
+    def test_options(self):
+        app = ice.Ice()
+        app.get('/foo')(unittest.mock.Mock())
+        app.post('/<>')(unittest.mock.Mock())
+
+        m = unittest.mock.Mock()
+        r = app({'REQUEST_METHOD': 'OPTIONS', 'PATH_INFO': '/foo'}, m)
+        m.assert_called_with('200 OK', [
+            ('Allow', 'GET, HEAD, OPTIONS, POST'),
+            ('Content-Type', 'text/html; charset=UTF-8'),
+            ('Content-Length', '0')
+        ])
+        self.assertEqual(r, [b''])
+
+        expected = '404 Not Found'
+        r = app({'REQUEST_METHOD': 'OPTIONS', 'PATH_INFO': '/foo/bar'}, m)
+        m.assert_called_with(expected, [
+            ('Content-Type', 'text/plain; charset=UTF-8'),
+            ('Content-Length', str(len(expected)))
+        ])
+        self.assertEqual(r, [expected.encode()])
+
+        # An explicit OPTIONS route takes precedence.
+        app.route('OPTIONS', '/foo')(lambda: 'foo')
+        r = app({'REQUEST_METHOD': 'OPTIONS', 'PATH_INFO': '/foo'}, m)
+        self.assertEqual(r, [b'foo'])
+
+    def test_head(self):
+        app = ice.Ice()
+        app.get('/foo')(lambda: 'foo')
+        app.post('/bar')(lambda: 'bar')
+
+        m = unittest.mock.Mock()
+        r = app({'REQUEST_METHOD': 'HEAD', 'PATH_INFO': '/foo'}, m)
+        m.assert_called_with('200 OK', [
+            ('Content-Type', 'text/html; charset=UTF-8'),
+            ('Content-Length', '3')
+        ])
+        self.assertEqual(r, [b''])
+
+        expected = '405 Method Not Allowed'
+        r = app({'REQUEST_METHOD': 'HEAD', 'PATH_INFO': '/bar'}, m)
+        m.assert_called_with(expected, [
+            ('Allow', 'OPTIONS, POST'),
+            ('Content-Type', 'text/plain; charset=UTF-8'),
+            ('Content-Length', str(len(expected)))
+        ])
+        self.assertEqual(r, [b''])
+
+        expected = '404 Not Found'
+        r = app({'REQUEST_METHOD': 'HEAD', 'PATH_INFO': '/baz'}, m)
+        m.assert_called_with(expected, [
+            ('Content-Type', 'text/plain; charset=UTF-8'),
+            ('Content-Length', str(len(expected)))
+        ])
+        self.assertEqual(r, [b''])
+
+        # An explicit HEAD route takes precedence.
+        app.route('HEAD', '/foo')(lambda: 'foobar')
+        r = app({'REQUEST_METHOD': 'HEAD', 'PATH_INFO': '/foo'}, m)
+        m.assert_called_with('200 OK', [
+            ('Content-Type', 'text/html; charset=UTF-8'),
+            ('Content-Length', '6')
+        ])
+        self.assertEqual(r, [b''])
+
+    def test_mount(self):
+        app = ice.Ice()
+        shop = ice.Ice()
+        cart = unittest.mock.Mock(return_value=[b'cart'])
+        app.get('/')(lambda: 'home')
+        app.get('/shopping')(lambda: 'shopping')
+        app.get('/shop/items')(lambda: 'not reached')
+        shop.get('/')(lambda: 'shop')
+        shop.get('/items')(lambda: 'items')
+        shop.error(404)(lambda: 'no such item')
+        app.mount('/shop', shop)
+        app.mount('/shop/cart', cart)
+
+        m = unittest.mock.Mock()
+        r = app({'PATH_INFO': '/'}, m)
+        self.assertEqual(r, [b'home'])
+        r = app({'PATH_INFO': '/shopping'}, m)
+        self.assertEqual(r, [b'shopping'])
+        r = app({'PATH_INFO': '/shop'}, m)
+        self.assertEqual(r, [b'shop'])
+        r = app({'PATH_INFO': '/shop/'}, m)
+        self.assertEqual(r, [b'shop'])
+        r = app({'PATH_INFO': '/shop/items'}, m)
+        self.assertEqual(r, [b'items'])
+        r = app({'PATH_INFO': '/shop/foo'}, m)
+        self.assertEqual(r, [b'no such item'])
+        r = app({'PATH_INFO': '/foo'}, m)
+        self.assertEqual(r, [b'404 Not Found'])
+
+        environ = {'SCRIPT_NAME': '/app', 'PATH_INFO': '/shop/cart/1'}
+        r = app(environ, m)
+        self.assertEqual(r, [b'cart'])
+        cart.assert_called_once_with({'SCRIPT_NAME': '/app/shop/cart',
+                                      'PATH_INFO': '/1'}, m)
+        self.assertEqual(environ, {'SCRIPT_NAME': '/app',
+                                   'PATH_INFO': '/shop/cart/1'})
+
+    def test_mount_errors(self):
+        app = ice.Ice()
+        for prefix in ('', '/', 'shop', '/shop/'):
+            with self.assertRaises(ice.RouteError) as cm:
+                app.mount(prefix, ice.Ice())
+            self.assertEqual(str(cm.exception),
+                             'Invalid mount prefix {!r}'.format(prefix))
+
+        app.mount('/shop', ice.Ice())
+        with self.assertRaises(ice.RouteError) as cm:
+            app.mount('/shop', ice.Ice())
+        self.assertEqual(str(cm.exception),
+                         "An application is already mounted at '/shop'")
+
+    def test_freeze_mounted(self):
+        app = ice.Ice()
+        shop = ice.Ice()
+        app.mount('/shop', shop)
+        app.freeze()
+        with self.assertRaises(ice.RouteError):
+            shop.get('/foo')(lambda: 'foo')
+
+    def test_request_error(self):
+        app = ice.Ice()
+        upload = {}
+
+        @app.post('/')
+        def foo():
+            upload['foo'] = app.request.form['foo']
+            return 'foo'
+
+        @app.post('/bar')
+        def bar():
+            app.request.max_form_size = 4
+            return app.request.form['bar']
+
+        body = (b'--x\r\nContent-Disposition: form-data; name="foo"; '
+                b'filename="foo.txt"\r\n\r\nfoo\r\n--x--\r\n')
+        m = unittest.mock.Mock()
+        r = app({
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/',
+            'CONTENT_TYPE': 'multipart/form-data; boundary=x',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        }, m)
+        self.assertEqual(r, [b'foo'])
+        self.assertEqual(upload['foo'].size, 3)
+        self.assertTrue(upload['foo'].file.closed)
+
+        # The phrase is 'Content Too Large' from Python 3.13 on.
+        expected = '413 ' + ice.Response._responses[413].phrase
+        r = app({
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/bar',
+            'CONTENT_LENGTH': '7',
+            'wsgi.input': io.BytesIO(b'bar=baz'),
+        }, m)
         m.assert_called_with(expected, [
             ('Content-Type', 'text/plain; charset=UTF-8'),
             ('Content-Length', str(len(expected)))
         ])
         self.assertEqual(r, [expected.encode()])
 
+    def test_max_body_size(self):
+        app = ice.Ice(max_body_size=4)
+        m = unittest.mock.Mock()
+        m.return_value = 'ok'
+        app.post('/')(m)
+        app.post('/big', max_body_size=8)(m)
+        app.post('/small', max_body_size=2)(m)
+
+        def request(path, body):
+            environ = {
+                'REQUEST_METHOD': 'POST',
+                'PATH_INFO': path,
+                'CONTENT_LENGTH': str(len(body)),
+                'wsgi.input': io.BytesIO(body),
+            }
+            r = app(environ, unittest.mock.Mock())
+            self.assertEqual(environ['wsgi.input'].tell(), 0)
+            return r
+
+        expected = [('413 ' + ice.Response._responses[413].phrase).encode()]
+        self.assertEqual(request('/', b'foo'), [b'ok'])
+        self.assertEqual(request('/', b'fooba'), expected)
+        self.assertEqual(request('/big', b'foobar'), [b'ok'])
+        self.assertEqual(request('/big', b'foobarbaz'), expected)
+        self.assertEqual(request('/small', b'fo'), [b'ok'])
+        self.assertEqual(request('/small', b'foo'), expected)
+        self.assertEqual(m.call_count, 3)
+
+    def test_stream(self):
+        app = ice.Ice()
+
+        @app.post('/', max_body_size=10)
+        def foo():
+            app.request.chunk_size = 2
+            return b'|'.join(app.request.stream)
+
+        r = app({
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/',
+            'CONTENT_LENGTH': '5',
+            'wsgi.input': io.BytesIO(b'foobar'),
+        }, unittest.mock.Mock())
+        self.assertEqual(r, [b'fo|ob|a'])
+
+    def test_query_cache(self):
+        app = ice.Ice(query_cache_size=10)
+        self.assertEqual(app.query_cache_info(), (0, 0, 0, 10, 0))
+
+        @app.get('/')
+        def foo():
+            app.request.query['b'] = 'baz'
+            return repr(app.request.query.copy().data)
+
+        for i in range(2):
+            r = app({'PATH_INFO': '/', 'QUERY_STRING': 'a=foo'},
+                     unittest.mock.Mock())
+            self.assertEqual(r, [b"{'a': ['foo'], 'b': ['baz']}"])
+        self.assertEqual(app.query_cache_info(), (1, 1, 0, 10, 1))
+        self.assertEqual(ice.Ice().query_cache_info(), (0, 0, 0, 0, 0))
+
+    def test_request_limits(self):
+        app = ice.Ice()
+        m = unittest.mock.Mock()
+        app.get('/')(lambda: repr(app.request.query.data))
+        environ = {'PATH_INFO': '/', 'QUERY_STRING': 'a=1&b=2',
+                   'HTTP_HOST': 'localhost'}
+        with unittest.mock.patch.multiple(ice.Request, max_query_params=1,
+                                          max_header_size=17):
+            app(dict(environ), m)
+            self.assertEqual(m.call_args[0][0],
+                             '400 Bad Request')
+            app(dict(environ, HTTP_HOST='localhost:8080'), m)
+            self.assertEqual(m.call_args[0][0],
+                             '431 Request Header Fields Too Large')
+
+    def test_inject(self):
+        app = ice.Ice()
+
+        @app.post('/<id:int>', inject=True)
+        def foo(id, query, headers, *, cookies, bar='bar'):
+            return '{} {} {} {} {}'.format(id, query['a'],
+                                           headers['user-agent'],
+                                           cookies['c'], bar)
+
+        @app.post('/json', inject=True)
+        def baz(request, json):
+            return '{} {}'.format(request.method, json['a'])
+
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/1',
+            'QUERY_STRING': 'a=foo',
+            'HTTP_USER_AGENT': 'Foo/1.0',
+            'HTTP_COOKIE': 'c=qux',
+            'CONTENT_LENGTH': '5',
+            'wsgi.input': io.BytesIO(b'b=bar'),
+        }
+        r = app(environ, unittest.mock.Mock())
+        self.assertEqual(r, [b'1 foo Foo/1.0 qux bar'])
+        # The form was not asked for, so the body was not read.
+        self.assertEqual(environ['wsgi.input'].tell(), 0)
+
+        r = app({
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/json',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': '8',
+            'wsgi.input': io.BytesIO(b'{"a": 1}'),
+        }, unittest.mock.Mock())
+        self.assertEqual(r, [b'POST 1'])
+
+        m = unittest.mock.Mock()
+        app({'REQUEST_METHOD': 'POST', 'PATH_INFO': '/json',
+             'CONTENT_TYPE': 'text/plain'}, m)
+        self.assertEqual(m.call_args[0][0], '415 Unsupported Media Type')
+
+    def test_inject_is_per_route(self):
+        app = ice.Ice(router=ice.Router(cache_size=10))
+
+        def foo(x, query=None):
+            return '{} {}'.format(x, query)
+
+        app.get('/a/<x>', inject=True)(foo)
+        app.get('/b/<x>')(foo)
+        for i in range(2):
+            r = app({'PATH_INFO': '/a/1', 'QUERY_STRING': 'q=1'},
+                    unittest.mock.Mock())
+            self.assertEqual(r, [b"1 {'q': ['1']}"])
+            r = app({'PATH_INFO': '/b/1', 'QUERY_STRING': 'q=1'},
+                    unittest.mock.Mock())
+            self.assertEqual(r, [b'1 None'])
+
+    def test_inject_error(self):
+        app = ice.Ice()
+        with self.assertRaises(ice.LogicError) as cm:
+            app.get('/', inject=True)('foo')
+        self.assertTrue(str(cm.exception).startswith(
+                        "Cannot inspect signature of route handler 'foo'"))
+
+        def foo(query):
+            pass
+        for pattern in ('/<query>', '/<query:int>/<>', r'/(?P<query>\w+)'):
+            with self.assertRaises(ice.LogicError) as cm:
+                app.get(pattern, inject=True)(foo)
+            self.assertTrue(str(cm.exception).startswith(
+                            "Injected parameter 'query' of route handler"))
+            self.assertIsNone(app._router.resolve('GET', '/1'))
+        # Without injection the name is free to use.
+        app.get('/<query>')(foo)
+
+    def test_params(self):
+        app = ice.Ice()
+
+        @app.get('/<id:int>', params={
+            'limit': ice.Param(int, default=10, min=1, max=100),
+            'tag': ice.Param(repeated=True, default=[]),
+        })
+        def foo(id, limit, tag):
+            return '{} {} {}'.format(id, limit, ','.join(tag))
+
+        r = app({'PATH_INFO': '/1', 'QUERY_STRING': 'limit=5&tag=a&tag=b'},
+                unittest.mock.Mock())
+        self.assertEqual(r, [b'1 5 a,b'])
+
+        m = unittest.mock.Mock()
+        r = app({'PATH_INFO': '/1', 'QUERY_STRING': 'limit=x'}, m)
+        self.assertEqual(m.call_args[0][0], '400 Bad Request')
+        self.assertIn(('Content-Type', 'application/json'),
+                      m.call_args[0][1])
+        self.assertEqual(json.loads(r[0].decode()), {'errors': [
+            {'name': 'limit', 'message': 'Invalid value for type int'},
+        ]})
+
+    def test_raw_route(self):
+        app = ice.Ice()
+
+        @app.raw_get('/healthz')
+        def healthz(environ, response):
+            response.media_type = 'text/plain'
+            response.add_header('Cache-Control', 'no-store')
+            return 'ok ' + environ['QUERY_STRING']
+
+        @app.raw_get('/items/<id:int>')
+        def item(environ, response, id):
+            if id > 10:
+                response.add_header('X-Missing', str(id))
+                return 404
+            return b'item'
+
+        @app.error(404)
+        def not_found():
+            return 'No such item'
+
+        with unittest.mock.patch('ice.Request') as request_class:
+            m = unittest.mock.Mock()
+            r = app({'PATH_INFO': '/healthz', 'QUERY_STRING': 'a'}, m)
+            self.assertEqual(r, [b'ok a'])
+            m.assert_called_with('200 OK', [
+                ('Cache-Control', 'no-store'),
+                ('Content-Type', 'text/plain; charset=UTF-8'),
+                ('Content-Length', '4'),
+            ])
+
+            r = app({'REQUEST_METHOD': 'HEAD', 'PATH_INFO': '/items/1'}, m)
+            self.assertEqual(r, [b''])
+            m.assert_called_with('200 OK', [
+                ('Content-Type', 'text/html; charset=UTF-8'),
+                ('Content-Length', '4'),
+            ])
+            self.assertFalse(request_class.called)
+
+        r = app({'PATH_INFO': '/items/11'}, m)
+        self.assertEqual(r, [b'No such item'])
+        m.assert_called_with('404 Not Found', [
+            ('X-Missing', '11'),
+            ('Content-Type', 'text/html; charset=UTF-8'),
+            ('Content-Length', '12'),
+        ])
+
+        app({'REQUEST_METHOD': 'POST', 'PATH_INFO': '/healthz'}, m)
+        self.assertEqual(m.call_args[0][0], '405 Method Not Allowed')
+
+    def test_constant(self):
+        app = ice.Ice()
+        app.constant('/robots.txt', 'User-agent: *\nDisallow:\n',
+                     media_type='text/plain',
+                     headers=[('Cache-Control', 'max-age=3600')])
+        app.constant('/favicon.ico', b'\x00\x00\x01\x00',
+                     media_type='image/x-icon')
+        expected_headers = [
+            ('Cache-Control', 'max-age=3600'),
+            ('Content-Type', 'text/plain; charset=UTF-8'),
+            ('Content-Length', '24'),
+        ]
+
+        with unittest.mock.patch('ice.Request') as request_class:
+            m = unittest.mock.Mock()
+            r1 = list(app({'PATH_INFO': '/robots.txt'}, m))
+            m.assert_called_with('200 OK', expected_headers)
+            m.call_args[0][1].append(('X-Foo', 'bar'))
+            r2 = list(app({'PATH_INFO': '/robots.txt'}, m))
+            m.assert_called_with('200 OK', expected_headers)
+            self.assertEqual(r1, [b'User-agent: *\nDisallow:\n'])
+            self.assertIs(r1[0], r2[0])
+
+            r = list(app({'REQUEST_METHOD': 'HEAD',
+                          'PATH_INFO': '/robots.txt'}, m))
+            self.assertEqual(r, [b''])
+            m.assert_called_with('200 OK', expected_headers)
+
+            r = list(app({'PATH_INFO': '/favicon.ico'}, m))
+            self.assertEqual(r, [b'\x00\x00\x01\x00'])
+            m.assert_called_with('200 OK', [
+                ('Content-Type', 'image/x-icon'),
+                ('Content-Length', '4'),
+            ])
+            self.assertFalse(request_class.called)
+
+        app({'REQUEST_METHOD': 'POST', 'PATH_INFO': '/robots.txt'}, m)
+        self.assertEqual(m.call_args[0][0], '405 Method Not Allowed')
+
+    def test_streamed_response(self):
+        app = ice.Ice()
+        rows = []
+
+        @app.get('/export.csv')
+        def export():
+            app.response.media_type = 'text/csv'
+            def lines():
+                for i in range(3):
+                    rows.append(i)
+                    yield '{},{}\n'.format(i, i * i)
+            return lines()
+
+        m = unittest.mock.Mock()
+        r = app({'PATH_INFO': '/export.csv'}, m)
+        m.assert_called_with('200 OK', [
+            ('Content-Type', 'text/csv; charset=UTF-8'),
+        ])
+        self.assertEqual(rows, [])
+        self.assertEqual(list(r), [b'0,0\n', b'1,1\n', b'2,4\n'])
+        self.assertEqual(rows, [0, 1, 2])
+
+        rows.clear()
+        r = app({'REQUEST_METHOD': 'HEAD', 'PATH_INFO': '/export.csv'}, m)
+        self.assertEqual(r, [b''])
+        self.assertEqual(rows, [])
+
     def test_error_in_callback(self):
         app = ice.Ice()
         @app.get('/')
@@ -277,10 +812,21 @@ class IceTest(unittest.TestCase):
         self.assertEqual(h['Content-Length'], str(len(expected)))
         self.assertEqual(cm.exception.read(), expected.encode())
 
+        # 405 Method Not Allowed
+        expected = '405 Method Not Allowed'
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            urllib.request.urlopen('http://127.0.0.1:8080/', b'')
+        self.assertEqual(cm.exception.code, 405)
+        self.assertEqual(cm.exception.reason, 'Method Not Allowed')
+        h = dict(cm.exception.headers)
+        self.assertEqual(h['Allow'], 'GET, HEAD, OPTIONS')
+        self.assertEqual(h['Content-Length'], str(len(expected)))
+        self.assertEqual(cm.exception.read(), expected.encode())
+
         # 501 Not Implemented
         expected = '501 Not Implemented'
         with self.assertRaises(urllib.error.HTTPError) as cm:
-            urllib.request.urlopen('http://127.0.0.1:8080/', b'')
+            urllib.request.urlopen('http://127.0.0.1:8080/foo', b'')
         self.assertEqual(cm.exception.code, 501)
         self.assertEqual(cm.exception.reason, 'Not Implemented')
         h = dict(cm.exception.headers)
@@ -323,6 +869,23 @@ class IceTest(unittest.TestCase):
         ])
         self.assertEqual(r, [expected.encode()])
 
+    def test_static_head(self):
+        app = ice.Ice()
+
+        @app.get('/foo')
+        def foo():
+            return app.static(data.dirpath, 'foo.txt')
+
+        m = unittest.mock.Mock()
+        with unittest.mock.patch('builtins.open') as mock_open:
+            r = app({'REQUEST_METHOD': 'HEAD', 'PATH_INFO': '/foo'}, m)
+        mock_open.assert_not_called()
+        m.assert_called_with('200 OK', [
+            ('Content-Type', 'text/plain; charset=UTF-8'),
+            ('Content-Length', str(len('foo\n')))
+        ])
+        self.assertEqual(r, [b''])
+
     def test_static_403_error(self):
         app = ice.Ice()
 
@@ -86,3 +86,40 @@ class MultiDictTest(unittest.TestCase):
     def test_getall_default_value_for_missing_key(self):
         d = ice.MultiDict()
         self.assertEqual(d.getall('a', 'foo'), 'foo')
+
+    def test_list_value(self):
+        d = ice.MultiDict()
+        d['a'] = ['foo', 'bar']
+        self.assertEqual(d['a'], ['foo', 'bar'])
+        self.assertEqual(d.getall('a'), [['foo', 'bar']])
+        d['a'] = 'baz'
+        self.assertEqual(d.getall('a'), [['foo', 'bar'], 'baz'])
+
+    def test_getall_returns_copy(self):
+        d = ice.MultiDict()
+        d['a'] = 'foo'
+        d['a'] = 'bar'
+        d.getall('a').append('baz')
+        d.data['a'].append('baz')
+        self.assertEqual(d.getall('a'), ['foo', 'bar'])
+
+    def test_contains_and_delete(self):
+        d = ice.MultiDict()
+        d['a'] = 'foo'
+        d['a'] = 'bar'
+        self.assertIn('a', d)
+        del d['a']
+        self.assertNotIn('a', d)
+        self.assertEqual(d.getall('a'), [])
+
+    def test_init_and_copy(self):
+        d = ice.MultiDict([('a', 'foo'), ('a', 'bar')], b='baz')
+        c = d.copy()
+        c['a'] = 'qux'
+        self.assertEqual(d.data, {'a': ['foo', 'bar'], 'b': ['baz']})
+        self.assertEqual(c.data, {'a': ['foo', 'bar', 'qux'], 'b': ['baz']})
+        self.assertEqual(repr(d), "{'a': ['foo', 'bar'], 'b': ['baz']}")
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            ice.MultiDict().foo = 'bar'
@@ -0,0 +1,141 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2014-2017 Susam Pal
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for class Param."""
+
+
+import functools
+import io
+import unittest
+import ice
+
+
+class ParamTest(unittest.TestCase):
+
+    def validate(self, params, query_string, form=None):
+        environ = {'QUERY_STRING': query_string}
+        if form is not None:
+            environ.update({
+                'REQUEST_METHOD': 'POST',
+                'CONTENT_LENGTH': str(len(form)),
+                'wsgi.input': io.BytesIO(form),
+            })
+        return ice.Param.compile(params)(ice.Request(environ))
+
+    def test_types_and_defaults(self):
+        params = {
+            'a': ice.Param(),
+            'b': ice.Param(int),
+            'c': ice.Param(float, default=1.5),
+            'd': ice.Param(bool, default=False),
+            'e': ice.Param(bool),
+        }
+        self.assertEqual(self.validate(params, 'a=foo&b=1&b=2&e=on'),
+                         {'a': 'foo', 'b': 2, 'c': 1.5, 'd': False,
+                          'e': True})
+
+    def test_repeated(self):
+        params = {
+            'a': ice.Param(int, repeated=True),
+            'b': ice.Param(int, repeated=True),
+            'c': ice.Param(repeated=True, default=[]),
+        }
+        self.assertEqual(self.validate(params, 'a=1&a=2&b=3'),
+                         {'a': [1, 2], 'b': [3], 'c': []})
+
+    def test_bounds(self):
+        params = {
+            'a': ice.Param(int, min=1, max=10),
+            'b': ice.Param(str, min=2, default='xx'),
+            'c': ice.Param(int, max=3, repeated=True, default=[]),
+        }
+        self.assertEqual(self.validate(params, 'a=10&b=ab&c=1&c=3'),
+                         {'a': 10, 'b': 'ab', 'c': [1, 3]})
+        with self.assertRaises(ice.ParamError) as cm:
+            self.validate(params, 'a=0&b=a&c=1&c=4')
+        self.assertEqual(cm.exception.errors, [
+            {'name': 'a', 'message': 'Value 0 is less than 1'},
+            {'name': 'b', 'message': 'Length 1 is less than 2'},
+            {'name': 'c', 'message': 'Value 4 is greater than 3'},
+        ])
+        with self.assertRaises(ice.ParamError) as cm:
+            self.validate(params, 'a=11')
+        self.assertEqual(cm.exception.errors, [
+            {'name': 'a', 'message': 'Value 11 is greater than 10'},
+        ])
+
+    def test_errors(self):
+        params = {
+            'a': ice.Param(int),
+            'b': ice.Param(bool),
+            'c': ice.Param(),
+            "d'": ice.Param(default=None),
+        }
+        with self.assertRaises(ice.ParamError) as cm:
+            self.validate(params, 'a=x&b=maybe')
+        self.assertEqual(cm.exception.status, 400)
+        self.assertEqual(str(cm.exception), 'Invalid parameters: a, b, c')
+        self.assertEqual(cm.exception.errors, [
+            {'name': 'a', 'message': 'Invalid value for type int'},
+            {'name': 'b', 'message': 'Invalid value for type bool'},
+            {'name': 'c', 'message': 'Missing required parameter'},
+        ])
+
+    def test_form(self):
+        params = {
+            'a': ice.Param(int),
+            'b': ice.Param(int, source='form'),
+        }
+        self.assertEqual(self.validate(params, 'a=1&b=2', b'a=3&b=4'),
+                         {'a': 1, 'b': 4})
+
+    def test_callable_type_without_name(self):
+        hexadecimal = functools.partial(int, base=16)
+        params = {'a': ice.Param(hexadecimal)}
+        self.assertEqual(self.validate(params, 'a=ff'), {'a': 255})
+        with self.assertRaises(ice.ParamError) as cm:
+            self.validate(params, 'a=fg')
+        self.assertEqual(cm.exception.errors, [
+            {'name': 'a',
+             'message': 'Invalid value for type {!r}'.format(hexadecimal)},
+        ])
+
+    def test_mutable_default_is_copied(self):
+        validate = ice.Param.compile({
+            'a': ice.Param(repeated=True, default=[]),
+        })
+        request = ice.Request({})
+        values = validate(request)
+        values['a'].append('foo')
+        self.assertEqual(validate(request), {'a': []})
+
+    def test_invalid_spec(self):
+        with self.assertRaises(ice.LogicError) as cm:
+            ice.Param('int')
+        self.assertEqual(str(cm.exception),
+                         "Parameter type 'int' is not callable")
+        with self.assertRaises(ice.LogicError) as cm:
+            ice.Param(source='cookies')
+        self.assertEqual(str(cm.exception),
+                         "Invalid parameter source 'cookies'")
@@ -0,0 +1,91 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2014-2017 Susam Pal
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Tests for class QueryCache."""
+
+
+import unittest
+from unittest import mock
+import ice
+
+
+class QueryCacheTest(unittest.TestCase):
+
+    def test_hits_and_misses(self):
+        c = ice.QueryCache(2)
+        parse = mock.Mock(side_effect=ice.Request.parse_query)
+        self.assertEqual(c.get('a=foo&a=bar', parse).data,
+                         {'a': ['foo', 'bar']})
+        self.assertEqual(c.get('a=foo&a=bar', parse).data,
+                         {'a': ['foo', 'bar']})
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(c.info(), (1, 1, 0, 2, 1))
+
+    def test_evicts_least_recently_used(self):
+        c = ice.QueryCache(2)
+        parse = ice.Request.parse_query
+        c.get('a=1', parse)
+        c.get('b=2', parse)
+        c.get('a=1', parse)
+        c.get('c=3', parse)
+        c.get('a=1', parse)
+        c.get('b=2', parse)
+        self.assertEqual(c.info(), (2, 4, 2, 2, 2))
+
+    def test_long_query_string_not_cached(self):
+        c = ice.QueryCache(2, max_length=5)
+        self.assertEqual(c.get('a=foo', ice.Request.parse_query).data,
+                         {'a': ['foo']})
+        self.assertEqual(c.get('a=foobar', ice.Request.parse_query).data,
+                         {'a': ['foobar']})
+        self.assertEqual(c.info(), (0, 1, 0, 2, 1))
+
+    def test_copy_on_write(self):
+        c = ice.QueryCache(2)
+        q1 = c.get('a=foo&a=bar&b=baz', ice.Request.parse_query)
+        q1['a'] = 'qux'
+        del q1['b']
+        q2 = c.get('a=foo&a=bar&b=baz', ice.Request.parse_query)
+        self.assertEqual(q1.data, {'a': ['foo', 'bar', 'qux']})
+        self.assertEqual(q2.data, {'a': ['foo', 'bar'], 'b': ['baz']})
+        self.assertEqual(q2['a'], 'bar')
+
+    def test_copy(self):
+        c = ice.QueryCache(2)
+        for i in range(2):
+            q = c.get('a=foo&a=bar&b=baz', ice.Request.parse_query)
+            d = q.copy()
+            self.assertIs(type(d), ice.MultiDict)
+            d['a'] = 'qux'
+            self.assertEqual(d.data, {'a': ['foo', 'bar', 'qux'],
+                                      'b': ['baz']})
+            self.assertEqual(q.data, {'a': ['foo', 'bar'], 'b': ['baz']})
+        self.assertEqual(c.info(), (1, 1, 0, 2, 1))
+
+    def test_parse_error_not_cached(self):
+        c = ice.QueryCache(2)
+        parse = mock.Mock(side_effect=ice.RequestError(400, 'Bad query'))
+        with self.assertRaises(ice.RequestError):
+            c.get('a=foo', parse)
+        self.assertEqual(c.info(), (0, 1, 0, 2, 0))
@@ -0,0 +1,178 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2014-2017 Susam Pal
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+"""Tests for class RegexTable."""
+
+
+import unittest
+from unittest import mock
+import ice
+
+
+class RegexTableTest(unittest.TestCase):
+
+    patterns = [
+        r'/(.*)', r'^/foo/(\d+)$', r'^/(?P<a>[a-z]+)/(?P<b>\d+)$',
+        r'/(?P<a>bar)', r'bar', r'^/([a-z]+)(?:\d+)/(?P<a>[a-z]+)$',
+        r'(a)\1', r'(?i)^/FOO$', r'/(?P<x>z)(?P=x)', r'[(?P<y>]',
+        r'\d$', r'^/(?P<a>x)|^/(?P<b>y)', r'(?<=/)baz', r'^$',
+        r'^/foo/(\d+)/(\d+)?$', r'^/foo/bar/(.*)', r'\A/foo/b(a)r',
+    ]
+
+    paths = [
+        '/', '', '/foo', '/FOO', '/foo/12', '/foo/12/', '/foo/12/34',
+        '/abc/42', '/bar', '/xbar', '/aa', '/zz', '/(', '/x', '/y',
+        '/baz', 'baz', '/abc12/def', '/foo\n', '/foo/1\n', '/foo/bar',
+        '/foo/bar/', '/foo/bar/baz', '/foo/bar/1',
+    ]
+
+    def test_empty_table(self):
+        for combine in (False, True):
+            t = ice.RegexTable(combine)
+            self.assertIsNone(t.match('/'))
+
+    def test_last_added_route_wins(self):
+        m = mock.Mock()
+        for combine in (False, True):
+            t = ice.RegexTable(combine)
+            t.add(ice.RegexRoute('/foo', m.f))
+            t.add(ice.RegexRoute('bar', m.g))
+            self.assertEqual(t.match('/foo/bar'), (m.g, [], {}))
+            self.assertEqual(t.match('/foo'), (m.f, [], {}))
+
+    def test_duplicate_group_names(self):
+        m = mock.Mock()
+        t = ice.RegexTable(True)
+        t.add(ice.RegexRoute(r'^/a/(?P<id>\d+)$', m.f))
+        t.add(ice.RegexRoute(r'^/b/(?P<id>\d+)$', m.g))
+        self.assertEqual(t.match('/a/1'), (m.f, [], {'id': '1'}))
+        self.assertEqual(t.match('/b/2'), (m.g, [], {'id': '2'}))
+        self.assertIsNone(t.match('/c/3'))
+
+    def test_same_as_separate_search(self):
+        for i in range(1, len(self.patterns) + 1):
+            plain = ice.RegexTable(False, False)
+            prefiltered = ice.RegexTable()
+            combined = ice.RegexTable(True)
+            for j, pattern in enumerate(self.patterns[:i]):
+                plain.add(ice.RegexRoute(pattern, j))
+                prefiltered.add(ice.RegexRoute(pattern, j))
+                combined.add(ice.RegexRoute(pattern, j))
+            for path in self.paths:
+                self.assertEqual(combined.match(path), plain.match(path),
+                                 (self.patterns[:i], path))
+                self.assertEqual(prefiltered.match(path), plain.match(path),
+                                 (self.patterns[:i], path))
+
+    def test_matcher_same_as_match(self):
+        for i in range(1, len(self.patterns) + 1):
+            for options in ((False, False), (False, True), (True, True)):
+                t = ice.RegexTable(*options)
+                for j, pattern in enumerate(self.patterns[:i]):
+                    t.add(ice.RegexRoute(pattern, j))
+                match = t.matcher()
+                for path in self.paths:
+                    self.assertEqual(match(path), t.match(path),
+                                     (options, self.patterns[:i], path))
+
+    def test_matcher_with_nested_prefixes(self):
+        m = mock.Mock()
+        t = ice.RegexTable()
+        t.add(ice.RegexRoute(r'^/api/(\w+)/(\d+)$', m.f))
+        t.add(ice.RegexRoute(r'^/api/v2/orders/(\d+)$', m.g))
+        t.add(ice.RegexRoute(r'^/api/v2/(\w+)/1$', m.h))
+        t.add(ice.RegexRoute(r'^/api/v1/(\d+)$', m.i))
+        match = t.matcher()
+        self.assertEqual(match('/api/v2/orders/1'), (m.h, ['orders'], {}))
+        self.assertEqual(match('/api/v2/orders/2'), (m.g, ['2'], {}))
+        self.assertEqual(match('/api/v2/2'), (m.f, ['v2', '2'], {}))
+        self.assertEqual(match('/api/v1/3'), (m.i, ['3'], {}))
+        self.assertIsNone(match('/other/1'))
+        self.assertEqual(t.info(), (0, 0, 0))
+        # Routes added later are ignored by the matcher.
+        t.add(ice.RegexRoute(r'^/other/(\d+)$', m.j))
+        self.assertIsNone(match('/other/1'))
+
+    def test_prefilter(self):
+        m = mock.Mock()
+        t = ice.RegexTable()
+        t.add(ice.RegexRoute(r'^/api/v1/orders/(\d+)$', m.f))
+        t.add(ice.RegexRoute(r'^/api/v2/orders/(\d+)$', m.g))
+        t.add(ice.RegexRoute(r'^/api/v2/users/(\d+)$', m.h))
+        t.add(ice.RegexRoute(r'/(\d+)$', m.i))
+        t.add(ice.RegexRoute(r'^/api/v2/(\w+)/1$', m.j))
+        self.assertEqual(t.info(), (0, 0, 0))
+
+        self.assertEqual(t.match('/api/v2/orders/1'), (m.j, ['orders'], {}))
+        self.assertEqual(t.info(), (1, 1, 1))
+        self.assertEqual(t.match('/api/v2/orders/2'), (m.i, ['2'], {}))
+        self.assertEqual(t.info(), (2, 3, 3))
+        self.assertEqual(t.match('/api/v1/orders/x'), None)
+        self.assertEqual(t.info(), (3, 5, 8))
+
+        t = ice.RegexTable(False, False)
+        t.add(ice.RegexRoute(r'^/api/v1/orders/(\d+)$', m.f))
+        t.add(ice.RegexRoute(r'^/api/v2/orders/(\d+)$', m.g))
+        self.assertEqual(t.match('/api/v1/orders/x'), None)
+        self.assertEqual(t.info(), (1, 2, 2))
+
+    def test_prefix(self):
+        def prefix(pattern):
+            return ice.RegexRoute(pattern, None).prefix()
+        self.assertEqual(prefix(r'^/api/v2/orders/(\d+)$'), '/api/v2/orders/')
+        self.assertEqual(prefix(r'\A/a\.b/c/(\d)'), '/a.b/c/')
+        self.assertEqual(prefix(r'^/a/b(c)'), '/a/')
+        self.assertEqual(prefix(r'^/a/bc?/(d)'), '/a/')
+        self.assertEqual(prefix(r'^/a/b+/(c)'), '/a/')
+        self.assertEqual(prefix(r'^/a/b{2}/(c)'), '/a/')
+        self.assertEqual(prefix(r'^/a\d/(b)'), '/')
+        self.assertEqual(prefix(r'^/a/?(b)'), '/')
+        self.assertEqual(prefix(r'^/a/(b)|^/a/(c)'), '')
+        self.assertEqual(prefix(r'(?i)^/a/(b)'), '')
+        self.assertEqual(prefix(r'(?m)^/a/(b)'), '')
+        self.assertEqual(prefix(r'/a/(b)'), '')
+
+    def test_embeddable(self):
+        self.assertEqual(ice.RegexRoute(r'^/(?P<a>\d+)/(x)$', None)
+                         .embeddable(), r'^/(\d+)/(x)$')
+        self.assertEqual(ice.RegexRoute(r'[(?P<a>]', None).embeddable(),
+                         r'[(?P<a>]')
+        self.assertEqual(ice.RegexRoute(r'\(?P<a>(b)', None).embeddable(),
+                         r'\(?P<a>(b)')
+        self.assertIsNone(ice.RegexRoute(r'(a)\1', None).embeddable())
+        self.assertIsNone(ice.RegexRoute(r'(?P<a>a)(?P=a)', None)
+                          .embeddable())
+        self.assertIsNone(ice.RegexRoute(r'(a)?(?(1)b|c)', None)
+                          .embeddable())
+        self.assertIsNone(ice.RegexRoute(r'(?i)a', None).embeddable())
+
+    def test_anchored(self):
+        self.assertTrue(ice.RegexRoute(r'^/foo', None).anchored())
+        self.assertTrue(ice.RegexRoute(r'\A/foo', None).anchored())
+        self.assertTrue(ice.RegexRoute(r'^/(a|b)', None).anchored())
+        self.assertTrue(ice.RegexRoute(r'^/[|]', None).anchored())
+        self.assertFalse(ice.RegexRoute(r'/foo', None).anchored())
+        self.assertFalse(ice.RegexRoute(r'^/a|/b', None).anchored())
+        self.assertFalse(ice.RegexRoute(r'(?m)^/a', None).anchored())
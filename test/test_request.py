@@ -85,9 +85,9 @@ class RequestTest(unittest.TestCase):
         r = ice.Request({'QUERY_STRING': 'a=f%6f%6f&b=bar'})
         self.assertEqual(r.query.data, {'a': ['foo'], 'b': ['bar']})
 
-    # environ['REQUEST_METHOD'] = 'POST' is required by cgi.FieldStorage
-    # to read bytes from environ['wsgi.input']. Hence, it is defined in
-    # every form test.
+    # The body of a GET or HEAD request is not parsed as form data; its
+    # query string is parsed instead. Hence,
+    # environ['REQUEST_METHOD'] = 'POST' is defined in every form test.
 
     def test_form_with_two_names(self):
         environ = {
@@ -172,3 +172,434 @@ class RequestTest(unittest.TestCase):
         }
         r = ice.Request(environ)
         self.assertEqual(r.cookies, {'a': 'foo', 'b': 'bar', 'c': 'baz qux'})
+
+    def test_cookie_unquoting(self):
+        environ = {
+            'HTTP_COOKIE': r'a="x\"y\012z"; b="semi;colon"; c=1; c="2"'
+        }
+        r = ice.Request(environ)
+        self.assertEqual(r.cookies['a'], 'x"y\nz')
+        self.assertEqual(r.cookies.get('b'), 'semi;colon')
+        self.assertEqual(r.cookies.getall('c'), ['1', '2'])
+        self.assertEqual(r.cookies.data, {'a': ['x"y\nz'],
+                                          'b': ['semi;colon'],
+                                          'c': ['1', '2']})
+
+    def test_malformed_cookies(self):
+        environ = {
+            'HTTP_COOKIE': 'bad; a=1;; =x; $Version=1; Path=/; b = 2 '
+        }
+        r = ice.Request(environ)
+        self.assertEqual(r.cookies, {'a': '1', 'b': '2'})
+
+    def test_max_query_params(self):
+        r = ice.Request({'QUERY_STRING': 'a=1&b=2&c=3'})
+        r.max_query_params = 3
+        self.assertEqual(r.query.data, {'a': ['1'], 'b': ['2'], 'c': ['3']})
+        r = ice.Request({'QUERY_STRING': 'a=1&' * 500000})
+        r.max_query_params = 3
+        with self.assertRaises(ice.RequestError) as cm:
+            r.query
+        self.assertEqual(cm.exception.status, 400)
+        self.assertEqual(str(cm.exception),
+                         'Query string has more than 3 parameters')
+
+    def test_max_cookies(self):
+        for header in ('a=1; b=2; c=3', 'a=1; b="2"; c=3'):
+            r = ice.Request({'HTTP_COOKIE': header})
+            r.max_cookies = 3
+            self.assertEqual(len(r.cookies), 3)
+            r = ice.Request({'HTTP_COOKIE': header + '; d=4'})
+            r.max_cookies = 3
+            with self.assertRaises(ice.RequestError) as cm:
+                r.cookies
+            self.assertEqual(cm.exception.status, 431)
+            self.assertEqual(str(cm.exception),
+                             'Cookie header has more than 3 cookies')
+
+    def test_header_size(self):
+        r = ice.Request({
+            'REQUEST_METHOD': 'GET',
+            'HTTP_HOST': 'localhost',
+            'CONTENT_TYPE': 'text/plain',
+        })
+        self.assertEqual(r.header_size, len('Host: localhost\r\n'
+                                            'Content-Type: text/plain\r\n'))
+
+    def test_lazy_parsing(self):
+        environ = {
+            'HTTP_COOKIE': 'a=foo',
+            'wsgi.input': io.BytesIO(b'b=bar'),
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': '5',
+        }
+        r = ice.Request(environ)
+        self.assertEqual(environ['wsgi.input'].tell(), 0)
+        environ['HTTP_COOKIE'] = 'a=baz'
+        self.assertEqual(r.cookies.data, {'a': ['baz']})
+        self.assertEqual(environ['wsgi.input'].tell(), 0)
+        self.assertEqual(r.form.data, {'b': ['bar']})
+        self.assertEqual(environ['wsgi.input'].tell(), 5)
+        environ['QUERY_STRING'] = 'c=qux'
+        self.assertEqual(r.query.data, {'c': ['qux']})
+
+        # Parsed values are cached.
+        self.assertIs(r.query, r.query)
+        self.assertIs(r.form, r.form)
+        self.assertIs(r.cookies, r.cookies)
+
+    def multipart_environ(self, body, boundary='xyz'):
+        return {
+            'wsgi.input': io.BytesIO(body),
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': 'multipart/form-data; boundary=' + boundary,
+            'CONTENT_LENGTH': str(len(body)),
+        }
+
+    multipart_body = (
+        b'preamble\r\n'
+        b'--xyz\r\n'
+        b'Content-Disposition: form-data; name="a"\r\n'
+        b'\r\n'
+        b'foo\r\n'
+        b'--xyz  \r\n'
+        b'Content-Disposition: form-data; name="a"\r\n'
+        b'\r\n'
+        b'b\xc3\xa4r\r\n--xy\r\n'
+        b'--xyz\r\n'
+        b'Content-Disposition: form-data; name="b"; '
+        b'filename="x \\"1\\".txt"\r\n'
+        b'Content-Type: application/octet-stream\r\n'
+        b'\r\n'
+        b'\x00\r\n\r\n\x01\r\n'
+        b'--xyz\r\n'
+        b'Content-Disposition: form-data; name="c"\r\n'
+        b'\r\n'
+        b'\r\n'
+        b'--xyz--\r\n'
+        b'epilogue'
+    )
+
+    def check_multipart_form(self, form):
+        self.assertEqual(form.getall('a'), ['foo', 'b\xe4r\r\n--xy'])
+        self.assertEqual(form['c'], '')
+        upload = form['b']
+        self.assertIsInstance(upload, ice.FileUpload)
+        self.assertEqual(upload.name, 'b')
+        self.assertEqual(upload.filename, 'x "1".txt')
+        self.assertEqual(upload.content_type, 'application/octet-stream')
+        self.assertEqual(upload.size, 6)
+        self.assertEqual(upload.file.read(), b'\x00\r\n\r\n\x01')
+
+    def test_multipart_form(self):
+        r = ice.Request(self.multipart_environ(self.multipart_body))
+        self.check_multipart_form(r.form)
+        upload = r.form['b']
+        r.close()
+        self.assertTrue(upload.file.closed)
+
+    def test_multipart_form_in_small_chunks(self):
+        for chunk_size in range(1, 20):
+            r = ice.Request(self.multipart_environ(self.multipart_body))
+            r.chunk_size = chunk_size
+            self.check_multipart_form(r.form)
+            r.close()
+
+    def test_multipart_file_spooled_to_disk(self):
+        body = (b'--xyz\r\n'
+                b'Content-Disposition: form-data; name="f"; '
+                b'filename="f.bin"\r\n\r\n' + b'x' * 1000 +
+                b'\r\n--xyz--\r\n')
+        r = ice.Request(self.multipart_environ(body))
+        r.chunk_size = 100
+        r.form_spool_size = 500
+        upload = r.form['f']
+        self.assertEqual(upload.size, 1000)
+        self.assertTrue(upload.file._rolled)
+        self.assertEqual(upload.file.read(), b'x' * 1000)
+        self.assertEqual(upload.content_type, 'text/plain')
+        r.close()
+
+    def test_multipart_empty_body(self):
+        r = ice.Request(self.multipart_environ(b''))
+        self.assertEqual(r.form.data, {})
+
+    def test_multipart_errors(self):
+        bodies = [
+            (b'--xyz\r\nContent-Disposition: form-data; name="a"\r\n'
+             b'\r\nfoo'),
+            b'--xyz\r\n',
+            b'no delimiter',
+            b'--xyzfoo\r\n\r\n\r\n--xyz--',
+        ]
+        for body in bodies:
+            r = ice.Request(self.multipart_environ(body))
+            with self.assertRaises(ice.RequestError) as cm:
+                r.form
+            self.assertEqual(cm.exception.status, 400, body)
+
+        r = ice.Request(self.multipart_environ(b'', boundary='""'))
+        with self.assertRaises(ice.RequestError) as cm:
+            r.form
+        self.assertEqual(cm.exception.status, 400)
+
+        body = b'--xyz\r\n' + b'X-Foo: bar\r\n' * 2000
+        r = ice.Request(self.multipart_environ(body))
+        with self.assertRaises(ice.RequestError) as cm:
+            r.form
+        self.assertEqual(cm.exception.status, 431)
+
+    def test_form_limits(self):
+        environ = {
+            'wsgi.input': io.BytesIO(b'a=foo&b=bar&c=baz'),
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': '17',
+        }
+        r = ice.Request(dict(environ))
+        r.max_form_parts = 2
+        with self.assertRaises(ice.RequestError) as cm:
+            r.form
+        self.assertEqual(cm.exception.status, 413)
+        self.assertEqual(str(cm.exception),
+                         'Form data has more than 2 fields')
+
+        environ['wsgi.input'].seek(0)
+        r = ice.Request(dict(environ))
+        r.max_form_field_size = 4
+        r.chunk_size = 2
+        with self.assertRaises(ice.RequestError) as cm:
+            r.form
+        self.assertEqual(cm.exception.status, 413)
+
+        environ['wsgi.input'].seek(0)
+        r = ice.Request(dict(environ))
+        r.max_form_size = 16
+        with self.assertRaises(ice.RequestError) as cm:
+            r.form
+        self.assertEqual(cm.exception.status, 413)
+        self.assertEqual(environ['wsgi.input'].tell(), 0)
+
+        body = (b'--xyz\r\nContent-Disposition: form-data; name="a"\r\n'
+                b'\r\nfoobar\r\n--xyz--')
+        r = ice.Request(self.multipart_environ(body))
+        r.max_form_field_size = 5
+        with self.assertRaises(ice.RequestError) as cm:
+            r.form
+        self.assertEqual(cm.exception.status, 413)
+
+    def test_form_not_parsed(self):
+        for method, content_type in (('GET', ''), ('HEAD', ''),
+                                     ('POST', 'application/json')):
+            environ = {
+                'wsgi.input': io.BytesIO(b'a=foo'),
+                'REQUEST_METHOD': method,
+                'CONTENT_TYPE': content_type,
+                'CONTENT_LENGTH': '5',
+            }
+            r = ice.Request(environ)
+            self.assertEqual(r.form.data, {})
+            self.assertEqual(environ['wsgi.input'].tell(), 0)
+
+    def test_form_from_query_string(self):
+        for method in ('GET', 'HEAD'):
+            environ = {
+                'wsgi.input': io.BytesIO(b'c=baz'),
+                'REQUEST_METHOD': method,
+                'QUERY_STRING': 'a=foo&a=b%C3%A4r&b=&c=qux',
+                'CONTENT_LENGTH': '5',
+            }
+            r = ice.Request(environ)
+            self.assertEqual(r.form.data, {'a': ['foo', 'b\xe4r'],
+                                           'c': ['qux']})
+            self.assertEqual(environ['wsgi.input'].tell(), 0)
+
+        r = ice.Request({'QUERY_STRING': 'a=1&b=2&c=3'})
+        r.max_form_parts = 2
+        with self.assertRaises(ice.RequestError) as cm:
+            r.form
+        self.assertEqual(cm.exception.status, 413)
+
+    def test_post_form_with_query_string(self):
+        environ = {
+            'wsgi.input': io.BytesIO(b'a=foo&b=baz'),
+            'REQUEST_METHOD': 'POST',
+            'QUERY_STRING': 'b=bar&next=/home',
+            'CONTENT_LENGTH': '11',
+        }
+        r = ice.Request(environ)
+        self.assertEqual(r.form.data, {'a': ['foo'], 'b': ['bar', 'baz'],
+                                       'next': ['/home']})
+
+    def test_multipart_form_with_query_string(self):
+        environ = self.multipart_environ(self.multipart_body)
+        environ['QUERY_STRING'] = 'a=bar&next=/home'
+        r = ice.Request(environ)
+        self.assertEqual(r.form.getall('a'), ['bar', 'foo', 'b\xe4r\r\n--xy'])
+        self.assertEqual(r.form['next'], '/home')
+        self.assertIsInstance(r.form['b'], ice.FileUpload)
+        r.close()
+
+    def test_form_with_invalid_content_length(self):
+        for length in ('', 'foo', '-1'):
+            environ = {
+                'wsgi.input': io.BytesIO(b'a=foo'),
+                'REQUEST_METHOD': 'POST',
+                'CONTENT_LENGTH': length,
+            }
+            r = ice.Request(environ)
+            self.assertEqual(r.form.data, {})
+
+    def test_parse_options(self):
+        self.assertEqual(ice.FormParser.parse_options(
+                         'Multipart/Form-Data; Boundary="a;\\"b"; c = d'),
+                         ('multipart/form-data', {'boundary': 'a;"b',
+                                                  'c': 'd'}))
+        self.assertEqual(ice.FormParser.parse_options(''), ('', {}))
+
+    def test_stream(self):
+        environ = {
+            'wsgi.input': io.BytesIO(b'foobarbazqux'),
+            'CONTENT_LENGTH': '10',
+        }
+        r = ice.Request(environ)
+        self.assertEqual(r.content_length, 10)
+        r.chunk_size = 4
+        self.assertEqual(list(r.stream), [b'foob', b'arba', b'zq'])
+        self.assertEqual(list(r.stream), [])
+
+        environ['wsgi.input'] = io.BytesIO(b'foo')
+        r = ice.Request(environ)
+        self.assertEqual(list(r.stream), [b'foo'])
+
+        r = ice.Request({'CONTENT_LENGTH': '10'})
+        self.assertEqual(list(r.stream), [])
+
+    def test_stream_and_form_share_body(self):
+        environ = {
+            'wsgi.input': io.BytesIO(b'a=foo&b=bar'),
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': '11',
+        }
+        r = ice.Request(environ)
+        r.chunk_size = 6
+        self.assertEqual(next(r.stream), b'a=foo&')
+        self.assertEqual(r.form.data, {'b': ['bar']})
+
+    def test_stream_max_body_size(self):
+        environ = {
+            'wsgi.input': io.BytesIO(b'foobar'),
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': '6',
+        }
+        r = ice.Request(environ)
+        r.max_body_size = 5
+        with self.assertRaises(ice.RequestError) as cm:
+            list(r.stream)
+        self.assertEqual(cm.exception.status, 413)
+        with self.assertRaises(ice.RequestError) as cm:
+            r.form
+        self.assertEqual(cm.exception.status, 413)
+        self.assertEqual(environ['wsgi.input'].tell(), 0)
+
+        r = ice.Request(environ)
+        r.max_body_size = 6
+        self.assertEqual(list(r.stream), [b'foobar'])
+
+    def json_environ(self, body, content_type='application/json'):
+        return {
+            'wsgi.input': io.BytesIO(body),
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': content_type,
+            'CONTENT_LENGTH': str(len(body)),
+        }
+
+    def test_json(self):
+        environ = self.json_environ(b'{"a": [1, "f\xc3\xb6\xc3\xb6"]}')
+        r = ice.Request(environ)
+        self.assertEqual(r.json, {'a': [1, 'föö']})
+        self.assertIs(r.json, r.json)
+        self.assertEqual(r.form.data, {})
+
+        r = ice.Request(self.json_environ(
+            'null'.encode('utf-16'), 'application/problem+json'))
+        self.assertIsNone(r.json)
+        self.assertIsNone(r.json)
+
+        r = ice.Request(self.json_environ(
+            b'[]', 'Application/JSON; charset=utf-8'))
+        self.assertEqual(r.json, [])
+
+    def test_json_errors(self):
+        for content_type in ('', 'text/plain', 'application/jsonx'):
+            environ = self.json_environ(b'{}', content_type)
+            r = ice.Request(environ)
+            with self.assertRaises(ice.RequestError) as cm:
+                r.json
+            self.assertEqual(cm.exception.status, 415)
+            self.assertEqual(environ['wsgi.input'].tell(), 0)
+
+        for body in (b'', b'{', b'\xff'):
+            r = ice.Request(self.json_environ(body))
+            with self.assertRaises(ice.RequestError) as cm:
+                r.json
+            self.assertEqual(cm.exception.status, 400)
+
+        environ = self.json_environ(b'[1, 2]')
+        r = ice.Request(environ)
+        r.max_json_size = 5
+        with self.assertRaises(ice.RequestError) as cm:
+            r.json
+        self.assertEqual(cm.exception.status, 413)
+        self.assertEqual(environ['wsgi.input'].tell(), 0)
+
+    def test_ndjson(self):
+        body = b'{"a": 1}\n\n  \r\n[2, "f\xc3\xb6\xc3\xb6"]\r\n"foo"\nnull'
+        for chunk_size in range(1, len(body) + 1):
+            environ = self.json_environ(body, 'application/x-ndjson')
+            r = ice.Request(environ)
+            r.chunk_size = chunk_size
+            self.assertEqual(list(r.ndjson),
+                             [{'a': 1}, [2, 'föö'], 'foo', None])
+
+        r = ice.Request(self.json_environ(b'1\n2\n', 'application/jsonl'))
+        self.assertEqual(list(r.ndjson), [1, 2])
+
+    def test_ndjson_is_incremental(self):
+        environ = self.json_environ(b'1\n2\n3\n', 'application/x-ndjson')
+        r = ice.Request(environ)
+        r.chunk_size = 2
+        records = r.ndjson
+        self.assertEqual(environ['wsgi.input'].tell(), 0)
+        self.assertEqual(next(records), 1)
+        self.assertEqual(environ['wsgi.input'].tell(), 2)
+        self.assertEqual(next(records), 2)
+        self.assertEqual(environ['wsgi.input'].tell(), 4)
+
+    def test_ndjson_errors(self):
+        environ = self.json_environ(b'1\n', 'application/json')
+        r = ice.Request(environ)
+        with self.assertRaises(ice.RequestError) as cm:
+            r.ndjson
+        self.assertEqual(cm.exception.status, 415)
+        self.assertEqual(environ['wsgi.input'].tell(), 0)
+
+        r = ice.Request(self.json_environ(b'1\n2\n{\n4\n',
+                                          'application/x-ndjson'))
+        records = r.ndjson
+        self.assertEqual(next(records), 1)
+        self.assertEqual(next(records), 2)
+        with self.assertRaises(ice.RequestError) as cm:
+            next(records)
+        self.assertEqual(cm.exception.status, 400)
+        self.assertTrue(str(cm.exception).startswith(
+                        'Invalid JSON in line 3: '))
+
+        for body in (b'1\n12345\n1\n', b'1\n12345', b'1\n123456789'):
+            r = ice.Request(self.json_environ(body, 'application/x-ndjson'))
+            r.max_ndjson_line_size = 4
+            r.chunk_size = 3
+            with self.assertRaises(ice.RequestError) as cm:
+                list(r.ndjson)
+            self.assertEqual(cm.exception.status, 413)
+            self.assertEqual(str(cm.exception),
+                             'Line 2 exceeds limit of 4 bytes')
@@ -63,6 +63,61 @@ class ResponseTest(unittest.TestCase):
         r.body = b'foo'
         self.assertEqual(r.response(), [b'foo'])
 
+    def test_streamed_body(self):
+        m = mock.Mock()
+        r = ice.Response(m)
+        r.charset = 'latin-1'
+        r.body = iter(['caf\xe9', b'|', ''])
+        self.assertEqual(list(r.response()), [b'caf\xe9', b'|', b''])
+        m.assert_called_with('200 OK', [
+            ('Content-Type', 'text/html; charset=latin-1'),
+        ])
+
+    def test_streamed_body_with_content_length(self):
+        m = mock.Mock()
+        r = ice.Response(m)
+        r.body = iter([b'foo', b'bar'])
+        r.content_length = 6
+        self.assertEqual(b''.join(r.response()), b'foobar')
+        m.assert_called_with('200 OK', [
+            ('Content-Type', 'text/html; charset=UTF-8'),
+            ('Content-Length', '6'),
+        ])
+
+    def test_streamed_body_is_closed(self):
+        events = []
+
+        def chunks():
+            try:
+                events.append('start')
+                yield 'foo'
+                yield 'bar'
+            finally:
+                events.append('closed')
+
+        r = ice.Response(mock.Mock())
+        r.body = chunks()
+        body = r.response()
+        self.assertEqual(next(iter(body)), b'foo')
+        body.close()
+        self.assertEqual(events, ['start', 'closed'])
+
+        events.clear()
+        r = ice.Response(mock.Mock())
+        r.body = chunks()
+        next(r.body)
+        r.head = True
+        self.assertEqual(r.response(), [b''])
+        self.assertEqual(events, ['start', 'closed'])
+
+    def test_streamed_body_with_invalid_chunk(self):
+        r = ice.Response(mock.Mock())
+        r.body = iter(['foo', 1])
+        with self.assertRaises(ice.Error) as cm:
+            list(r.response())
+        self.assertEqual(str(cm.exception),
+                         'Response body chunk has invalid type: int: 1')
+
     def test_status_line(self):
         r = ice.Response(mock.Mock())
         r.status = 400
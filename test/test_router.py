@@ -27,6 +27,7 @@
 
 import unittest
 from unittest import mock
+import threading
 import ice
 
 
@@ -230,3 +231,203 @@ class RouterTest(unittest.TestCase):
         r.add('GET', 'regex:/foo/(.*)', m.g)
         self.assertEqual(r.resolve('GET', '/foo/bar/baz'),
                          (m.g, ['bar/baz'], {}))
+
+    def test_combined_regex_routes(self):
+        r = ice.Router(combine_regex=True)
+        m = mock.Mock()
+        r.add('GET', r'^/foo/(?P<a>\d+)$', m.f)
+        r.add('GET', r'^/(?P<a>[a-z]+)/(\d+)$', m.g)
+        r.add('GET', '/<a>', m.h)
+        self.assertEqual(r.resolve('GET', '/foo/1'),
+                         (m.g, ['1'], {'a': 'foo'}))
+        self.assertEqual(r.resolve('GET', '/foo/bar'), None)
+        self.assertEqual(r.resolve('GET', '/foo'), (m.h, [], {'a': 'foo'}))
+        r.add('GET', r'^/(\w+)/(\d+)$', m.i)
+        self.assertEqual(r.resolve('GET', '/foo/1'), (m.i, ['foo', '1'], {}))
+
+    # Resolution cache tests
+
+    def test_prefilter_info(self):
+        m = mock.Mock()
+        for prefilter in (True, False):
+            r = ice.Router(prefilter=prefilter)
+            for i in range(10):
+                r.add('GET', r'^/api/r{}/(\d+)$'.format(i), m.f)
+            r.add('POST', r'^/api/r0/(\d+)$', m.g)
+            self.assertEqual(r.resolve('GET', '/api/r0/1'), (m.f, ['1'], {}))
+            self.assertIsNone(r.resolve('GET', '/api/r10/1'))
+            self.assertEqual(r.resolve('POST', '/api/r0/1'), (m.g, ['1'], {}))
+            info = r.prefilter_info()
+            self.assertEqual((info.searches, info.unfiltered), (3, 21))
+            self.assertEqual(info.evaluated, 2 if prefilter else 21)
+
+    def test_cache_disabled_by_default(self):
+        r = ice.Router()
+        m = mock.Mock()
+        r.add('GET', '/<>', m.f)
+        r.resolve('GET', '/foo')
+        self.assertEqual(r.cache_info(), (0, 0, 0, 0, 0))
+
+    def test_cache_hits_and_misses(self):
+        r = ice.Router(cache_size=2)
+        m = mock.Mock()
+        r.add('GET', '/', m.f)
+        r.add('GET', '/<>', m.g)
+        self.assertEqual(r.resolve('GET', '/foo'), (m.g, ['foo'], {}))
+        self.assertEqual(r.resolve('GET', '/foo'), (m.g, ['foo'], {}))
+        self.assertIsNone(r.resolve('GET', '/foo/bar'))
+        self.assertIsNone(r.resolve('GET', '/foo/bar'))
+        # Literal routes are resolved without the cache.
+        self.assertEqual(r.resolve('GET', '/'), (m.f, [], {}))
+        info = r.cache_info()
+        self.assertEqual(info, (2, 2, 0, 2, 2))
+        self.assertEqual((info.hits, info.misses, info.evictions,
+                          info.maxsize, info.currsize), (2, 2, 0, 2, 2))
+
+    def test_cache_evicts_least_recently_used(self):
+        r = ice.Router(cache_size=2)
+        m = mock.Mock()
+        r.add('GET', '/<>', m.f)
+        r.resolve('GET', '/a')
+        r.resolve('GET', '/b')
+        r.resolve('GET', '/a')
+        r.resolve('GET', '/c')
+        self.assertEqual(r.cache_info(), (1, 3, 1, 2, 2))
+        r.resolve('GET', '/a')
+        self.assertEqual(r.cache_info(), (2, 3, 1, 2, 2))
+        r.resolve('GET', '/b')
+        self.assertEqual(r.cache_info(), (2, 4, 2, 2, 2))
+
+    def test_cache_cleared_on_add(self):
+        r = ice.Router(cache_size=10)
+        m = mock.Mock()
+        r.add('GET', '/<>', m.f)
+        self.assertIsNone(r.resolve('GET', '/foo/bar'))
+        r.add('GET', '/<>/<>', m.g)
+        self.assertEqual(r.cache_info().currsize, 0)
+        self.assertEqual(r.resolve('GET', '/foo/bar'),
+                         (m.g, ['foo', 'bar'], {}))
+
+    def test_cache_skips_long_paths(self):
+        r = ice.Router(cache_size=10)
+        m = mock.Mock()
+        r.add('GET', '/<:path>', m.f)
+        path = '/' + 'a' * 2000
+        self.assertEqual(r.resolve('GET', path), (m.f, [path[1:]], {}))
+        self.assertEqual(r.cache_info(), (0, 0, 0, 10, 0))
+
+    def test_cache_shared_across_threads(self):
+        r = ice.Router(cache_size=50)
+        m = mock.Mock()
+        r.add('GET', '/<:int>', m.f)
+        errors = []
+
+        def worker(start):
+            for i in range(start, start + 200):
+                path = '/' + str(i % 100)
+                if r.resolve('GET', path) != (m.f, [i % 100], {}):
+                    errors.append(i)
+
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        info = r.cache_info()
+        self.assertEqual(errors, [])
+        self.assertEqual(info.hits + info.misses, 800)
+        self.assertLessEqual(info.currsize, 50)
+
+    # Frozen router tests
+
+    def test_freeze_resolves_same_as_unfrozen(self):
+        m = mock.Mock()
+        paths = ['/', '/foo', '/foo/', '/foo/bar', '/foo/12', '/foo/-12',
+                 '/bar/baz/qux', '/(.*)', '/x.txt', '/foo/12\n']
+        for options in ({}, {'combine_regex': True}, {'cache_size': 4}):
+            routers = ice.Router(**options), ice.Router(**options)
+            for r in routers:
+                r.add('GET', '/', m.a)
+                r.add('GET', '/foo', m.b)
+                r.add('GET', '/<>', m.c)
+                r.add('GET', '/foo/<a:-int>', m.d)
+                r.add('GET', '/<!>/<:path>', m.e)
+                r.add('GET', r'^/(\w+)/(?P<x>\w+)$', m.f)
+                r.add('POST', '/<>.txt', m.g)
+                r.add('POST', 'literal:/(.*)', m.h)
+                r.add('PUT', '/(.*)', m.i)
+            routers[1].freeze()
+            for method in ('GET', 'POST', 'PUT', 'DELETE'):
+                for path in paths:
+                    self.assertEqual(routers[1].resolve(method, path),
+                                     routers[0].resolve(method, path),
+                                     (options, method, path))
+
+    def test_add_after_freeze(self):
+        r = ice.Router()
+        m = mock.Mock()
+        r.add('GET', '/', m.f)
+        r.freeze()
+        with self.assertRaises(ice.RouteError) as cm:
+            r.add('GET', '/foo', m.g)
+        self.assertEqual(str(cm.exception),
+                         'Cannot add route GET /foo to frozen router')
+        self.assertIsNone(r.resolve('GET', '/foo'))
+        # Freezing again has no effect.
+        r.freeze()
+        self.assertEqual(r.resolve('GET', '/'), (m.f, [], {}))
+
+    def test_contains_method_when_frozen(self):
+        r = ice.Router()
+        m = mock.Mock()
+        r.add('GET', '/', m.f)
+        r.add('POST', '/<>', m.g)
+        r.add('PUT', '/(.*)', m.h)
+        r.freeze()
+        self.assertTrue(r.contains_method('GET'))
+        self.assertTrue(r.contains_method('POST'))
+        self.assertTrue(r.contains_method('PUT'))
+        self.assertFalse(r.contains_method('DELETE'))
+
+    # Method index tests
+
+    def test_methods(self):
+        r = ice.Router()
+        m = mock.Mock()
+        r.add('GET', '/foo', m.f)
+        r.add('HEAD', '/foo', m.f)
+        r.add('POST', '/<>', m.g)
+        r.add('PUT', '/<>', m.g)
+        r.add('PUT', '/foo/<:path>', m.g)
+        r.add('DELETE', 'regex:^/foo', m.h)
+        r.add('PATCH', 'regex:^/foo', m.h)
+        self.assertEqual(r.methods('/foo'),
+                         {'GET', 'HEAD', 'POST', 'PUT', 'DELETE', 'PATCH'})
+        self.assertEqual(r.methods('/bar'), {'POST', 'PUT'})
+        self.assertEqual(r.methods('/foo/bar/baz'),
+                         {'PUT', 'DELETE', 'PATCH'})
+        self.assertEqual(r.methods('/bar/baz'), set())
+        r.freeze()
+        self.assertEqual(r.methods('/bar'), {'POST', 'PUT'})
+
+    def test_methods_prefilter(self):
+        r = ice.Router()
+        m = mock.Mock()
+        for i in range(500):
+            r.add('GET', r'^/api/r{}/(\d+)$'.format(i), m.f)
+        r.add('POST', r'^/api/r7/(\d+)$', m.g)
+        r.add('PUT', r'/(\d+)$', m.h)
+        self.assertEqual(r.methods('/api/r7/1'), {'GET', 'POST', 'PUT'})
+        self.assertEqual(r.methods('/unknown/path'), set())
+        info = r.prefilter_info()
+        self.assertEqual((info.searches, info.evaluated, info.unfiltered),
+                         (2, 3, 1002))
+
+        r = ice.Router(prefilter=False)
+        for i in range(10):
+            r.add('GET', r'^/api/r{}/(\d+)$'.format(i), m.f)
+        self.assertEqual(r.methods('/unknown/path'), set())
+        info = r.prefilter_info()
+        self.assertEqual((info.searches, info.evaluated, info.unfiltered),
+                         (1, 10, 10))
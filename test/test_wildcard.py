@@ -26,6 +26,7 @@
 
 
 import unittest
+from unittest import mock
 import ice
 
 
@@ -203,3 +204,65 @@ class WildcardTest(unittest.TestCase):
             ice.Wildcard('<:!>')
         self.assertEqual(str(cm.exception),
                          "Invalid wildcard type '!' in '<:!>'")
+
+    @mock.patch.dict(ice.Wildcard._types)
+    def test_add_type(self):
+        ice.Wildcard.add_type('hexint', r'[0-9a-f]+', lambda v: int(v, 16))
+        ice.Wildcard.add_type('even', r'[0-9]+', int,
+                              lambda v: int(v) % 2 == 0)
+        ice.Wildcard.add_type('any', r'.+', path=True)
+
+        wildcard = ice.Wildcard('<:hexint>')
+        self.assertEqual(wildcard.regex(), '([0-9a-f]+)')
+        self.assertEqual(wildcard.value('ff'), 255)
+        self.assertIsNone(wildcard.validator())
+        self.assertFalse(wildcard.spans_segments())
+
+        wildcard = ice.Wildcard('<:even>')
+        self.assertTrue(wildcard.validator()('12'))
+        self.assertFalse(wildcard.validator()('13'))
+
+        wildcard = ice.Wildcard('<:any>')
+        self.assertEqual(wildcard.value('/foo'), '/foo')
+        self.assertTrue(wildcard.spans_segments())
+
+    @mock.patch.dict(ice.Wildcard._types)
+    def test_add_type_validation(self):
+        with self.assertRaises(ice.RouteError) as cm:
+            ice.Wildcard.add_type('int', r'[0-9]+')
+        self.assertEqual(str(cm.exception),
+                         "Wildcard type 'int' is already registered")
+
+        with self.assertRaises(ice.RouteError) as cm:
+            ice.Wildcard.add_type('a/b', r'[0-9]+')
+        self.assertEqual(str(cm.exception),
+                         "Invalid wildcard type name 'a/b'")
+
+        with self.assertRaises(ice.RouteError) as cm:
+            ice.Wildcard.add_type('foo', r'([0-9]+)')
+        self.assertEqual(str(cm.exception),
+                         "Regular expression '([0-9]+)' for wildcard type "
+                         "'foo' contains capturing groups")
+
+        with self.assertRaises(ice.RouteError) as cm:
+            ice.Wildcard.add_type('foo', r'[0-9')
+        self.assertTrue(str(cm.exception).startswith(
+                        "Invalid regular expression '[0-9' for wildcard "
+                        "type 'foo': "))
+
+        with self.assertRaises(ice.RouteError) as cm:
+            ice.Wildcard.add_type('foo', r'[0-9]+', 'int')
+        self.assertEqual(str(cm.exception),
+                         "Converter 'int' for wildcard type 'foo' is not "
+                         "callable")
+
+        with self.assertRaises(ice.RouteError) as cm:
+            ice.Wildcard.add_type('foo', r'[0-9]+', None, True)
+        self.assertEqual(str(cm.exception),
+                         "Validator True for wildcard type 'foo' is not "
+                         "callable")
+
+        with self.assertRaises(ice.RouteError):
+            ice.Wildcard('<:foo>')
+        ice.Wildcard.add_type('foo', r'(?:[0-9]+)')
+        ice.Wildcard('<:foo>')
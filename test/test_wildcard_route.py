@@ -377,6 +377,13 @@ class WildcardRouteTest(unittest.TestCase):
         self.assertIsNone(r.match('/000'))
         self.assertIsNone(r.match('/0000'))
 
+    def test_converters(self):
+        r = ice.WildcardRoute('/<a:int>/<>/<!>/<b:path>/<:-int>', None)
+        self.assertEqual(r.converters(), ((0, 'a', int), (1, '', None),
+                                          (3, 'b', None), (4, '', int)))
+        self.assertEqual(r.match('/1/foo/bar/baz/qux/-2'),
+                         (None, ['foo', -2], {'a': 1, 'b': 'baz/qux'}))
+
     def test_regex_ineffective_in_wildcard(self):
         # Any regular expression should get escaped by ice.WildcardRoute
         # so that they match literal strings
@@ -0,0 +1,166 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2014-2017 Susam Pal
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+"""Tests for class WildcardTrie."""
+
+
+import unittest
+from unittest import mock
+import datetime
+import uuid
+import ice
+
+
+class WildcardTrieTest(unittest.TestCase):
+
+    def test_empty_trie(self):
+        t = ice.WildcardTrie()
+        self.assertIsNone(t.find('/'))
+        self.assertIsNone(t.match('/foo'))
+
+    def test_literal_and_wildcard_segments(self):
+        m = mock.Mock()
+        t = ice.WildcardTrie()
+        t.add(ice.WildcardRoute('/foo/<a>', m.f))
+        t.add(ice.WildcardRoute('/<>/bar', m.g))
+        self.assertEqual(t.match('/foo/baz'), (m.f, [], {'a': 'baz'}))
+        self.assertEqual(t.match('/qux/bar'), (m.g, ['qux'], {}))
+        # Both routes match, the one added last wins.
+        self.assertEqual(t.match('/foo/bar'), (m.g, ['foo'], {}))
+        self.assertIsNone(t.match('/foo'))
+        self.assertIsNone(t.match('/foo/bar/'))
+
+    def test_last_added_route_wins(self):
+        m = mock.Mock()
+        t = ice.WildcardTrie()
+        t.add(ice.WildcardRoute('/<>/bar', m.f))
+        t.add(ice.WildcardRoute('/foo/<a>', m.g))
+        self.assertEqual(t.match('/foo/bar'), (m.g, [], {'a': 'bar'}))
+
+        t.add(ice.WildcardRoute('/<:path>', m.h))
+        self.assertEqual(t.match('/foo/bar'), (m.h, ['foo/bar'], {}))
+
+    def test_typed_segments(self):
+        m = mock.Mock()
+        t = ice.WildcardTrie()
+        t.add(ice.WildcardRoute('/item/<:int>', m.f))
+        t.add(ice.WildcardRoute('/item/<:-int>-<:int>', m.g))
+        self.assertEqual(t.match('/item/12'), (m.f, [12], {}))
+        self.assertEqual(t.match('/item/-1-2'), (m.g, [-1, 2], {}))
+        self.assertIsNone(t.match('/item/012'))
+        self.assertIsNone(t.match('/item/foo'))
+
+    @mock.patch.dict(ice.Wildcard._types)
+    def test_custom_types(self):
+        ice.Wildcard.add_type('hexint', r'[0-9a-f]+', lambda v: int(v, 16))
+        ice.Wildcard.add_type('even', r'[0-9]+', int,
+                              lambda v: int(v) % 2 == 0)
+        ice.Wildcard.add_type('tail', r'[a-z/]+', None,
+                              lambda v: v.endswith('/end'), True)
+        m = mock.Mock()
+        t = ice.WildcardTrie()
+        t.add(ice.WildcardRoute('/item/<:hexint>', m.f))
+        t.add(ice.WildcardRoute('/item/<:even>', m.g))
+        t.add(ice.WildcardRoute('/item/<:even>/<:tail>', m.h))
+        self.assertEqual(t.match('/item/12'), (m.g, [12], {}))
+        self.assertEqual(t.match('/item/13'), (m.f, [19], {}))
+        self.assertEqual(t.match('/item/1f'), (m.f, [31], {}))
+        self.assertEqual(t.match('/item/2/a/end'), (m.h, [2, 'a/end'], {}))
+        self.assertIsNone(t.match('/item/2/a/b'))
+        self.assertIsNone(t.match('/item/3/a/end'))
+        self.assertIsNone(t.match('/item/xyz'))
+        # The fallback for paths with a newline validates too.
+        self.assertEqual(t.match('/item/13\n'), (m.f, [19], {}))
+
+    def test_builtin_types(self):
+        m = mock.Mock()
+        t = ice.WildcardTrie()
+        t.add(ice.WildcardRoute('/u/<:uuid>', m.f))
+        t.add(ice.WildcardRoute('/h/<:hex>', m.g))
+        t.add(ice.WildcardRoute('/d/<day:date>', m.h))
+        t.add(ice.WildcardRoute('/s/<:slug>', m.i))
+        value = '0A1b2c3d-4e5f-6789-abcd-ef0123456789'
+        self.assertEqual(t.match('/u/' + value),
+                         (m.f, [uuid.UUID(value)], {}))
+        self.assertIsNone(t.match('/u/0a1b2c3d4e5f6789abcdef0123456789'))
+        self.assertIsNone(t.match('/u/' + value.replace('A', 'g')))
+        self.assertEqual(t.match('/h/00fF'), (m.g, ['00fF'], {}))
+        self.assertIsNone(t.match('/h/0x1f'))
+        self.assertEqual(t.match('/d/2016-02-29'),
+                         (m.h, [], {'day': datetime.date(2016, 2, 29)}))
+        self.assertIsNone(t.match('/d/2017-02-29'))
+        self.assertIsNone(t.match('/d/2017-13-01'))
+        self.assertIsNone(t.match('/d/2017-1-01'))
+        self.assertEqual(t.match('/s/hello-world_2'),
+                         (m.i, ['hello-world_2'], {}))
+        self.assertIsNone(t.match('/s/hello.world'))
+        self.assertIsNone(t.match('/s/hello/world'))
+
+    def test_path_wildcard_spans_segments(self):
+        m = mock.Mock()
+        t = ice.WildcardTrie()
+        t.add(ice.WildcardRoute('/notes/<:path>/<:int>', m.f))
+        self.assertEqual(t.match('/notes/a/b/12'), (m.f, ['a/b', 12], {}))
+        self.assertEqual(t.match('/notes///12'), (m.f, ['/', 12], {}))
+        self.assertIsNone(t.match('/notes//12'))
+        self.assertIsNone(t.match('/notes/12'))
+        self.assertIsNone(t.match('/notes/'))
+
+    def test_trailing_newline(self):
+        # The $ in a wildcard route's regular expression also matches
+        # before a trailing newline, so the trie must behave the same.
+        m = mock.Mock()
+        t = ice.WildcardTrie()
+        t.add(ice.WildcardRoute('/<:int>', m.f))
+        self.assertEqual(t.match('/12\n'), (m.f, [12], {}))
+        self.assertIsNone(t.match('/12\n\n'))
+
+    def test_same_as_reversed_linear_scan(self):
+        patterns = [
+            '/<>', '/foo', '/foo/<>', '/foo/<a:int>', '/<a>/<b>',
+            '/<>-<>', '/foo/<:path>', '<:path>', '/<:path>/bar',
+            '/foo/<:+int>', '/<:-int>/<!>', '/<<>>', '/foo//<>',
+            '/foo/bar', '/<a>.txt', '<:path><:path>', '/<:int><:-int>',
+        ]
+        paths = [
+            '/', '//', '/foo', '/foo/', '/foo/bar', '/foo/12', '/foo/012',
+            '/12/x', '/-12/x', '/a-b', '/a-b-c', '/<x>', '/foo//x',
+            '/x.txt', '/a/b/bar', '/foo/bar/baz', 'foo', '/123', '/12-3',
+            '/foo/bar\n', '/a\nb/bar',
+        ]
+        routes = []
+        t = ice.WildcardTrie()
+        for i, pattern in enumerate(patterns):
+            route = ice.WildcardRoute(pattern, i)
+            routes.append(route)
+            t.add(route)
+            for path in paths:
+                expected = None
+                for r in reversed(routes):
+                    expected = r.match(path)
+                    if expected is not None:
+                        break
+                self.assertEqual(t.match(path), expected,
+                                 (pattern, path))